@@ -0,0 +1,122 @@
+# === aliases.py ===
+# Everyday names for grocery items -> the English name used in the catalog.
+#
+# Covers Hindi/Hinglish, Bhojpuri, Tamil, Telugu and Gujarati words as customers
+# type them (romanized and in script), common misspellings, and English words
+# whose catalog name differs ("wheat flour" is sold as "Atta"). Keys are
+# lowercase, single-spaced.
+
+ALIASES = {
+    # Rice
+    "chawal": "rice", "chaawal": "rice", "chaval": "rice", "arisi": "rice", "akki": "rice",
+    "biyyam": "rice", "அரிசி": "rice", "चावल": "rice",
+    "chaur": "rice", "chawur": "rice", "chokha": "rice", "బియ్యం": "rice", "ચોખા": "rice",
+    "idli arisi": "idli rice", "idly rice": "idli rice", "idly arisi": "idli rice",
+    "சோறு அரிசி": "rice",
+    # Flours
+    "atta": "atta", "aata": "atta", "gehun ka atta": "atta", "wheat flour": "atta",
+    "godhumai maavu": "atta", "godhuma maavu": "atta", "கோதுமை மாவு": "atta", "आटा": "atta",
+    "godhuma pindi": "atta", "ghau no lot": "atta", "గోధుమ పిండి": "atta", "ઘઉંનો લોટ": "atta",
+    "besan": "besan", "gram flour": "besan", "kadalai maavu": "besan", "kadala maavu": "besan",
+    "கடலை மாவு": "besan", "बेसन": "besan",
+    "senaga pindi": "besan", "chana no lot": "besan", "శనగపిండి": "besan", "ચણાનો લોટ": "besan",
+    "maida": "maida", "sooji": "sooji", "rava": "sooji", "ravai": "sooji",
+    "मैदा": "maida", "सूजी": "sooji",
+    # Dals
+    "toor dal": "toor dal", "tur dal": "toor dal", "tuvar dal": "toor dal", "arhar dal": "toor dal",
+    "thuvaram paruppu": "toor dal", "thuvaram parupu": "toor dal", "துவரம் பருப்பு": "toor dal",
+    "arhar": "toor dal", "rahar dal": "toor dal", "kandi pappu": "toor dal", "tuver dal": "toor dal",
+    "अरहर दाल": "toor dal", "तुअर दाल": "toor dal", "కందిపప్పు": "toor dal", "તુવેર દાળ": "toor dal",
+    "ulundhu": "urad dal", "ulundu": "urad dal", "urad": "urad dal", "uddina bele": "urad dal",
+    "minapa pappu": "urad dal", "మినపప్పు": "urad dal",
+    "moong": "moong dal", "pasi paruppu": "moong dal", "payatham paruppu": "moong dal",
+    "pesara pappu": "moong dal", "పెసరపప్పు": "moong dal",
+    "kadalai paruppu": "chana dal", "chana": "chana dal",
+    # Vegetables
+    "pyaaj": "onion", "pyaaz": "onion", "pyaz": "onion", "pyaj": "onion", "kanda": "onion",
+    "vengayam": "onion", "venkayam": "onion", "onions": "onion", "வெங்காயம்": "onion", "प्याज": "onion",
+    "piyaj": "onion", "piyaz": "onion", "ullipaya": "onion", "ullipayalu": "onion", "dungli": "onion",
+    "ఉల్లిపాయ": "onion", "ఉల్లిపాయలు": "onion", "ડુંગળી": "onion",
+    "aloo": "potato", "alu": "potato", "batata": "potato", "urulaikizhangu": "potato",
+    "urulai kizhangu": "potato", "potatoes": "potato", "உருளைக்கிழங்கு": "potato", "आलू": "potato",
+    "bangaladumpa": "potato", "bataka": "potato", "బంగాళాదుంప": "potato", "બટાકા": "potato",
+    "tamatar": "tomato", "tamater": "tomato", "thakkali": "tomato", "tomatoes": "tomato",
+    "tomatos": "tomato", "தக்காளி": "tomato", "टमाटर": "tomato",
+    "tamata": "tomato", "tameta": "tomato", "టమాటా": "tomato", "ટામેટા": "tomato",
+    "hari mirch": "green chilli", "pacha milagai": "green chilli", "pachai milagai": "green chilli",
+    "green chillies": "green chilli", "हरी मिर्च": "green chilli",
+    "mircha": "green chilli", "pachi mirchi": "green chilli", "lila marcha": "green chilli",
+    "పచ్చిమిర్చి": "green chilli", "લીલા મરચાં": "green chilli",
+    "adrak": "ginger", "inji": "ginger", "இஞ்சி": "ginger", "अदरक": "ginger",
+    "allam": "ginger", "aadu": "ginger", "అల్లం": "ginger", "આદુ": "ginger",
+    "lahsun": "garlic", "lehsun": "garlic", "poondu": "garlic", "பூண்டு": "garlic", "लहसुन": "garlic",
+    "vellulli": "garlic", "lasan": "garlic", "వెల్లుల్లి": "garlic", "લસણ": "garlic",
+    "karuveppilai": "curry leaves", "kariveppila": "curry leaves", "kadi patta": "curry leaves",
+    "curry patta": "curry leaves", "கறிவேப்பிலை": "curry leaves",
+    "karivepaku": "curry leaves", "కరివేపాకు": "curry leaves",
+    "dhaniya patta": "coriander leaves", "kothamalli": "coriander leaves", "kothimbir": "coriander leaves",
+    "kothimeera": "coriander leaves", "కొత్తిమీర": "coriander leaves",
+    "matar": "green peas", "mattar": "green peas", "pattani": "green peas",
+    "nimbu": "lemon", "elumichai": "lemon", "lemons": "lemon", "नींबू": "lemon",
+    "nimmakaya": "lemon", "limbu": "lemon", "నిమ్మకాయ": "lemon", "લીંબુ": "lemon",
+    # Fruit
+    "kela": "banana", "vazhaipazham": "banana", "nenthra pazham": "nendran banana", "bananas": "banana",
+    "केला": "banana", "arati pandu": "banana", "అరటిపండు": "banana", "કેળા": "banana",
+    "thengai": "coconut", "nariyal": "coconut", "தேங்காய்": "coconut",
+    "nariyar": "coconut", "kobbari": "coconut", "nariyel": "coconut",
+    "కొబ్బరి": "coconut", "નાળિયેર": "coconut",
+    # Dairy and eggs
+    "doodh": "milk", "dudh": "milk", "paal": "milk", "paalu": "milk", "பால்": "milk", "दूध": "milk",
+    "palu": "milk", "పాలు": "milk", "દૂધ": "milk",
+    "dahi": "curd", "thayir": "curd", "perugu": "curd", "தயிர்": "curd", "दही": "curd",
+    "పెరుగు": "curd", "દહીં": "curd",
+    "ghii": "ghee", "ghi": "ghee", "nei": "ghee", "neyyi": "ghee", "நெய்": "ghee", "घी": "ghee",
+    "ghiu": "ghee", "నెయ్యి": "ghee", "ઘી": "ghee",
+    "makhan": "butter", "makkhan": "butter",
+    "anda": "eggs", "ande": "eggs", "muttai": "eggs", "egg": "eggs", "अंडे": "eggs", "अंडा": "eggs",
+    "gudlu": "eggs", "inda": "eggs", "గుడ్లు": "eggs", "ઈંડા": "eggs",
+    # Meat
+    "chiken": "chicken", "chikken": "chicken", "murgi": "chicken", "murga": "chicken",
+    "kozhi": "chicken", "koli": "chicken", "கோழி": "chicken", "கோழி இறைச்சி": "chicken",
+    "kodi": "chicken", "కోడి": "chicken",
+    # Spices and masalas
+    "haldi": "turmeric powder", "haldi powder": "turmeric powder", "haldi powdr": "turmeric powder",
+    "turmeric": "turmeric powder", "manjal": "turmeric powder", "manjal thool": "turmeric powder",
+    "manjal podi": "turmeric powder", "மஞ்சள் தூள்": "turmeric powder", "हल्दी": "turmeric powder",
+    "hardi": "turmeric powder", "pasupu": "turmeric powder", "haldar": "turmeric powder",
+    "పసుపు": "turmeric powder", "હળદર": "turmeric powder",
+    "elachi": "cardamom green", "elaichi": "cardamom green", "ilaichi": "cardamom green",
+    "elakkai": "cardamom green", "yelakkai": "cardamom green", "cardamom": "cardamom green",
+    "ஏலக்காய்": "cardamom green", "इलायची": "cardamom green",
+    "yalakulu": "cardamom green", "elchi": "cardamom green",
+    "యాలకులు": "cardamom green", "એલચી": "cardamom green",
+    "jeera": "cumin", "jeeragam": "cumin", "seeragam": "cumin", "cumin seeds": "cumin", "जीरा": "cumin",
+    "jeelakarra": "cumin", "jiru": "cumin", "జీలకర్ర": "cumin", "જીરું": "cumin",
+    "kali mirch": "black pepper", "milagu": "black pepper", "pepper": "black pepper",
+    "kadugu": "mustard", "rai": "mustard", "sarson": "mustard",
+    "avalu": "mustard", "ఆవాలు": "mustard", "રાઈ": "mustard",
+    "dhaniya": "coriander", "malli": "coriander",
+    "milagai podi": "chilli powder", "mirchi powder": "chilli powder", "lal mirch": "chilli powder",
+    "karam": "chilli powder", "కారం": "chilli powder",
+    "rasam podi": "rasam powder", "sambar podi": "sambar powder",
+    # Sugar, salt, jaggery
+    "sugr": "sugar", "suger": "sugar", "cheeni": "sugar", "chini": "sugar", "seeni": "sugar",
+    "sakkarai": "sugar", "sakkare": "sugar", "சக்கரை": "sugar", "சர்க்கரை": "sugar", "चीनी": "sugar",
+    "panchadara": "sugar", "khand": "sugar", "పంచదార": "sugar", "చక్కెర": "sugar", "ખાંડ": "sugar",
+    "namak": "salt", "uppu": "salt", "உப்பு": "salt", "नमक": "salt",
+    "mithu": "salt", "ఉప్పు": "salt", "મીઠું": "salt",
+    "gur": "jaggery", "gud": "jaggery", "vellam": "jaggery", "bellam": "jaggery", "vellum": "jaggery",
+    "गुड़": "jaggery", "బెల్లం": "jaggery", "ગોળ": "jaggery",
+    # Oil, tea and household
+    "tel": "cooking oil", "ennai": "cooking oil", "ennei": "cooking oil", "तेल": "cooking oil",
+    "nune": "cooking oil", "నూనె": "cooking oil", "તેલ": "cooking oil",
+    "chai patti": "tea", "chai": "tea", "tea powder": "tea", "theyilai": "tea", "चाय": "tea",
+    "chah": "tea", "tea podi": "tea", "టీ పొడి": "tea", "ચા": "tea",
+    "sabun": "bathing soap", "soap": "bathing soap",
+}
+
+
+def resolve_alias(name):
+    # Catalog-facing English name for an order line's product words (lowercased)
+    key = " ".join((name or "").lower().split())
+    return ALIASES.get(key, key)
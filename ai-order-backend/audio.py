@@ -0,0 +1,37 @@
+# === audio.py ===
+# Helpers for voice-note uploads.
+#
+# Clips are handed to Whisper straight from memory. WAV clips carry their length
+# in the header and are checked against the duration limit before any upstream
+# call. The webm/ogg the browser records only reveal theirs after a full demux,
+# so for those the duration limit becomes a size limit at the highest bitrate a
+# voice note is recorded at.
+
+import io
+import wave
+
+# Whisper picks the decoder from the file extension
+DEFAULT_FILENAME = "audio.webm"
+
+# MediaRecorder's Opus runs at up to 128 kbit/s; phone voice notes are far below
+COMPRESSED_BITS_PER_SECOND = 128_000
+
+
+def audio_duration(contents):
+    # Length in seconds when the header states it (WAV), else None
+    if contents[:4] != b"RIFF" or contents[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(contents)) as clip:
+            return clip.getnframes() / float(clip.getframerate() or 1)
+    except (wave.Error, EOFError):
+        return None
+
+
+def compressed_max_bytes(max_seconds, bits_per_second=COMPRESSED_BITS_PER_SECOND):
+    # Size of a max_seconds clip at bits_per_second: anything bigger runs longer
+    return int(max_seconds * bits_per_second / 8)
+
+
+def upload_filename(filename):
+    return filename if filename and "." in filename else DEFAULT_FILENAME
@@ -0,0 +1,283 @@
+# === benchmark.py ===
+# Offline load benchmark for the backend.
+#
+# Runs main.app in-process with the OpenAI clients replaced by the deterministic
+# fakes in fakes.py, drives it with replayed SampleList.txt lists and synthetic
+# orders at several concurrency levels, and reports throughput plus p50/p95/p99
+# per endpoint and per pipeline stage. No network or API key is needed.
+#
+#   python benchmark.py --concurrency 1,8,32 --requests 100
+#   python benchmark.py --json results.json
+#   python benchmark.py --baseline results.json --tolerance 0.15   # exit 1 on a p95 regression
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from io import BytesIO
+
+# The service reads its settings at import time: keep caches in memory, lift the
+# upstream limits, quiet the per-request logs, and give the OpenAI clients a dummy
+# key before main is imported
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("CACHE_DB", "")
+os.environ.setdefault("UPSTREAM_LIMITS", "")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+ENDPOINTS = ["process-order", "process-order-stream", "products", "upload-image", "upload-audio"]
+SAMPLE_FILE = os.path.join("..", "SampleList.txt")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the backend offline with fake OpenAI clients")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint per concurrency level")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"Subset of {','.join(ENDPOINTS)}")
+    parser.add_argument("--workload", choices=["replay", "synthetic", "mixed"], default="mixed",
+                        help="Orders replayed from SampleList.txt, generated, or both")
+    parser.add_argument("--sample-file", default=SAMPLE_FILE, help="Lists to replay, separated by 'List N' headings")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Seconds per chat completion")
+    parser.add_argument("--llm-item-latency", type=float, default=0.1, help="Extra seconds per item in a completion")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Seconds per embeddings request")
+    parser.add_argument("--vision-latency", type=float, default=2.0, help="Seconds per vision request")
+    parser.add_argument("--whisper-latency", type=float, default=1.5, help="Seconds per transcription")
+    parser.add_argument("--cold", action="store_true", help="Clear the in-memory caches before every request")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for fake latencies and synthetic orders")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Earlier --json output to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed p95 slowdown vs the baseline")
+    return parser.parse_args()
+
+
+# === Workloads ===
+def load_sample_lists(path):
+    # SampleList.txt: lists separated by "List 1", "list 3", ... headings
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    lists = re.split(r"(?im)^\s*list\s*\d+\s*$", text)
+    return [block.strip() for block in lists if block.strip()]
+
+
+def synthetic_orders(catalog, count, seed):
+    # Orders of 3-15 lines mixing alias words, catalog names and quantities
+    from aliases import ALIASES
+
+    rng = random.Random(seed)
+    aliases = sorted(ALIASES)
+    names = sorted({product["productname"].split(" - ")[0] for product in catalog.by_product_id.values()})
+    quantities = ["", "", "1 kg", "2 kg", "500 g", "1 litre", "2", "3 packet", "1/2 kilo"]
+    orders = []
+    for _ in range(count):
+        lines = []
+        for _ in range(rng.randint(3, 15)):
+            name = rng.choice(aliases) if rng.random() < 0.6 else rng.choice(names)
+            lines.append(f"- {name} {rng.choice(quantities)}".strip())
+        orders.append("\n".join(lines))
+    return orders
+
+
+def make_image(seed, size=(2400, 1800)):
+    # A phone-photo-sized image that does not compress to nothing
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.effect_noise((size[0] // 4, size[1] // 4), 40 + rng.random() * 20).resize(size).convert("RGB")
+    out = BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+# === Harness ===
+def install_fake_vector_index(main):
+    # Stores get a NumPy index of the fake embeddings instead of opening chroma_db/,
+    # which would write a chroma.sqlite3 into the working tree
+    from fakes import hash_embedding
+    from generate_embeddings import load_products_from_csv
+    from retrieval import NumpyIndex, PartitionedIndex, normalize_rows
+    import numpy as np
+
+    rows = load_products_from_csv("products.csv")
+    ids = list(rows)
+    documents = [rows[i][0] for i in ids]
+    metadatas = [rows[i][1] for i in ids]
+    matrix = normalize_rows(np.asarray([hash_embedding(text) for text in documents], dtype=np.float32))
+    index = NumpyIndex(matrix, ids, documents, metadatas)
+
+    def load_vector_index(store):
+        store.vector_index = PartitionedIndex(index, probes=main.SEARCH_PARTITIONS) if main.SEARCH_PARTITIONS else index
+
+    main.load_vector_index = load_vector_index
+
+
+def install_fakes(main, args, lists):
+    from fakes import FakeChatModel, FakeEmbeddings, FakeOpenAIClient
+    from gateway import GatewayEmbeddings
+
+    main.llm = FakeChatModel(args.llm_latency, args.llm_item_latency, seed=args.seed)
+    main.correct_chain = FakeChatModel(args.llm_latency, args.llm_item_latency, seed=args.seed + 1)
+    main.query_embedder.embeddings = GatewayEmbeddings(
+        FakeEmbeddings(args.embed_latency, seed=args.seed), main.upstream, main.EMBED_MODEL
+    )
+    main.openai_client = FakeOpenAIClient(lists, args.vision_latency, args.whisper_latency, seed=args.seed)
+
+
+def clear_caches(main):
+    for cache in (main.correction_cache, main.extraction_cache, main.image_cache, main.audio_cache,
+                  main.query_embedder.cache):
+        cache.clear()
+
+
+def request_factory(endpoint, orders, images, clips, subcategories, rng):
+    # Returns a coroutine function issuing one request of the endpoint's workload
+    if endpoint == "process-order":
+        return lambda client: client.post("/process-order/", json={"query": rng.choice(orders)})
+    if endpoint == "process-order-stream":
+        async def stream(client):
+            async with client.stream("POST", "/process-order/stream", json={"query": rng.choice(orders)}) as response:
+                async for _ in response.aiter_lines():
+                    pass
+                return response
+        return stream
+    if endpoint == "products":
+        def products(client):
+            params = {"limit": 100, "fields": "product_id,productname,price,packSize"}
+            if rng.random() < 0.5:
+                params["subcategory"] = rng.choice(subcategories)
+            return client.get("/products", params=params, headers={"Accept-Encoding": "gzip"})
+        return products
+    if endpoint == "upload-image":
+        return lambda client: client.post("/upload-image/", files={"image": ("list.jpg", rng.choice(images), "image/jpeg")})
+    if endpoint == "upload-audio":
+        return lambda client: client.post("/upload-audio/", files={"audio": ("note.webm", rng.choice(clips), "audio/webm")})
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+async def run_endpoint(main, client, make_request, concurrency, total, cold):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            if cold:
+                clear_caches(main)
+            start = time.perf_counter()
+            try:
+                response = await make_request(client)
+                if response.status_code >= 400 and response.status_code != 404:
+                    errors += 1
+            except Exception as e:
+                print(f"   request failed: {e}")
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def summarize(values):
+    from timing import percentile
+
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 1) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 1) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 1) if values else None,
+    }
+
+
+async def run(args):
+    import httpx
+    import main
+    from timing import stage_timings
+
+    # No lifespan under ASGITransport: run the startup phases here, minus the
+    # warm-up call, which would go to the real OpenAI
+    install_fake_vector_index(main)
+    if not main.start(warmup=False):
+        sys.exit(f"❌ Startup failed: {main.startup.status()['error']}")
+    lists = load_sample_lists(args.sample_file)
+    install_fakes(main, args, lists)
+    rng = random.Random(args.seed)
+    orders = []
+    if args.workload in ("replay", "mixed"):
+        orders += lists
+    if args.workload in ("synthetic", "mixed"):
+        orders += synthetic_orders(main.stores.default.catalog, max(20, args.requests), args.seed)
+    images = [make_image(args.seed + i) for i in range(4)]
+    clips = [random.Random(args.seed + i).randbytes(200_000) for i in range(4)]
+    subcategories = sorted({product["subcategory"] for product in main.stores.default.catalog.by_product_id.values()})
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+
+    results = {"config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")}, "levels": {}}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=600) as client:
+        for concurrency in [int(level) for level in args.concurrency.split(",")]:
+            print(f"\n=== Concurrency {concurrency} ===")
+            level = {"endpoints": {}, "stages": {}}
+            stage_timings.reset()
+            for endpoint in endpoints:
+                make_request = request_factory(endpoint, orders, images, clips, subcategories, rng)
+                latencies, errors, elapsed = await run_endpoint(
+                    main, client, make_request, concurrency, args.requests, args.cold
+                )
+                level["endpoints"][endpoint] = {
+                    **summarize(latencies),
+                    "errors": errors,
+                    "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+                }
+            level["stages"] = {stage: summarize(values) for stage, values in sorted(stage_timings.snapshot().items())}
+            results["levels"][str(concurrency)] = level
+            print_level(level)
+    return results
+
+
+def print_level(level):
+    print(f"{'endpoint':<22}{'reqs':>6}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, row in level["endpoints"].items():
+        print(f"{endpoint:<22}{row['count']:>6}{row['errors']:>8}{row['throughput_rps']:>9}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+    print(f"{'stage':<22}{'calls':>6}{'':>8}{'':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, row in level["stages"].items():
+        print(f"{stage:<22}{row['count']:>6}{'':>8}{'':>9}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+
+def compare(results, baseline, tolerance):
+    # p95 regressions per concurrency level and endpoint, as printable lines
+    regressions = []
+    for level, data in results["levels"].items():
+        for endpoint, row in data["endpoints"].items():
+            before = baseline.get("levels", {}).get(level, {}).get("endpoints", {}).get(endpoint)
+            if not before or not before.get("p95_ms") or row["p95_ms"] is None:
+                continue
+            if row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"concurrency {level} {endpoint}: p95 {before['p95_ms']} ms -> {row['p95_ms']} ms"
+                )
+    return regressions
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = asyncio.run(run(args))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ p95 regressions against the baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ No p95 regressions against the baseline")
@@ -0,0 +1,34 @@
+import time
+import argparse
+
+from chroma_reader import ChromaReader, export
+
+# File paths
+CHROMA_DIR = "chroma_db"
+SNAPSHOT_DIR = "vector_index"
+
+# Export the embeddings persisted in Chroma into a .npy snapshot for RETRIEVAL_BACKEND=numpy.
+# Reads the store directly, so no OpenAI key or embeddings calls are needed, and
+# streams it page by page into the (normalized) matrix, so memory stays flat.
+def build_vector_index(chroma_dir=CHROMA_DIR, snapshot_dir=SNAPSHOT_DIR):
+    print(f"🔵 Reading embeddings from '{chroma_dir}'...")
+    start = time.perf_counter()
+    reader = ChromaReader(chroma_dir)
+    try:
+        total = reader.count()
+        if not total:
+            raise ValueError(f"No embeddings found in '{chroma_dir}'. Run generate_embeddings.py first.")
+
+        print(f"🟢 Writing {total} x {reader.dimension} matrix to '{snapshot_dir}/'...")
+        export(reader, snapshot_dir, normalize=True)
+    finally:
+        reader.close()
+    print(f"✅ Vector index snapshot saved in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export Chroma embeddings to a NumPy snapshot")
+    parser.add_argument("--chroma-dir", default=CHROMA_DIR, help="Chroma persist directory")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="Snapshot output directory")
+    args = parser.parse_args()
+
+    build_vector_index(chroma_dir=args.chroma_dir, snapshot_dir=args.out)
@@ -0,0 +1,123 @@
+# === bulk.py ===
+# Parsing and bookkeeping for bulk orders (POST /process-orders/bulk).
+#
+# A bulk upload holds many shopping lists, which repeat the same lines over and
+# over ("besan", "pyaaj 1 kg"). BulkPlan splits every order into lines, keys each
+# line by its normalized text (headings such as "List 1" are left out), and
+# keeps one entry per distinct line, so the pipeline resolves each distinct line
+# once however many orders contain it.
+# As lines are resolved the plan reports which orders just became complete, so
+# their results can be streamed out straight away.
+
+import csv
+import io
+import json
+
+from cache import normalize_text
+from fastpath import clean_line, is_heading
+
+
+class BulkError(ValueError):
+    pass
+
+
+def parse_orders(contents, filename=None, content_type=None):
+    # [(order_id, query)] from a JSONL upload ({"order_id": ..., "query": ...} or a
+    # bare JSON string per line) or a CSV upload with a "query" column
+    try:
+        text = contents.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BulkError("Orders file must be UTF-8")
+    is_csv = (filename or "").lower().endswith(".csv") or "csv" in (content_type or "")
+    return parse_csv(text) if is_csv else parse_jsonl(text)
+
+
+def parse_jsonl(text):
+    orders = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BulkError(f"Line {number}: invalid JSON ({e.msg})")
+        if isinstance(record, str):
+            record = {"query": record}
+        if not isinstance(record, dict) or not isinstance(record.get("query"), str):
+            raise BulkError(f"Line {number}: expected an object with a \"query\" string")
+        if not record["query"].strip():
+            raise BulkError(f"Line {number}: empty \"query\"")
+        orders.append((str(record.get("order_id", record.get("id", len(orders) + 1))), record["query"]))
+    return orders
+
+
+def parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or "query" not in reader.fieldnames:
+        raise BulkError("CSV needs a header row with a \"query\" column (and optionally \"order_id\")")
+    orders = []
+    for row in reader:
+        if not (row.get("query") or "").strip():
+            raise BulkError(f"Line {reader.line_num}: empty \"query\"")
+        orders.append((str(row.get("order_id") or len(orders) + 1), row["query"]))
+    return orders
+
+
+def line_key(line):
+    return normalize_text(clean_line(line))
+
+
+class BulkPlan:
+    def __init__(self, orders, split):
+        self.orders = orders  # [(order_id, query)]
+        self.lines = {}  # key -> first line seen with that key
+        self.order_keys = []  # per order, its line keys in list order
+        self.waiting = {}  # key -> indexes of orders containing it
+        self.remaining = []  # per order, distinct keys not yet resolved
+        self.results = {}  # key -> product list, or None when it matched nothing
+        self.errors = {}  # key -> error detail
+        for index, (_order_id, query) in enumerate(orders):
+            keys = []
+            for line in split(query):
+                key = line_key(line)
+                if not key or is_heading(line):
+                    continue
+                self.lines.setdefault(key, line)
+                keys.append(key)
+            self.order_keys.append(keys)
+            distinct = set(keys)
+            for key in distinct:
+                self.waiting.setdefault(key, []).append(index)
+            self.remaining.append(len(distinct))
+
+    def empty_orders(self):
+        return [index for index, keys in enumerate(self.order_keys) if not keys]
+
+    def resolve(self, key, products=None, error=None):
+        # Record a line's outcome; returns the indexes of orders it completed
+        if error is not None:
+            self.errors[key] = error
+        else:
+            self.results[key] = products
+        completed = []
+        for index in self.waiting.pop(key, []):
+            self.remaining[index] -= 1
+            if self.remaining[index] == 0:
+                completed.append(index)
+        return completed
+
+    def order_record(self, index):
+        order_id, _query = self.orders[index]
+        products, errors = [], []
+        for key in dict.fromkeys(self.order_keys[index]):
+            if key in self.errors:
+                errors.append({"item": self.lines[key], "detail": self.errors[key]})
+            elif self.results.get(key):
+                products.extend(self.results[key])
+            else:
+                errors.append({"item": self.lines[key], "detail": "No matching products found."})
+        if not products:
+            status = "error" if any(key in self.errors for key in self.order_keys[index]) else "not_found"
+        else:
+            status = "partial" if errors else "ok"
+        return {"type": "order", "order_id": order_id, "status": status, "result": products, "errors": errors}
@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import httpx
+
+DEFAULT_URL = "http://localhost:8000"
+
+# Send a JSONL or CSV file of orders to POST /process-orders/bulk and write the
+# per-order results to a JSONL file as the server streams them back.
+def run_bulk(path, url=DEFAULT_URL, out_path=None):
+    content_type = "text/csv" if path.lower().endswith(".csv") else "application/x-ndjson"
+    out = open(out_path, "w", encoding="utf-8") if out_path else sys.stdout
+    print(f"🔵 Sending '{path}' to {url}/process-orders/bulk...", file=sys.stderr)
+    start = time.perf_counter()
+    counts = {}
+    summary = None
+    try:
+        with open(path, "rb") as f, httpx.Client(timeout=httpx.Timeout(None, connect=10.0)) as client:
+            files = {"orders": (os.path.basename(path), f, content_type)}
+            with client.stream("POST", f"{url}/process-orders/bulk", files=files) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise SystemExit(f"❌ Server returned {response.status_code}: {response.text}")
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    if record["type"] == "summary":
+                        summary = record
+                        continue
+                    counts[record["status"]] = counts.get(record["status"], 0) + 1
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    done = sum(counts.values())
+                    if done % 100 == 0:
+                        print(f"   {done} orders done", file=sys.stderr)
+    finally:
+        if out_path:
+            out.close()
+
+    if summary is None:
+        raise SystemExit("❌ Stream ended before the summary; results are incomplete")
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ {summary['orders']} orders ({summary['lines']} lines, {summary['unique_lines']} distinct) "
+        f"in {elapsed:.1f}s: {summary['ok']} ok, {summary['partial']} partial, "
+        f"{summary['not_found']} not found, {summary['error']} failed",
+        file=sys.stderr,
+    )
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process a JSONL/CSV file of orders through the bulk endpoint")
+    parser.add_argument("orders", help='JSONL ({"order_id": ..., "query": ...} per line) or CSV with a "query" column')
+    parser.add_argument("--url", default=DEFAULT_URL, help="Backend base URL")
+    parser.add_argument("--out", help="Write results here instead of stdout")
+    args = parser.parse_args()
+
+    run_bulk(args.orders, url=args.url, out_path=args.out)
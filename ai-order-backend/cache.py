@@ -0,0 +1,276 @@
+# === cache.py ===
+# Two-tier result cache for LLM-backed pipeline steps (query correction, item extraction).
+#
+# Tier 1 is an in-process LRU with TTL, tier 2 an optional SQLite file shared by all
+# workers. Every entry is stamped with the catalog version (a fingerprint of products.db
+# and the vector store), so rebuilding either one invalidates everything automatically.
+# Concurrent callers asking for the same entry share one computation, batched or not.
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Result a batch computation hands the waiters of a key it did not produce a value for
+UNRESOLVED = object()
+
+
+def normalize_text(text):
+    return " ".join(text.lower().split())
+
+
+def file_fingerprint(*paths):
+    # Cheap version stamp: size + mtime of every path that exists
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{os.path.basename(path)}:-")
+    return "|".join(parts)
+
+
+class PersistentStore:
+    # SQLite tier; one file can back several caches, separated by namespace
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                version TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, namespace, key, version):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, version, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None or row[1] != version or row[2] < time.time():
+            return None, row is not None
+        return json.loads(row[0]), False
+
+    def set(self, namespace, key, version, value, expires_at):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, version, value, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, version, json.dumps(value), expires_at),
+            )
+            self.conn.commit()
+
+    def purge(self, namespace, version):
+        # Drop rows written for an older catalog or already expired
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND (version != ? OR expires_at < ?)",
+                (namespace, version, time.time()),
+            )
+            self.conn.commit()
+
+
+class ResultCache:
+    def __init__(self, namespace, max_entries=4096, ttl=86400, store=None, version_fn=None,
+                 version_check_interval=2.0):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.version_fn = version_fn or (lambda: "")
+        self.version_check_interval = version_check_interval
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.inflight = {}  # key -> Future of the single upstream call for that key
+        self.version = self.version_fn()
+        self.version_checked_at = time.monotonic()
+        self.counters = {
+            "hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def _check_version(self):
+        # Called with self.lock held; re-stat the catalog at most every few seconds
+        now = time.monotonic()
+        if now - self.version_checked_at < self.version_check_interval:
+            return
+        self.version_checked_at = now
+        version = self.version_fn()
+        if version != self.version:
+            self.version = version
+            self.entries.clear()
+            self.counters["invalidations"] += 1
+            if self.store is not None:
+                self.store.purge(self.namespace, version)
+
+    def _get_local(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self.entries[key]
+            self.counters["expirations"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def _set_local(self, key, value):
+        self.entries[key] = (time.time() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def get(self, key):
+        with self.lock:
+            self._check_version()
+            value = self._get_local(key)
+            if value is not None:
+                self.counters["hits"] += 1
+                return value
+            version = self.version
+        if self.store is not None:
+            value, expired = self.store.get(self.namespace, key, version)
+            if expired:
+                with self.lock:
+                    self.counters["expirations"] += 1
+            if value is not None:
+                with self.lock:
+                    self.counters["persistent_hits"] += 1
+                    self._set_local(key, value)
+                return value
+        with self.lock:
+            self.counters["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        if value is None:
+            return
+        with self.lock:
+            self._set_local(key, value)
+            version = self.version
+        if self.store is not None:
+            self.store.set(self.namespace, key, version, value, time.time() + self.ttl)
+
+    def _claim(self, key):
+        # -> (value, None) when cached, (None, future) when another caller is computing
+        # key, or (None, None) when the caller now owns its computation
+        value = self.get(key)
+        if value is not None:
+            return value, None
+        with self.lock:
+            # Another caller may have filled the entry since our lookup
+            value = self._get_local(key)
+            if value is not None:
+                return value, None
+            future = self.inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return None, future
+            self.inflight[key] = Future()
+            return None, None
+
+    def _settle(self, key, value=UNRESOLVED, error=None):
+        # Publish the owner's outcome for key to everyone waiting on it
+        self.set(key, None if value is UNRESOLVED else value)
+        with self.lock:
+            future = self.inflight.pop(key, None)
+        if future is not None:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+    def get_or_compute(self, key, compute):
+        # Concurrent callers asking for the same key share one upstream call
+        while True:
+            value, future = self._claim(key)
+            if value is not None:
+                return value
+            if future is None:
+                break
+            value = future.result()
+            if value is not UNRESOLVED:
+                return value
+            # A batch computation left key out; compute it here (or join whoever does)
+
+        try:
+            value = compute()
+        except BaseException as e:
+            self._settle(key, error=e)
+            raise
+        self._settle(key, value)
+        return value
+
+    def get_or_compute_many(self, keys, compute):
+        # Batched get_or_compute: compute(keys) -> {key: value} is called once for
+        # every key that is neither cached nor being computed by another caller, and
+        # the rest wait for their owners. Returns {key: value} for the keys that got
+        # one; keys a computation left out or failed on are missing.
+        found, owned, waiting = {}, [], {}
+        for key in dict.fromkeys(keys):
+            value, future = self._claim(key)
+            if value is not None:
+                found[key] = value
+            elif future is not None:
+                waiting[key] = future
+            else:
+                owned.append(key)
+
+        # Settle what we own before waiting on anyone else, so two batches that
+        # wait on each other's keys cannot deadlock
+        if owned:
+            try:
+                computed = compute(owned)
+            except BaseException as e:
+                for key in owned:
+                    self._settle(key, error=e)
+                raise
+            for key in owned:
+                value = computed.get(key)
+                self._settle(key, UNRESOLVED if value is None else value)
+                if value is not None:
+                    found[key] = value
+
+        for key, future in waiting.items():
+            try:
+                value = future.result()
+            except Exception:
+                continue
+            if value is not None and value is not UNRESOLVED:
+                found[key] = value
+        return found
+
+    def clear(self):
+        # Drop the in-memory tier (the persistent tier is left alone)
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["persistent_hits"] + self.counters["misses"]
+            hit_rate = (self.counters["hits"] + self.counters["persistent_hits"]) / lookups if lookups else 0.0
+            return {
+                **self.counters,
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(hit_rate, 4),
+                "version": self.version,
+            }
@@ -0,0 +1,146 @@
+# === catalog.py ===
+# In-memory product lookup layer, built once at startup from products.db.
+#
+# Rows are keyed by their stable product_id (see make_product_id), with hash maps
+# for the other lookups the resolvers make: by name and pack size for vector
+# stores that predate ids, and by plain name for the fast path.
+
+import re
+import sqlite3
+import hashlib
+
+PRODUCT_FIELDS = [
+    "product_id", "productname", "price", "image_url", "packSize", "category", "subcategory",
+    "pack_amount", "pack_unit",
+]
+
+# Catalog images live under .../media/uploads/p/<size>/<sku>_<n>-<slug>.jpg
+SKU_PATTERN = re.compile(r"/p/\w+/(\d+)_")
+PARENTHESIZED = re.compile(r"\([^)]*\)")
+
+
+def make_product_id(productname, packsize, category, subcategory, image_url):
+    # Stable id for a catalog row: the store SKU embedded in its image URL, or a
+    # short content hash for the few rows without a product image. Shared by
+    # load_csv_to_db.py and generate_embeddings.py so both stores agree.
+    match = SKU_PATTERN.search(image_url or "")
+    if match:
+        return match.group(1)
+    key = "|".join([productname, packsize, category, subcategory])
+    return "h" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+
+
+def name_segments(productname):
+    # "Organic - Milk - Coconut (Tetra)" -> ["milk", "coconut"]
+    name = PARENTHESIZED.sub(" ", (productname or "").lower())
+    segments = [segment.strip() for segment in name.split(" - ") if segment.strip()]
+    if len(segments) > 1 and segments[0] == "organic":
+        segments = segments[1:]
+    return segments
+
+
+def name_keys(productname):
+    # Plain names a product answers to: "Organic - Turmeric Powder/Arisina Pudi" ->
+    # {"turmeric powder", "arisina pudi"}, "Onion (Loose)" -> {"onion"}
+    segments = name_segments(productname)
+    if not segments:
+        return set()
+    return {" ".join(alternative.split()) for alternative in segments[0].split("/") if alternative.strip()}
+
+
+def whole_name_keys(productname):
+    # name_keys of a product that is nothing more than its plain name: "Onion (Loose)"
+    # answers to "onion", but "Milk - Coconut" is no answer to "milk"
+    return name_keys(productname) if len(name_segments(productname)) == 1 else set()
+
+
+class ProductCatalog:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.by_product_id = {}  # product_id -> product dict
+        self.by_name_and_pack = {}  # (lower(productname), lower(packSize)) -> product_id
+        self.by_key = {}  # whole name key (see whole_name_keys) -> products answering to it, combos excluded
+
+        source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            cursor = source.execute(
+                "SELECT product_id, productname, price, image_url, quantity AS packSize, category, subcategory, "
+                "pack_amount, pack_unit FROM products ORDER BY id"
+            )
+            for row in cursor:
+                product = dict(zip(PRODUCT_FIELDS, row))
+                name = (product["productname"] or "").lower()
+                self.by_product_id[product["product_id"]] = product
+                self.by_name_and_pack.setdefault((name, (product["packSize"] or "").lower()), product["product_id"])
+                if product["pack_amount"] is not None:
+                    for key in whole_name_keys(product["productname"]):
+                        self.by_key.setdefault(key, []).append(product)
+        finally:
+            source.close()
+
+    def __len__(self):
+        return len(self.by_product_id)
+
+    def get(self, product_id):
+        return self.by_product_id.get(product_id)
+
+    def get_many(self, product_ids):
+        return [self.by_product_id.get(product_id) for product_id in product_ids]
+
+    def id_for(self, productname, packsize):
+        # Vector stores built before rows carried ids only know name + pack size
+        return self.by_name_and_pack.get(((productname or "").lower(), (packsize or "").lower()))
+
+    def named(self, key):
+        # Products whose whole name is key ("onion" -> Onion 5 kg, Onion (Loose) 2 kg, ...)
+        return self.by_key.get(key, [])
+
+
+# === Product listing ===
+# Served straight from products.db (not the in-memory catalog) so a freshly
+# swapped-in file is visible to /products without a restart.
+LISTING_COLUMNS = {
+    "product_id": "product_id",
+    "productname": "productname",
+    "price": "price",
+    "image_url": "image_url",
+    "packSize": "quantity",
+    "category": "category",
+    "subcategory": "subcategory",
+}
+
+
+def iter_listing(db_path, fields, category=None, subcategory=None, prefix=None, after=None, limit=None):
+    # Yields (id, product dict) in id order, for keyset pagination on id. The
+    # category/subcategory/name lookups are served by the indexes load_csv_to_db.py builds.
+    where, params = [], []
+    if category:
+        where.append("category = ?")
+        params.append(category)
+    if subcategory:
+        where.append("subcategory = ?")
+        params.append(subcategory)
+    if prefix:
+        where.append("productname LIKE ? ESCAPE '\\'")
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.append(escaped + "%")
+    if after is not None:
+        where.append("id > ?")
+        params.append(after)
+    sql = f"SELECT id, {', '.join(LISTING_COLUMNS[field] for field in fields)} FROM products"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    # StreamingResponse advances this generator from whichever threadpool worker is
+    # free, so the connection must not be pinned to the thread that opened it. Only
+    # one thread drives the generator at a time, and it is closed when the generator is.
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        for row in conn.execute(sql, params):
+            yield row[0], dict(zip(fields, row[1:]))
+    finally:
+        conn.close()
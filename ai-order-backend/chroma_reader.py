@@ -0,0 +1,244 @@
+# === chroma_reader.py ===
+# Read-only, paginated access to a persisted Chroma store, plus export and a
+# drift check against products.db.
+#
+# Ids, documents and metadata are read straight from the store's chroma.sqlite3
+# with keyset pagination on the (segment, id) index, so a page costs the same at
+# the start of the store as at the end, and nothing needs an OpenAI key or the
+# network. Embeddings live in Chroma's HNSW files; they are fetched by id, one
+# page at a time, through a local client and only when asked for.
+
+import os
+import json
+import sqlite3
+
+import numpy as np
+
+from retrieval import normalize_rows
+
+COLLECTION = "langchain"  # the collection langchain's Chroma wrapper reads in main.py
+
+
+class ChromaReader:
+    def __init__(self, chroma_dir, collection=COLLECTION):
+        path = os.path.join(chroma_dir, "chroma.sqlite3")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No Chroma store in '{chroma_dir}'")
+        self.chroma_dir = chroma_dir
+        self.collection_name = collection
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        row = self.conn.execute(
+            "SELECT c.dimension, s.id FROM collections c JOIN segments s ON s.collection = c.id "
+            "WHERE c.name = ? AND s.scope = 'METADATA'",
+            (collection,),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"No collection '{collection}' in '{chroma_dir}'")
+        self.dimension, self.segment = row
+        self.collection = None
+
+    def close(self):
+        self.conn.close()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM embeddings WHERE segment_id = ?", (self.segment,)).fetchone()[0]
+
+    def pages(self, page_size=1000, after=None, offset=0, embeddings=False):
+        # Yields {"ids", "documents", "metadatas"[, "embeddings"]} pages in id order.
+        # Resume from a page's last id with after=..., or skip offset rows once up front.
+        if offset:
+            row = self.conn.execute(
+                "SELECT embedding_id FROM embeddings WHERE segment_id = ? AND embedding_id > ? "
+                "ORDER BY embedding_id LIMIT 1 OFFSET ?",
+                (self.segment, after or "", offset - 1),
+            ).fetchone()
+            if row is None:
+                return
+            after = row[0]
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, embedding_id FROM embeddings WHERE segment_id = ? AND embedding_id > ? "
+                "ORDER BY embedding_id LIMIT ?",
+                (self.segment, after or "", page_size),
+            ).fetchall()
+            if not rows:
+                return
+            page = self.read_page(rows)
+            if embeddings:
+                page["embeddings"] = self.embeddings_for(page["ids"])
+            yield page
+            after = rows[-1][1]
+
+    def read_page(self, rows):
+        # rows: [(internal id, id)] -> documents and metadata for them
+        metadatas = {internal: {} for internal, _ in rows}
+        documents = dict.fromkeys(metadatas)
+        placeholders = ",".join("?" * len(rows))
+        cursor = self.conn.execute(
+            "SELECT id, key, string_value, int_value, float_value, bool_value FROM embedding_metadata "
+            f"WHERE id IN ({placeholders})",
+            list(metadatas),
+        )
+        for internal, key, string_value, int_value, float_value, bool_value in cursor:
+            if key == "chroma:document":
+                documents[internal] = string_value
+            elif not key.startswith("chroma:"):
+                if string_value is not None:
+                    value = string_value
+                elif int_value is not None:
+                    value = int_value
+                elif float_value is not None:
+                    value = float_value
+                else:
+                    value = bool(bool_value) if bool_value is not None else None
+                metadatas[internal][key] = value
+        return {
+            "ids": [row_id for _, row_id in rows],
+            "documents": [documents[internal] for internal, _ in rows],
+            "metadatas": [metadatas[internal] for internal, _ in rows],
+        }
+
+    def embeddings_for(self, ids):
+        # (len(ids), dimension) float32, in the order of ids
+        if self.collection is None:
+            import chromadb
+            from chromadb.config import Settings
+
+            client = chromadb.PersistentClient(path=self.chroma_dir, settings=Settings(anonymized_telemetry=False))
+            self.collection = client.get_collection(self.collection_name)
+        result = self.collection.get(ids=ids, include=["embeddings"])
+        position = {row_id: i for i, row_id in enumerate(result["ids"])}
+        vectors = np.asarray(result["embeddings"], dtype=np.float32)
+        return vectors[[position[row_id] for row_id in ids]]
+
+    def duplicate_product_ids(self):
+        # product_id metadata values carried by more than one row, with their row counts
+        return self.conn.execute(
+            "SELECT m.string_value, COUNT(*) FROM embedding_metadata m JOIN embeddings e ON e.id = m.id "
+            "WHERE m.key = 'product_id' AND e.segment_id = ? GROUP BY m.string_value HAVING COUNT(*) > 1 "
+            "ORDER BY m.string_value",
+            (self.segment,),
+        ).fetchall()
+
+
+# === Export ===
+# rows.jsonl plus embeddings.npy (the NumpyIndex snapshot layout) or embeddings.parquet,
+# written a page at a time: the .npy file is preallocated and filled through a memmap,
+# Parquet goes out one row group per page. Files are renamed into place at the end.
+def export(reader, out_dir, fmt="npy", page_size=1000, normalize=False, progress=None):
+    os.makedirs(out_dir, exist_ok=True)
+    total = reader.count()
+    rows_path = os.path.join(out_dir, "rows.jsonl")
+    vectors_path = os.path.join(out_dir, f"embeddings.{fmt}")
+    if fmt == "npy":
+        matrix = np.lib.format.open_memmap(
+            vectors_path + ".tmp", mode="w+", dtype=np.float32, shape=(total, reader.dimension or 0)
+        )
+    elif fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow: pip install pyarrow")
+        schema = pa.schema([("id", pa.string()), ("embedding", pa.list_(pa.float32()))])
+        writer = pq.ParquetWriter(vectors_path + ".tmp", schema)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    written = 0
+    try:
+        with open(rows_path + ".tmp", "w", encoding="utf-8") as f:
+            for page in reader.pages(page_size, embeddings=True):
+                vectors = normalize_rows(page["embeddings"]) if normalize else page["embeddings"]
+                if written + len(vectors) > total:
+                    raise ValueError("Store changed during export; run it again")
+                for row_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                    f.write(json.dumps({"id": row_id, "document": document, "metadata": metadata}, ensure_ascii=False) + "\n")
+                if fmt == "npy":
+                    matrix[written:written + len(vectors)] = vectors
+                else:
+                    writer.write_table(pa.table({
+                        "id": page["ids"],
+                        "embedding": pa.array(list(vectors), type=pa.list_(pa.float32())),
+                    }, schema=schema))
+                written += len(vectors)
+                if progress:
+                    progress(written, total)
+    finally:
+        if fmt == "npy":
+            matrix.flush()
+            del matrix
+        else:
+            writer.close()
+    if written != total:
+        raise ValueError("Store changed during export; run it again")
+    os.replace(rows_path + ".tmp", rows_path)
+    os.replace(vectors_path + ".tmp", vectors_path)
+    return written
+
+
+# === Drift check ===
+# products.db is attached to the store's SQLite file read-only, and the diff runs
+# as index joins inside SQLite, so nothing is pulled into Python but the drifted
+# rows. Yields (kind, product id, detail):
+#   missing   in products.db, not embedded
+#   orphaned  embedded, no longer in products.db
+#   stale     name changed (needs re-embedding) or price/pack/category/image changed
+#   duplicate one product_id carried by several store rows
+STORE_FIELDS = ["chroma:document", "price", "packSize", "category", "subcategory", "image_url"]
+
+
+def drift(reader, products_db):
+    conn = reader.conn
+    conn.execute("ATTACH DATABASE ? AS catalog", (f"file:{products_db}?mode=ro",))
+    try:
+        yield from (("missing", product_id, name) for product_id, name in conn.execute(
+            "SELECT p.product_id, p.productname FROM catalog.products p WHERE NOT EXISTS "
+            "(SELECT 1 FROM embeddings e WHERE e.segment_id = ? AND e.embedding_id = p.product_id) "
+            "ORDER BY p.product_id",
+            (reader.segment,),
+        ))
+        yield from (("orphaned", row_id, document) for row_id, document in conn.execute(
+            "SELECT e.embedding_id, d.string_value FROM embeddings e "
+            "LEFT JOIN embedding_metadata d ON d.id = e.id AND d.key = 'chroma:document' "
+            "WHERE e.segment_id = ? AND NOT EXISTS (SELECT 1 FROM catalog.products p WHERE p.product_id = e.embedding_id) "
+            "ORDER BY e.embedding_id",
+            (reader.segment,),
+        ))
+        # One metadata join per compared field, each a primary-key probe on (id, key)
+        joins = " ".join(
+            f"LEFT JOIN embedding_metadata m{i} ON m{i}.id = e.id AND m{i}.key = '{key}'"
+            for i, key in enumerate(STORE_FIELDS)
+        )
+        values = [f"COALESCE(m{i}.string_value, m{i}.int_value, m{i}.float_value)" for i in range(len(STORE_FIELDS))]
+        for row in conn.execute(
+            f"SELECT e.embedding_id, p.productname, p.price, p.quantity, p.category, p.subcategory, p.image_url, "
+            f"{', '.join(values)} FROM embeddings e JOIN catalog.products p ON p.product_id = e.embedding_id {joins} "
+            f"WHERE e.segment_id = ? AND ({values[0]} IS NOT p.productname "
+            f"OR CAST({values[1]} AS REAL) IS NOT p.price "
+            f"OR COALESCE({values[2]}, '') != COALESCE(p.quantity, '') "
+            f"OR COALESCE({values[3]}, '') != COALESCE(p.category, '') "
+            f"OR COALESCE({values[4]}, '') != COALESCE(p.subcategory, '') "
+            f"OR COALESCE({values[5]}, '') != COALESCE(p.image_url, '')) "
+            "ORDER BY e.embedding_id",
+            (reader.segment,),
+        ):
+            yield "stale", row[0], stale_fields(row[1:7], row[7], dict(zip(STORE_FIELDS[1:], row[8:])))
+        for product_id, count in reader.duplicate_product_ids():
+            yield "duplicate", product_id, f"{count} rows"
+    finally:
+        conn.execute("DETACH DATABASE catalog")
+
+
+def stale_fields(product, document, metadata):
+    # Names of the fields that differ between a products.db row and its store row
+    productname, price, quantity, category, subcategory, image_url = product
+    database = {"packSize": quantity, "category": category, "subcategory": subcategory, "image_url": image_url}
+    changed = [] if document == productname else ["productname"]
+    try:
+        if float(metadata.get("price")) != price:
+            changed.append("price")
+    except (TypeError, ValueError):
+        changed.append("price")
+    changed.extend(field for field in database if (metadata.get(field) or "") != (database[field] or ""))
+    return ", ".join(changed)
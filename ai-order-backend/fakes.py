@@ -0,0 +1,142 @@
+# === fakes.py ===
+# Deterministic local stand-ins for the OpenAI clients, used by benchmark.py.
+#
+# Each fake sleeps for a configurable latency (with seeded jitter) and answers
+# from the request alone, so runs are repeatable and need no network or API key.
+# Embeddings are hashed word and character-trigram features: similar product
+# names get similar vectors, which keeps retrieval over the real catalog realistic.
+
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+
+import numpy as np
+
+from aliases import resolve_alias
+from packs import split_quantity
+
+EMBED_DIM = 256
+
+
+def hash_embedding(text, dim=EMBED_DIM):
+    vector = np.zeros(dim, dtype=np.float32)
+    words = re.findall(r"\w+", (text or "").lower())
+    padded = f" {' '.join(words)} "
+    features = [("w", word, 2.0) for word in words]
+    features += [("t", padded[i:i + 3], 1.0) for i in range(len(padded) - 2)]
+    for kind, feature, weight in features:
+        digest = hashlib.blake2b(f"{kind}:{feature}".encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += weight if digest[4] & 1 else -weight
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class Latency:
+    # mean seconds, +/- jitter fraction, from a seeded RNG shared by all threads
+    def __init__(self, mean, jitter=0.2, seed=0):
+        self.mean = mean
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sleep(self, extra=0.0):
+        with self.lock:
+            factor = 1.0 + self.random.uniform(-self.jitter, self.jitter)
+        seconds = (self.mean + extra) * factor
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class FakeEmbeddings:
+    def __init__(self, latency=0.05, seed=0):
+        self.latency = Latency(latency, seed=seed)
+
+    def embed_documents(self, texts):
+        self.latency.sleep()
+        return [hash_embedding(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeChatModel:
+    # Stands in for both the ChatOpenAI extraction model and correct_chain
+    def __init__(self, latency=0.8, item_latency=0.1, seed=0):
+        self.latency = Latency(latency, seed=seed)
+        self.item_latency = item_latency
+
+    def invoke(self, prompt):
+        if isinstance(prompt, dict):
+            # correct_chain.invoke({"query": ...}): "translate" through the alias table
+            lines = [resolve_alias(line.strip(" -*")) for line in prompt["query"].splitlines()]
+            self.latency.sleep(self.item_latency * len(lines))
+            return FakeMessage("\n".join(line for line in lines if line))
+
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        if "### ITEM" in text:
+            blocks = text.split("### ITEM")[1:]
+            self.latency.sleep(self.item_latency * len(blocks))
+            answer = {str(number): self.extract(block) for number, block in enumerate(blocks, start=1)}
+            return FakeMessage("```json\n" + json.dumps(answer) + "\n```")
+        self.latency.sleep(self.item_latency)
+        return FakeMessage(json.dumps(self.extract(text)))
+
+    @staticmethod
+    def extract(text):
+        # Pick the first candidate of the CONTEXT table, with the query's quantity
+        ids = [i for i in re.findall(r"^(\w+) \| .+ \| .* \| ", text, re.M) if i != "id"]
+        query = re.search(r"CUSTOMER QUERY:\s*\n(.*)", text)
+        _, amount, unit, count = split_quantity(query.group(1) if query else "")
+        if not ids:
+            return []
+        if amount:
+            return [{"ids": ids[:1], "amount": amount, "unit": unit}]
+        return [{"ids": ids[:1], "quantity": count or 1}]
+
+
+class _Namespace:
+    pass
+
+
+class FakeOpenAIClient:
+    # The slice of openai.OpenAI main.py uses: chat.completions.create (vision) and
+    # audio.transcriptions.create (Whisper). Answers are picked by content hash.
+    def __init__(self, lists, vision_latency=2.0, whisper_latency=1.5, seed=0):
+        self.lists = lists or ["onion 1 kg\nbesan"]
+        self.vision_latency = Latency(vision_latency, seed=seed)
+        self.whisper_latency = Latency(whisper_latency, seed=seed + 1)
+        self.chat = _Namespace()
+        self.chat.completions = _Namespace()
+        self.chat.completions.create = self.vision
+        self.audio = _Namespace()
+        self.audio.transcriptions = _Namespace()
+        self.audio.transcriptions.create = self.transcribe
+
+    def pick(self, data):
+        digest = hashlib.sha1(data if isinstance(data, bytes) else data.encode("utf-8")).digest()
+        return self.lists[digest[0] % len(self.lists)]
+
+    def vision(self, **kwargs):
+        self.vision_latency.sleep()
+        url = kwargs["messages"][0]["content"][1]["image_url"]["url"]
+        response = _Namespace()
+        choice = _Namespace()
+        choice.message = FakeMessage(self.pick(url[-256:]))
+        response.choices = [choice]
+        return response
+
+    def transcribe(self, **kwargs):
+        self.whisper_latency.sleep()
+        _, contents = kwargs["file"]
+        response = _Namespace()
+        response.text = self.pick(contents[:4096])
+        return response
@@ -0,0 +1,143 @@
+# === fastpath.py ===
+# Local resolver that runs before any LLM call.
+#
+# Most list lines name one obvious product ("besan", "pyaaj 1 kg"). Each line is
+# split into product words and a quantity, mapped through the alias table, and
+# resolved either by the catalog's name index (when the top vector hit agrees) or
+# by a clear winner among the vector hits. Lines that pass neither check are left
+# as None for the LLM pipeline; headings ("List 1") come back as HEADING, to be dropped.
+
+import re
+import logging
+
+from aliases import resolve_alias
+from catalog import name_keys
+from packs import split_quantity
+
+logger = logging.getLogger(__name__)
+
+# "- arisi 5 kilo", "* tamatar", "3. besan", "• namak"
+LINE_BULLET = re.compile(r"^\s*(?:[-*•·]+|\d+[.)])\s*")
+# Headings people put in their lists ("List 1", "Items:")
+NOT_ITEMS = {"list", "lists", "item", "items", "order", "grocery list", "shopping list", "groceries"}
+
+# resolve_many's marker for lines that name no product at all, as opposed to None,
+# which sends a line to the LLM
+HEADING = object()
+
+
+def clean_line(line):
+    return LINE_BULLET.sub("", line or "").strip(" \t.;:")
+
+
+def plural_forms(term):
+    # "tomatoes" -> ["tomatoes", "tomatoe", "tomato"]
+    forms = [term]
+    if term.endswith("es"):
+        forms.append(term[:-1])
+        forms.append(term[:-2])
+    elif term.endswith("s"):
+        forms.append(term[:-1])
+    return forms
+
+
+class FastPathResolver:
+    def __init__(self, catalog, search, min_score=0.9, min_margin=0.03, max_variants=3):
+        self.catalog = catalog
+        self.search = search  # list of texts -> per text [(Document, similarity)] best first
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.max_variants = max_variants  # distinct product names one line may resolve to
+
+    @staticmethod
+    def parse(line):
+        # Order line -> (search term, amount, unit, count), or None for a heading or
+        # a line without a single letter ("List 1", "Items:", "3.")
+        name, amount, unit, count = split_quantity(clean_line(line))
+        term = resolve_alias(name)
+        if term in NOT_ITEMS or not re.search(r"[^\W\d_]", term):
+            return None
+        return term, amount, unit, count
+
+    def name_group(self, term):
+        # Catalog products whose whole name is term: None when the name is unknown,
+        # [] when several different products share it
+        for form in plural_forms(term):
+            products = self.catalog.named(form)
+            if products:
+                break
+        else:
+            return None
+        # A generic item means the plain product: leave out organic lines unless asked for
+        if "organic" not in term and len({p["subcategory"] for p in products}) > 1:
+            products = [p for p in products if not (p["subcategory"] or "").lower().startswith("organic")]
+        return products if self.is_single_product(products) else []
+
+    def is_single_product(self, products):
+        return (
+            bool(products)
+            and len({p["subcategory"] for p in products}) == 1
+            and len({p["productname"] for p in products}) <= self.max_variants
+        )
+
+    def vector_group(self, hits):
+        # The top hit's product in all its packs, if it clearly beats every other product
+        if not hits or hits[0][1] < self.min_score:
+            return None
+        top_keys = name_keys(hits[0][0].page_content)
+        same, rivals = [], []
+        for doc, score in hits:
+            (same if name_keys(doc.page_content) & top_keys else rivals).append((doc, score))
+        if rivals and hits[0][1] - rivals[0][1] < self.min_margin:
+            return None
+        products = [self.catalog.get(doc.metadata.get("product_id")) for doc, _score in same]
+        products = [product for product in products if product and product["pack_amount"] is not None]
+        return products if self.is_single_product(products) else None
+
+    def entry(self, products, amount, unit, count):
+        # Same shape as an LLM extraction entry, smallest pack first
+        products = sorted(products, key=lambda p: p["pack_amount"])
+        ids = list(dict.fromkeys(p["product_id"] for p in products))
+        if amount:
+            if not any(p["pack_unit"] == unit for p in products):
+                return None  # "milk 2 kg": let the LLM make sense of it
+            return {"ids": ids, "amount": amount, "unit": unit}
+        return {"ids": ids, "quantity": count or 1}
+
+    def resolve_many(self, lines):
+        # Returns, per line, an extraction entry, None when the line needs the LLM,
+        # or HEADING when it is no item at all
+        parsed = [self.parse(line) for line in lines]
+        terms = list(dict.fromkeys(fields[0] for fields in parsed if fields))
+        escalate_all = [HEADING if fields is None else None for fields in parsed]
+        if not terms:
+            return escalate_all
+        try:
+            hits_by_term = dict(zip(terms, self.search(terms)))
+        except Exception as e:
+            logger.warning("Fast path search failed, sending every item to the LLM: %s", e)
+            return escalate_all
+
+        entries = []
+        for line, fields in zip(lines, parsed):
+            if fields is None:
+                entries.append(HEADING)
+                continue
+            term, amount, unit, count = fields
+            hits = hits_by_term.get(term) or []
+            products = self.name_group(term)
+            if products is None:
+                # Not a catalog name: accept a clear winner among the vector hits
+                products = self.vector_group(hits)
+            elif not hits or hits[0][0].metadata.get("product_id") not in {p["product_id"] for p in products}:
+                # Ambiguous name, or the best vector hit is another product: let the LLM decide
+                products = None
+            entry = self.entry(products, amount, unit, count) if products else None
+            if entry:
+                logger.debug("Fast path: %r -> %s", line, entry)
+            entries.append(entry)
+        return entries
+
+
+def is_heading(line):
+    return FastPathResolver.parse(line) is None
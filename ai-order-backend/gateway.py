@@ -0,0 +1,216 @@
+# === gateway.py ===
+# Admission control for every OpenAI call the backend makes.
+#
+# All clients share one pooled keep-alive HTTP client. Each call first reserves
+# capacity from a per-model token bucket (requests and tokens per minute). A call
+# that would have to wait longer than max_wait is refused at once with a 429,
+# and when too many calls are already waiting new ones get a 503, so a spike
+# turns into fast, retryable rejections instead of piles of upstream 429s and
+# timeouts. Transient upstream failures are retried with jittered exponential
+# backoff. Calls are blocking; they run on the worker pools, never on the event loop.
+
+import time
+import random
+import logging
+import threading
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def retryable_errors():
+    # Upstream errors worth another attempt; openai is slow to import, so it is
+    # only loaded once a call actually fails
+    import openai
+
+    return (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+class UpstreamBusy(Exception):
+    # Raised instead of calling upstream; status_code is 429 (rate) or 503 (queue full)
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def make_http_client(max_connections=64, timeout=60.0):
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=30.0,
+        ),
+        timeout=httpx.Timeout(timeout, connect=5.0),
+    )
+
+
+def parse_limits(text):
+    # "gpt-4o=500:30000,whisper-1=50:0" -> {"gpt-4o": (500, 30000), "whisper-1": (50, 0)}; 0 = unlimited
+    limits = {}
+    for part in (text or "").split(","):
+        if "=" not in part:
+            continue
+        model, _, values = part.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (float(rpm or 0), float(tpm or 0))
+    return limits
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for admission control
+    return len(text or "") // 4 + 1
+
+
+def response_usage(result):
+    # (prompt, completion) tokens reported by an OpenAI response or a LangChain
+    # message, or None when the response carries no usage (e.g. embeddings lists)
+    usage = getattr(result, "usage", None)
+    if usage is not None and hasattr(usage, "prompt_tokens"):
+        return usage.prompt_tokens or 0, getattr(usage, "completion_tokens", 0) or 0
+    usage = getattr(result, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    return None
+
+
+class TokenBucket:
+    # Refills per_minute units per minute, bursting up to one minute's worth.
+    # Reservations may run the bucket negative; the deficit is the caller's wait.
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def wait_for(self, amount, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # Never ask for more than a full bucket, or a huge prompt could wait forever
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class UpstreamGateway:
+    def __init__(self, limits, max_wait=10.0, max_queue=256, max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock = threading.Lock()
+        self.buckets = {
+            model: (TokenBucket(rpm) if rpm > 0 else None, TokenBucket(tpm) if tpm > 0 else None)
+            for model, (rpm, tpm) in limits.items()
+        }
+        self.waiting = 0
+        self.counters = {}
+
+    def _count(self, model, name, amount=1):
+        counters = self.counters.setdefault(
+            model, {
+                "calls": 0, "retries": 0, "rejected_429": 0, "rejected_503": 0, "errors": 0, "wait_seconds": 0.0,
+                "reserved_tokens": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            }
+        )
+        counters[name] += amount
+
+    def acquire(self, model, tokens=0):
+        # Reserve one request and `tokens` tokens for model, sleeping for the
+        # reservation if needed; raises UpstreamBusy instead of waiting too long
+        requests_bucket, tokens_bucket = self.buckets.get(model, (None, None))
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                self._count(model, "rejected_503")
+                raise UpstreamBusy(503, f"Too many requests waiting for {model}", retry_after=1)
+            now = time.monotonic()
+            wait = 0.0
+            if requests_bucket:
+                wait = max(wait, requests_bucket.wait_for(1, now))
+            if tokens_bucket and tokens:
+                wait = max(wait, tokens_bucket.wait_for(tokens, now))
+            if wait > self.max_wait:
+                self._count(model, "rejected_429")
+                raise UpstreamBusy(429, f"Rate limit for {model} reached", retry_after=int(wait) + 1)
+            if requests_bucket:
+                requests_bucket.take(1)
+            if tokens_bucket and tokens:
+                tokens_bucket.take(tokens)
+            self._count(model, "wait_seconds", wait)
+            self._count(model, "reserved_tokens", tokens)
+            self.waiting += 1
+        try:
+            if wait > 0:
+                time.sleep(wait)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    def call(self, model, func, /, *args, tokens=0, **kwargs):
+        attempt = 0
+        while True:
+            self.acquire(model, tokens)
+            with self.lock:
+                self._count(model, "calls")
+            try:
+                result = func(*args, **kwargs)
+                usage = response_usage(result)
+                if usage:
+                    with self.lock:
+                        self._count(model, "prompt_tokens", usage[0])
+                        self._count(model, "completion_tokens", usage[1])
+                return result
+            except Exception as e:
+                retryable = retryable_errors()
+                if not isinstance(e, retryable):
+                    raise
+                if attempt >= self.max_retries:
+                    with self.lock:
+                        self._count(model, "errors")
+                    if isinstance(e, retryable[0]):  # RateLimitError
+                        # Still throttled upstream: tell our client to back off rather than fail
+                        raise UpstreamBusy(429, f"Upstream rate limit for {model}", retry_after=int(self.backoff_max)) from e
+                    raise
+                attempt += 1
+                with self.lock:
+                    self._count(model, "retries")
+                # Full jitter, but never sooner than the server asked for
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                response = getattr(e, "response", None)
+                try:
+                    delay = max(delay, float(response.headers.get("retry-after", 0))) if response is not None else delay
+                except ValueError:
+                    pass
+                logger.warning("Upstream %s call failed (%s), retry %d in %.2fs", model, type(e).__name__, attempt, delay)
+                time.sleep(delay)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "waiting": self.waiting,
+                "max_queue": self.max_queue,
+                "models": {
+                    model: {**counters, "wait_seconds": round(counters["wait_seconds"], 3)}
+                    for model, counters in self.counters.items()
+                },
+            }
+
+
+class GatewayEmbeddings:
+    # Embeddings wrapper that routes embed_documents through the gateway
+    def __init__(self, embeddings, gateway, model):
+        self.embeddings = embeddings
+        self.gateway = gateway
+        self.model = model
+
+    def embed_documents(self, texts):
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return self.gateway.call(self.model, self.embeddings.embed_documents, texts, tokens=tokens)
+
+    def embed_query(self, text):
+        return self.gateway.call(self.model, self.embeddings.embed_query, text, tokens=estimate_tokens(text))
@@ -1,8 +1,16 @@
 import os
 import csv
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+
+from catalog import make_product_id
+from retrieval import iter_collection
 
 # Load .env for OpenAI key
 load_dotenv()
@@ -15,11 +23,21 @@ if not openai_key:
 # File paths
 CSV_FILE = "products.csv"
 CHROMA_DIR = "chroma_db"  # consistent folder name
+COLLECTION = "langchain"  # the collection langchain's Chroma wrapper reads in main.py
+
+# Texts per embeddings request, and how many requests may be in flight at once
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+# Fingerprint of everything stored for a row; a changed hash means the row needs writing
+def content_hash(productname, metadata):
+    fields = [productname] + [str(metadata[key]) for key in sorted(metadata) if key != "content_hash"]
+    return hashlib.sha1("\x1f".join(fields).encode("utf-8")).hexdigest()
 
 # 1. Read product data from CSV
 def load_products_from_csv(filepath):
-    products = []
-    metadatas = []
+    # Returns {product_id: (product name, metadata)} in CSV order
+    rows = {}
     with open(filepath, newline='', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
@@ -31,47 +49,99 @@ def load_products_from_csv(filepath):
             image_url = row.get('Image_Url', '').strip()
 
             if productname:
-                # Store only the product name in the text field
-                products.append(productname)
-                
-                # Store additional information in metadata
+                # Stable product id, shared with products.db
+                product_id = make_product_id(productname, packsize, category, subcategory, image_url)
+
+                # Store only the product name in the text field, everything else in metadata
                 metadata = {
+                    "product_id": product_id,
                     "packSize": packsize,
                     "price": price,
                     "category": category,
                     "subcategory": subcategory,
                     "image_url": image_url
                 }
-                metadatas.append(metadata)
+                metadata["content_hash"] = content_hash(productname, metadata)
+                rows.setdefault(product_id, (productname, metadata))
+
+    return rows
+
+# 2. Compare the CSV with what the store already holds
+def plan_changes(rows, collection, full=False):
+    # Returns (ids to embed, ids whose metadata alone changed, ids to delete)
+    stored = {}
+    for page in iter_collection(collection, page_size=1000, include=("documents", "metadatas")):
+        for row_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            stored[row_id] = (document, (metadata or {}).get("content_hash"))
+
+    to_embed, to_update = [], []
+    for product_id, (productname, metadata) in rows.items():
+        current = stored.get(product_id)
+        if full or current is None or current[0] != productname:
+            # New row, or the embedded text itself changed
+            to_embed.append(product_id)
+        elif current[1] != metadata["content_hash"]:
+            # Same name, new price / pack / image: no need to re-embed
+            to_update.append(product_id)
+    to_delete = [row_id for row_id in stored if row_id not in rows]
+    return to_embed, to_update, to_delete
 
-    return products, metadatas
+def batched(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
-# 2. Generate embeddings and save into Chroma
-def generate_and_save_embeddings():
+# 3. Embed new/changed rows and sync the Chroma store
+def generate_and_save_embeddings(batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY, full=False):
     # Load products
     print("🔵 Loading products from CSV...")
-    products, metadatas = load_products_from_csv(CSV_FILE)
+    rows = load_products_from_csv(CSV_FILE)
 
-    if not products:
+    if not rows:
         raise ValueError("CSV file is empty or improperly formatted!")
 
+    client = chromadb.PersistentClient(path=CHROMA_DIR)
+    collection = client.get_or_create_collection(COLLECTION)
+    to_embed, to_update, to_delete = plan_changes(rows, collection, full=full)
+    print(f"🟢 {len(rows)} products: {len(to_embed)} to embed, {len(to_update)} to update, "
+          f"{len(to_delete)} to delete, {len(rows) - len(to_embed) - len(to_update)} unchanged")
+
+    for ids in batched(to_delete, batch_size):
+        collection.delete(ids=ids)
+
+    for ids in batched(to_update, batch_size):
+        collection.update(ids=ids, metadatas=[rows[i][1] for i in ids])
+
     # Initialize OpenAI embeddings
     embeddings = OpenAIEmbeddings(api_key=openai_key)
 
-    # Create Chroma DB with metadata
-    print("🟢 Creating vector database with separated product names and pack sizes...")
-    vectordb = Chroma.from_texts(
-        texts=products,
-        embedding=embeddings,
-        metadatas=metadatas,
-        persist_directory=CHROMA_DIR
-    )
-
-    # Persist (save) the Chroma database
-    vectordb.persist()
-    print(f"✅ Embeddings generated and saved to '{CHROMA_DIR}/' folder.")
-    print(f"👍 Product names and pack sizes are now separated in the database.")
-
-# 3. Run
+    def embed_batch(ids):
+        return embeddings.embed_documents([rows[i][0] for i in ids])
+
+    # Each batch is written as soon as it is embedded, so the store itself is the
+    # checkpoint: re-running after an interruption only embeds what is still missing
+    batches = batched(to_embed, batch_size)
+    start = time.perf_counter()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for ids, vectors in zip(batches, executor.map(embed_batch, batches)):
+            collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                documents=[rows[i][0] for i in ids],
+                metadatas=[rows[i][1] for i in ids],
+            )
+            done += len(ids)
+            print(f"   embedded {done}/{len(to_embed)} ({done / (time.perf_counter() - start):.0f} rows/s)")
+
+    print(f"✅ Embeddings in '{CHROMA_DIR}/' are in sync with {CSV_FILE} ({collection.count()} products).")
+    if to_embed or to_delete:
+        print("👉 Re-run build_vector_index.py if you serve with RETRIEVAL_BACKEND=numpy.")
+
+# 4. Run
 if __name__ == "__main__":
-    generate_and_save_embeddings()
+    parser = argparse.ArgumentParser(description="Embed products.csv into the Chroma store, incrementally")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per embeddings request")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY, help="Embeddings requests in flight")
+    parser.add_argument("--full", action="store_true", help="Re-embed every product, not just new or renamed ones")
+    args = parser.parse_args()
+
+    generate_and_save_embeddings(batch_size=args.batch_size, concurrency=args.concurrency, full=args.full)
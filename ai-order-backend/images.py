@@ -0,0 +1,47 @@
+# === images.py ===
+# Shopping-list photo preprocessing before the vision call.
+#
+# Phone photos are often several MB and sideways. The vision model reads a list
+# just as well from a ~1.5k px JPEG, so uploads are decoded once, rotated upright
+# from their EXIF orientation, downscaled and re-encoded, which cuts upload
+# bandwidth and upstream latency.
+
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# Formats the vision API accepts as-is
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+
+class ImageError(ValueError):
+    pass
+
+
+def preprocess_image(contents, max_dim=1600, quality=85):
+    # Returns (bytes, mime type) ready for a data: URL
+    try:
+        image = Image.open(BytesIO(contents))
+        source_format = image.format
+        upright = image.getexif().get(0x0112, 1) == 1  # EXIF orientation tag
+        image.load()
+        image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        # PIL reports malformed headers and chunks as SyntaxError or ValueError
+        raise ImageError(f"Could not decode image: {e}")
+
+    if max(image.size) <= max_dim and source_format in MIME_TYPES and upright and len(contents) < 512 * 1024:
+        # Already small and upright: re-encoding would only cost quality
+        return contents, MIME_TYPES[source_format]
+
+    image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    if image.mode != "RGB":
+        # JPEG has no alpha; flatten transparent PNGs onto white paper
+        background = Image.new("RGB", image.size, "white")
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+
+    out = BytesIO()
+    image.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue(), "image/jpeg"
@@ -0,0 +1,81 @@
+# === lifecycle.py ===
+# Phased startup and readiness for the API process.
+#
+# Heavy resources (OpenAI clients, vector index, catalog, caches) are built by a
+# list of named phases run once when the app starts, each timed and logged. Until
+# the last phase has finished, ReadinessGate answers every request except the
+# probes with a 503, so a worker that is still loading never serves an order.
+
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}  # phase -> seconds, in the order they ran
+        self.current = None
+        self.ready = False
+        self.error = None
+
+    def run(self, phases):
+        # phases: [(name, callable)]; a failing phase is recorded, not raised, so
+        # /healthz can report it and the orchestrator restarts the worker
+        started = time.perf_counter()
+        for name, phase in phases:
+            with self.lock:
+                self.current = name
+            start = time.perf_counter()
+            try:
+                phase()
+            except Exception as e:
+                logger.exception("Startup phase %s failed", name)
+                with self.lock:
+                    self.error = f"{name}: {e}"
+                    self.current = None
+                return False
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.phases[name] = round(seconds, 3)
+            logger.info("Startup phase %s took %.2fs", name, seconds)
+        with self.lock:
+            self.current = None
+            self.ready = True
+        logger.info("Ready after %.2fs", time.perf_counter() - started)
+        return True
+
+    def status(self):
+        with self.lock:
+            return {
+                "ready": self.ready,
+                "phase": self.current,
+                "error": self.error,
+                "phases": dict(self.phases),
+            }
+
+
+class ReadinessGate:
+    # ASGI middleware: 503 with Retry-After for everything but the exempt paths until startup is done
+    def __init__(self, app, startup, exempt=("/healthz", "/readyz", "/metrics")):
+        self.app = app
+        self.startup = startup
+        self.exempt = set(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.startup.ready or scope["path"] in self.exempt:
+            return await self.app(scope, receive, send)
+        body = json.dumps({"detail": "Service is starting up"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,49 +1,106 @@
-import sqlite3
+import os
 import csv
+import time
+import sqlite3
+import argparse
+from itertools import islice
+
+from catalog import make_product_id
+from packs import parse_pack_size
+
+# File paths
+CSV_FILE = "products.csv"
+DB_FILE = "products.db"
+
+# Rows inserted per executemany call; the CSV is never held in memory as a whole
+CHUNK_SIZE = 10_000
+
+def read_rows(csv_path):
+    # Stream CSV rows as products table tuples
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            yield (
+                make_product_id(row["ProductName"], row["Quantity"], row["Category"], row["SubCategory"], row["Image_Url"]),
+                row["ProductName"],
+                float(row["Price"]),
+                row["Image_Url"],
+                row["Quantity"],
+                # Pack size normalized to an amount in g / ml / pcs
+                *parse_pack_size(row["Quantity"]),
+                row["Category"],
+                row["SubCategory"]
+            )
+
+# Build a complete database next to the live one, then swap it in with an atomic
+# rename. A running main.py keeps reading the old file until it reopens it, so it
+# never sees a missing or half-filled products table.
+def load_csv_to_db(csv_path=CSV_FILE, db_path=DB_FILE, chunk_size=CHUNK_SIZE):
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(tmp_path)
+    try:
+        # Nobody else can see this file yet, so skip journaling and fsyncs while loading
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA temp_store=MEMORY")
+
+        conn.execute("""
+            CREATE TABLE products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_id TEXT NOT NULL UNIQUE,
+                productname TEXT,
+                price REAL,
+                image_url TEXT,
+                quantity TEXT,
+                pack_amount REAL,
+                pack_unit TEXT,
+                category TEXT,
+                subcategory TEXT
+            )
+        """)
+
+        rows = read_rows(csv_path)
+        total = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            # A repeated product id keeps its first row
+            conn.executemany("""
+                INSERT OR IGNORE INTO products (product_id, productname, price, image_url, quantity, pack_amount, pack_unit, category, subcategory)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, chunk)
+            total += len(chunk)
+            print(f"   loaded {total} rows ({total / (time.perf_counter() - start):.0f} rows/s)")
+
+        # Indexes are cheaper to build once over the full table than to maintain per insert
+        conn.execute("CREATE INDEX idx_products_category ON products (category, subcategory)")
+        conn.execute("CREATE INDEX idx_products_subcategory ON products (subcategory)")
+        conn.execute("CREATE INDEX idx_products_name ON products (productname COLLATE NOCASE)")
+        conn.execute("ANALYZE")
+        conn.commit()
+        stored = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+
+    os.replace(tmp_path, db_path)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Done: {db_path} updated from {csv_path} ({stored} products, "
+          f"{total} rows in {elapsed:.2f}s, {total / elapsed:.0f} rows/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load products.csv into products.db")
+    parser.add_argument("--csv", default=CSV_FILE, help="Source CSV")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database to replace")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per insert batch")
+    args = parser.parse_args()
 
-# Connect to SQLite database
-conn = sqlite3.connect("products.db")
-cursor = conn.cursor()
-
-# Drop the existing table if it exists
-cursor.execute("DROP TABLE IF EXISTS products")
-
-# Create table with updated structure
-cursor.execute("""
-    CREATE TABLE products (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        productname TEXT,
-        price REAL,
-        image_url TEXT,
-        quantity TEXT,
-        category TEXT,
-        subcategory TEXT
-    )
-""")
-
-# Load CSV and insert data
-with open("products.csv", newline='', encoding='utf-8') as csvfile:
-    reader = csv.DictReader(csvfile)
-    products = [
-        (
-            row["ProductName"],
-            float(row["Price"]),
-            row["Image_Url"],
-            row["Quantity"],
-            row["Category"],
-            row["SubCategory"]
-        )
-        for row in reader
-    ]
-
-# Insert data into the new table
-cursor.executemany("""
-    INSERT INTO products (productname, price, image_url, quantity, category, subcategory)
-    VALUES (?, ?, ?, ?, ?, ?)
-""", products)
-
-# Commit and close
-conn.commit()
-conn.close()
-
-print("✅ Done: products.db updated from products.csv")
+    load_csv_to_db(csv_path=args.csv, db_path=args.db, chunk_size=args.chunk_size)
@@ -0,0 +1,50 @@
+# === logs.py ===
+# Leveled logging for the backend, tagged with the id of the request being served.
+#
+# The request id lives in a context variable: it follows the request through
+# awaits and into worker threads started with copy_context(), so log lines from
+# a worker still say which order they belong to. LOG_FORMAT=json emits one JSON
+# object per line for log shippers; the default is plain text.
+
+import json
+import uuid
+import logging
+import contextvars
+
+request_id = contextvars.ContextVar("request_id", default="-")
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(level="INFO", fmt="text"):
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
@@ -1,29 +1,183 @@
 # === main.py ===
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from pydantic import BaseModel
+from typing import Optional
 import os
 import json
-import sqlite3
+import asyncio
+import logging
+import contextvars
+import weakref
+import zlib
 import base64
-from io import BytesIO
-from PIL import Image
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
 from dotenv import load_dotenv
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.prompts import PromptTemplate
+# langchain_openai, openai and Chroma take seconds to import; they are loaded by
+# the startup phases, so importing this module for tests or tooling stays cheap
+from langchain_core.prompts import PromptTemplate
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+
+from cache import ResultCache, PersistentStore, file_fingerprint, normalize_text
+from retrieval import QueryEmbedder, ChromaIndex, NumpyIndex, PartitionedIndex, SNAPSHOT_VECTORS
+from catalog import ProductCatalog, LISTING_COLUMNS, iter_listing
+from packs import to_base, solve_packs
+from fastpath import HEADING, FastPathResolver, clean_line, is_heading
+from images import preprocess_image, ImageError
+from audio import COMPRESSED_BITS_PER_SECOND, audio_duration, compressed_max_bytes, upload_filename
+from timing import timed, stage_timings
+from logs import setup_logging
+from metrics import registry, stage_seconds, RequestMetrics
+from lifecycle import Startup, ReadinessGate
+from bulk import BulkPlan, BulkError, parse_orders
+from normalize import Normalizer, split_order
+from stores import StoreRegistry, StoreUnavailable, UnknownStore
+from gateway import UpstreamGateway, UpstreamBusy, GatewayEmbeddings, make_http_client, parse_limits, estimate_tokens
 
 # === Load environment variables ===
 load_dotenv()
 openai_key = os.getenv("OPENAI_API_KEY")
-if not openai_key:
-    raise ValueError("Missing OPENAI_API_KEY")
+
+# === Logging ===
+# LOG_LEVEL=DEBUG adds per-stage timing spans and dumps of queries, LLM answers
+# and results; LOG_FORMAT=json writes one JSON object per line
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+setup_logging(LOG_LEVEL, LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# === Order processing settings ===
+# Max items of one order resolved in parallel, the per-item time budget (seconds),
+# and the size of the worker pool shared by all requests for blocking calls
+ITEM_CONCURRENCY = int(os.getenv("ITEM_CONCURRENCY", "8"))
+ITEM_TIMEOUT = float(os.getenv("ITEM_TIMEOUT", "30"))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "32"))
+# "batch" extracts all items of an order in one LLM call (falling back per item
+# on failure), "item" sends one extraction call per item
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "batch")
+BATCH_EXTRACT_SIZE = int(os.getenv("BATCH_EXTRACT_SIZE", "20"))
+# Time budget of one batched extraction call: a base plus an allowance per item,
+# since the answer grows with the batch
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", "30"))
+BATCH_ITEM_TIMEOUT = float(os.getenv("BATCH_ITEM_TIMEOUT", "3"))
+
+# === Data locations and cache settings ===
+PRODUCTS_DB = "products.db"
+CHROMA_DIR = "./chroma_db"
+# Correction/extraction cache: in-memory LRU size, entry TTL (seconds) and the
+# SQLite file of the persistent tier (empty disables it)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "4096"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "86400"))
+CACHE_DB = os.getenv("CACHE_DB", "cache.db")
+
+# Largest page GET /products serves when a limit is given
+PRODUCTS_MAX_LIMIT = int(os.getenv("PRODUCTS_MAX_LIMIT", "1000"))
+
+# === Upload settings ===
+# Image uploads above IMAGE_MAX_BYTES are rejected; the rest are downscaled to
+# IMAGE_MAX_DIM pixels on the long side and re-encoded as JPEG at IMAGE_JPEG_QUALITY
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(15 * 1024 * 1024)))
+IMAGE_MAX_DIM = int(os.getenv("IMAGE_MAX_DIM", "1600"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# Audio uploads: size and duration limits, and how many transcriptions may run at
+# once. Clips without a stated duration (webm/ogg) are held to the size of an
+# AUDIO_MAX_SECONDS clip at AUDIO_MAX_BITRATE bits per second.
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(25 * 1024 * 1024)))
+AUDIO_MAX_SECONDS = float(os.getenv("AUDIO_MAX_SECONDS", "300"))
+AUDIO_MAX_BITRATE = int(os.getenv("AUDIO_MAX_BITRATE", str(COMPRESSED_BITS_PER_SECOND)))
+AUDIO_CONCURRENCY = int(os.getenv("AUDIO_CONCURRENCY", "4"))
+
+# === Upstream settings ===
+LLM_MODEL = "gpt-4o"
+EMBED_MODEL = "text-embedding-ada-002"
+WHISPER_MODEL = "whisper-1"
+# Per-model limits as model=requests_per_minute:tokens_per_minute (0 = unlimited);
+# set them a little under the account's OpenAI limits
+UPSTREAM_LIMITS = parse_limits(os.getenv(
+    "UPSTREAM_LIMITS", f"{LLM_MODEL}=500:30000,{EMBED_MODEL}=3000:1000000,{WHISPER_MODEL}=50:0"
+))
+# Longest a call may wait for rate-limit capacity before the request gets a 429,
+# how many calls may wait at once before new ones get a 503, retries for
+# transient upstream errors, and the size of the shared keep-alive connection pool
+UPSTREAM_MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT", "10"))
+UPSTREAM_MAX_QUEUE = int(os.getenv("UPSTREAM_MAX_QUEUE", "256"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "64"))
+
+# === Retrieval settings ===
+# Candidates retrieved per item, and how many item embeddings to memoize in memory
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "5"))
+EMBED_CACHE_ENTRIES = int(os.getenv("EMBED_CACHE_ENTRIES", "8192"))
+# "chroma" or "numpy" (in-memory matrix, see build_vector_index.py)
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma")
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "vector_index")
+# NumPy backend only: search just the rows of the SEARCH_PARTITIONS subcategories
+# closest to each item instead of the whole catalog (0 searches everything)
+SEARCH_PARTITIONS = int(os.getenv("SEARCH_PARTITIONS", "0"))
+
+# === Store settings ===
+# Orders may name a store; each has products.db and chroma_db/ or vector_index/
+# under STORES_DIR/<store id>/, and the files above serve DEFAULT_STORE. Stores
+# load on first use and the least recently used are evicted once the loaded ones
+# take more than STORE_MEMORY_MB (the default store is never evicted).
+STORES_DIR = os.getenv("STORES_DIR", "stores")
+DEFAULT_STORE = os.getenv("DEFAULT_STORE", "default")
+STORE_MEMORY_MB = int(os.getenv("STORE_MEMORY_MB", "2048"))
+
+# === Fast path settings ===
+# Resolve obvious lines locally before the LLM: minimum similarity of the top
+# vector hit, and how far it must lead the best hit for a different product
+FASTPATH = os.getenv("FASTPATH", "1") == "1"
+FASTPATH_MIN_SCORE = float(os.getenv("FASTPATH_MIN_SCORE", "0.9"))
+FASTPATH_MIN_MARGIN = float(os.getenv("FASTPATH_MIN_MARGIN", "0.03"))
+
+# === Normalizer settings ===
+# Fix spelling and translate order text locally; the LLM corrector only sees
+# orders where more than NORMALIZE_MAX_UNKNOWN of the product words are unknown
+NORMALIZER = os.getenv("NORMALIZER", "1") == "1"
+NORMALIZE_MAX_UNKNOWN = float(os.getenv("NORMALIZE_MAX_UNKNOWN", "0.25"))
+# While an order is with the LLM corrector, retrieve candidates for its locally
+# normalized items; items the correction leaves unchanged keep them
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") == "1"
+
+# === Bulk order settings ===
+# Largest accepted bulk upload (bytes and orders), distinct lines resolved per
+# chunk (one correction call and one batched extraction each), and chunks in flight
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(10 * 1024 * 1024)))
+BULK_MAX_ORDERS = int(os.getenv("BULK_MAX_ORDERS", "10000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "20"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+
+# === Startup settings ===
+# Run one embeddings call + vector search before reporting ready, so the first
+# order doesn't pay for the TLS handshake and cold index pages
+WARMUP = os.getenv("WARMUP", "1") == "1"
+WARMUP_QUERY = "onion"
 
 # === Setup FastAPI ===
-app = FastAPI()
+# Resources are built in a background thread once the server starts; /healthz
+# answers right away, /readyz and every other route wait for the last phase
+startup = Startup()
+
+@asynccontextmanager
+async def lifespan(app):
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, start, WARMUP)
+    yield
+    shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
+# Innermost, so its 503s still get CORS headers
+app.add_middleware(ReadinessGate, startup=startup)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -31,30 +185,63 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost: request ids, in-flight gauge and response timings for /metrics
+app.add_middleware(RequestMetrics)
 
 # === Request model ===
 class OrderRequest(BaseModel):
     query: str
+    store: Optional[str] = None
 
-# === Load Chroma DB ===
-embeddings = OpenAIEmbeddings(api_key=openai_key)
-vectordb = Chroma(persist_directory="./chroma_db", embedding_function=embeddings)
+# === Upstream gateway ===
+# One pooled HTTP client and one admission controller for every OpenAI call;
+# the clients' own retries are off so each attempt goes through the limiter
+http_client = make_http_client(UPSTREAM_MAX_CONNECTIONS)
+upstream = UpstreamGateway(
+    UPSTREAM_LIMITS, max_wait=UPSTREAM_MAX_WAIT, max_queue=UPSTREAM_MAX_QUEUE, max_retries=UPSTREAM_MAX_RETRIES
+)
 
-# === Initialize LLM ===
-llm = ChatOpenAI(model="gpt-4o", api_key=openai_key, temperature=0)
+# === Resources ===
+# Set by the startup phases below
+embeddings = query_embedder = None
+llm = openai_client = correct_chain = None
+cache_store = correction_cache = extraction_cache = image_cache = audio_cache = None
 
-# Initialize OpenAI client for direct API calls
-import openai
-import tempfile
-import shutil
-openai_client = openai.OpenAI(api_key=openai_key)
+# Shared pool for blocking vector search / LLM calls made on behalf of requests
+item_executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="order-worker")
+# Separate, smaller pool for Whisper calls; its size is the transcription concurrency limit
+transcribe_executor = ThreadPoolExecutor(max_workers=AUDIO_CONCURRENCY, thread_name_prefix="transcribe")
 
 # === Define Prompts ===
+# Matching and quantity rules shared by the single-item and batched extraction prompts
+EXTRACT_RULES = """- Only pick products listed in CONTEXT, and return their id EXACTLY as it appears in the id column.
+- Be precise with product matching:
+  * IMPORTANT: You MUST return a product for each item in the query. Never return an empty array.
+  * If a user asks for a generic product (e.g., "milk"), ONLY return the most basic version of that product.
+  * For "milk" without specifying a quantity, look for regular dairy milk products like "GoodLife UHT Treated Toned Milk".
+  * Check the product name to ensure you're returning the correct product:
+    - For "milk", look for regular dairy milk products like "Toned Milk" or "Full Cream Milk".
+    - Do NOT return specialty milks like "Coconut Milk", "Almond Milk", or "Soy Milk" when the user just asks for "milk".
+  * If a user asks for a generic product like  for example "toothpaste", only return ONE basic option, not all available variants.
+  * Only return specific variants if the user explicitly asks for them (e.g., "coconut milk" or "colgate toothpaste").
+- Handle quantities:
+  * "ids" holds the id of the product the customer wants. If the SAME product is listed in several pack sizes
+    (e.g. "Onion" with pack "5 kg" and "Onion (Loose)" with pack "2 kg"), include the ids of all of those packs.
+  * If the customer asks for a weight, volume or piece count (e.g. "7 kg", "500 gm", "2 ltr", "6 pcs"), return it as
+    "amount" (a number) and "unit" (one of g, kg, ml, l, pcs) and leave out "quantity".
+    Do NOT work out package combinations yourself; they are computed from the amount.
+  * Otherwise return "quantity": how many packages the customer needs (e.g. "2 packets" -> 2), NOT the weight or volume.
+  * If they ask for "1 onion" or "2 onions" (without specifying kg), put the smallest available package first in "ids".
+- If quantity not mentioned, default to quantity 1.
+- The query may contain other languages or spelling mistakes; match it to the English product names.
+- Output only pure JSON. No extra text.
+"""
+
 EXTRACT_PROMPT = PromptTemplate(
     input_variables=["context", "query"],
     template="""
 You are an AI grocery assistant.
-Given the CONTEXT of available grocery products with their metadata:
+Given the CONTEXT table of available grocery products:
 {context}
 
 And a CUSTOMER QUERY:
@@ -62,45 +249,34 @@ And a CUSTOMER QUERY:
 
 Extract and return the order as a valid JSON list:
 [
-  {{
-    "productname": "product name",
-    "quantity": numeric_quantity_only,
-    "metadata": {{
-      "packSize": "pack size from metadata",
-      "price": "price from metadata",
-      "category": "category from metadata",
-      "subcategory": "subcategory from metadata"
-    }}
-  }},
+  {{"ids": ["product id from CONTEXT"], "quantity": number_of_packages}},
+  {{"ids": ["product id from CONTEXT", "same product in another pack"], "amount": requested_amount, "unit": "kg"}},
   ...
 ]
 
 Rules:
-- Pick product names EXACTLY as they appear in CONTEXT.
-- Use the metadata information (packSize, price, category, subcategory) exactly as provided in the context.
-- For quantity, ONLY return the numeric value (e.g., "1" not "1 kg"). Units are already specified in packSize.
-- Be precise with product matching:
-  * IMPORTANT: You MUST return a product for each item in the query. Never return an empty array.
-  * If a user asks for a generic product (e.g., "milk"), ONLY return the most basic version of that product.
-  * For "milk" without specifying a quantity, look for regular dairy milk products like "GoodLife UHT Treated Toned Milk".
-  * Check the product name and metadata to ensure you're returning the correct product:
-    - For "milk", prioritize products with "Milk" in the subcategory and avoid products like "Coconut Milk".
-    - For "milk", look for regular dairy milk products like "Toned Milk" or "Full Cream Milk".
-    - Do NOT return specialty milks like "Coconut Milk", "Almond Milk", or "Soy Milk" when the user just asks for "milk".
-  * If a user asks for a generic product like  for example "toothpaste", only return ONE basic option, not all available variants.
-  * Only return specific variants if the user explicitly asks for them (e.g., "coconut milk" or "colgate toothpaste").
-- Handle quantities intelligently:
-  * If a customer asks for a quantity that doesn't match available package sizes, suggest combinations of available packages.
-  * For example, if they ask for 7kg of onions and you have "Onion" with packSize "5 kg" and "Onion" with packSize "2 kg", 
-    return TWO items: one with packSize "5 kg" and quantity "1", and another with packSize "2 kg" and quantity "1".
-  * IMPORTANT: The quantity field should represent how many packages the customer needs, NOT the weight or volume.
-  * If they ask for "1 onion" or "2 onions" (without specifying kg), choose the smallest available package.
-  * If they ask for an in-between quantity (e.g., "2.5 kg of onion"), round to the nearest available package size or suggest a combination.
-- If quantity not mentioned, default to 1.
-- Translate any language to English.
-- Fix spelling mistakes.
-- Output only pure JSON. No extra text.
-"""
+""" + EXTRACT_RULES
+)
+
+BATCH_EXTRACT_PROMPT = PromptTemplate(
+    input_variables=["items"],
+    template="""
+You are an AI grocery assistant.
+A customer order has been split into numbered ITEMS. Each ITEM has its own CUSTOMER QUERY
+and its own CONTEXT table of available grocery products:
+{items}
+
+Extract every ITEM independently and return ONE valid JSON object keyed by the item number.
+Each value is the JSON list you would return for that item alone:
+{{
+  "1": [{{"ids": ["product id from CONTEXT"], "quantity": number_of_packages}}],
+  "2": [...],
+  ...
+}}
+
+Rules:
+- Return a key for EVERY item number. Only pick products from that item's own CONTEXT.
+""" + EXTRACT_RULES
 )
 
 CORRECT_PROMPT = PromptTemplate(
@@ -115,292 +291,1124 @@ Messy input:
 """
 )
 
-# === Setup LLM chains ===
-correct_chain = CORRECT_PROMPT | llm
+# Entries are stamped with the catalog version, so reloading products.db or
+# rebuilding the embeddings invalidates them
+def catalog_version():
+    return file_fingerprint(
+        PRODUCTS_DB,
+        os.path.join(CHROMA_DIR, "chroma.sqlite3"),
+        os.path.join(VECTOR_SNAPSHOT_DIR, SNAPSHOT_VECTORS),
+    )
+
+# The same fingerprint for any store's files
+def store_version(store):
+    return file_fingerprint(
+        store.products_db,
+        os.path.join(store.chroma_dir, "chroma.sqlite3"),
+        os.path.join(store.snapshot_dir, SNAPSHOT_VECTORS),
+    )
+
+# === Startup phases ===
+# OpenAI clients (LLM, embeddings, vision/Whisper) on the shared HTTP pool
+def load_clients():
+    global embeddings, query_embedder, llm, openai_client, correct_chain
+    if not openai_key:
+        raise ValueError("Missing OPENAI_API_KEY")
+    import openai
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+    embeddings = OpenAIEmbeddings(model=EMBED_MODEL, api_key=openai_key, http_client=http_client, max_retries=0)
+    query_embedder = QueryEmbedder(GatewayEmbeddings(embeddings, upstream, EMBED_MODEL), max_entries=EMBED_CACHE_ENTRIES)
+    llm = ChatOpenAI(model=LLM_MODEL, api_key=openai_key, temperature=0, http_client=http_client, max_retries=0)
+    openai_client = openai.OpenAI(api_key=openai_key, http_client=http_client, max_retries=0)
+    correct_chain = CORRECT_PROMPT | llm
+
+# === Store loading ===
+# Vector search backend: query Chroma directly, or hold the catalog as a NumPy matrix
+# (from the build_vector_index.py snapshot when present, otherwise read out of Chroma).
+# A snapshot is mmapped, so workers share its pages and never open the Chroma store.
+def load_vector_index(store):
+    if RETRIEVAL_BACKEND == "numpy" and os.path.exists(os.path.join(store.snapshot_dir, SNAPSHOT_VECTORS)):
+        store.vector_index = NumpyIndex.load(store.snapshot_dir)
+    else:
+        from langchain_community.vectorstores import Chroma
+
+        # Chroma would create an empty store here and serve no matches
+        if not os.path.exists(os.path.join(store.chroma_dir, "chroma.sqlite3")):
+            raise StoreUnavailable(f"Store {store.store_id} has no vector store: {store.chroma_dir} is missing")
+
+        store.vectordb = Chroma(persist_directory=store.chroma_dir, embedding_function=embeddings)
+        if RETRIEVAL_BACKEND == "numpy":
+            store.vector_index = NumpyIndex.from_collection(store.vectordb._collection)
+        else:
+            store.vector_index = ChromaIndex(store.vectordb)
+    if RETRIEVAL_BACKEND == "numpy" and SEARCH_PARTITIONS:
+        store.vector_index = PartitionedIndex(store.vector_index, probes=SEARCH_PARTITIONS)
+
+# Lookup maps over the store's products.db, the fast-path resolver built on them
+# and the normalizer's vocabulary
+def load_catalog(store):
+    store.catalog = ProductCatalog(store.products_db)
+    store.fast_path = FastPathResolver(
+        store.catalog, partial(retrieve_scored, store=store), FASTPATH_MIN_SCORE, FASTPATH_MIN_MARGIN
+    )
+    store.normalizer = Normalizer([product["productname"] for product in store.catalog.by_product_id.values()])
+
+def load_store(store):
+    if store.store_id == DEFAULT_STORE:
+        store.snapshot_dir = VECTOR_SNAPSHOT_DIR
+    store.version_fn = partial(store_version, store)
+    load_vector_index(store)
+    load_catalog(store)
+
+# Chroma caches one System per persist directory for the life of the process, so
+# dropping an evicted Store alone frees none of its Chroma memory. Forget the
+# System here and stop it once the last request still holding the store is done.
+def unload_store(store):
+    if store.vectordb is None:
+        return
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    client = store.vectordb._client
+    system = SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+    if system is not None:
+        weakref.finalize(store, system.stop)
+
+stores = StoreRegistry(load_store, DEFAULT_STORE, ".", STORES_DIR, STORE_MEMORY_MB * 2**20, unload=unload_store)
+
+# Store of the request being served. The order endpoints set it; run_blocking
+# copies it into the worker threads along with the rest of the context.
+active_store = contextvars.ContextVar("active_store", default=None)
+
+def current_store():
+    return active_store.get() or stores.default
+
+# Load (or find) the store an order names and make it the active one; 404 for
+# unknown ids, 503 for stores whose files are incomplete
+async def use_store(store_id):
+    try:
+        store = await run_blocking(stores.get, store_id)
+    except UnknownStore as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except StoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    active_store.set(store)
+    return store
+
+def open_caches():
+    global cache_store, correction_cache, extraction_cache, image_cache, audio_cache
+    cache_store = PersistentStore(CACHE_DB) if CACHE_DB else None
+    correction_cache = ResultCache("correct", CACHE_MAX_ENTRIES, CACHE_TTL, cache_store, catalog_version)
+    extraction_cache = ResultCache("extract", CACHE_MAX_ENTRIES, CACHE_TTL, cache_store, catalog_version)
+    # Keyed by upload content hash; what a photo says does not depend on the catalog
+    image_cache = ResultCache("image", CACHE_MAX_ENTRIES, CACHE_TTL, cache_store)
+    audio_cache = ResultCache("audio", CACHE_MAX_ENTRIES, CACHE_TTL, cache_store)
+
+# First embed + search: opens the pooled connection to OpenAI and faults in the
+# index pages. An upstream hiccup here is logged, not fatal; requests will retry.
+def warm_up():
+    try:
+        retrieve_scored([WARMUP_QUERY])
+    except Exception as e:
+        logger.warning("Warm-up embedding failed: %s", e)
+
+STARTUP_PHASES = [
+    ("clients", load_clients),
+    ("default_store", stores.load_default),
+    ("caches", open_caches),
+    ("warmup", warm_up),
+]
+
+def start(warmup=True):
+    return startup.run([(name, phase) for name, phase in STARTUP_PHASES if warmup or name != "warmup"])
+
+def shutdown():
+    item_executor.shutdown(wait=False, cancel_futures=True)
+    transcribe_executor.shutdown(wait=False, cancel_futures=True)
+    http_client.close()
+
+# === Metrics ===
+# Stage timings feed the /metrics histogram and, at DEBUG, one span line each
+def record_stage(stage, seconds):
+    stage_seconds.observe(stage, value=seconds)
+    logger.debug("span %s %.1f ms", stage, seconds * 1000)
+
+stage_timings.add_hook(record_stage)
+
+order_items = registry.counter("order_items_total", "Order lines by how they were resolved", ("source",))
+corrections = registry.counter("corrections_total", "Order text corrections by where they ran", ("path",))
+speculations = registry.counter(
+    "speculations_total", "LLM-corrected orders by how many speculative candidates were kept", ("outcome",)
+)
+speculation_saved = registry.counter(
+    "speculation_saved_seconds_total", "Retrieval time hidden behind the LLM correction call"
+)
+
+# Cache and upstream counters are kept by their owners; read them at scrape time
+def cache_metrics():
+    if not startup.ready:
+        return []
+    caches = {
+        "correct": correction_cache, "extract": extraction_cache, "image": image_cache,
+        "audio": audio_cache, "embed": query_embedder.cache,
+    }
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    return [
+        ("cache_hits_total", "counter", "Cache hits by tier", ("cache", "tier"),
+         [((name, "memory"), s["hits"]) for name, s in stats.items()]
+         + [((name, "persistent"), s["persistent_hits"]) for name, s in stats.items()]),
+        ("cache_misses_total", "counter", "Cache misses", ("cache",), [((name,), s["misses"]) for name, s in stats.items()]),
+        ("cache_coalesced_total", "counter", "Lookups that waited on an identical in-flight computation", ("cache",),
+         [((name,), s["coalesced"]) for name, s in stats.items()]),
+        ("cache_evictions_total", "counter", "LRU evictions", ("cache",), [((name,), s["evictions"]) for name, s in stats.items()]),
+        ("cache_hit_ratio", "gauge", "Hits / lookups since startup", ("cache",), [((name,), s["hit_rate"]) for name, s in stats.items()]),
+        ("cache_entries", "gauge", "Entries in the in-memory tier", ("cache",), [((name,), s["size"]) for name, s in stats.items()]),
+    ]
+
+def upstream_metrics():
+    stats = upstream.stats()
+    models = stats["models"]
+    return [
+        ("upstream_calls_total", "counter", "OpenAI calls made, including retries", ("model",),
+         [((model,), c["calls"]) for model, c in models.items()]),
+        ("upstream_retries_total", "counter", "Retried OpenAI calls", ("model",), [((model,), c["retries"]) for model, c in models.items()]),
+        ("upstream_errors_total", "counter", "OpenAI calls that failed after all retries", ("model",),
+         [((model,), c["errors"]) for model, c in models.items()]),
+        ("upstream_rejected_total", "counter", "Calls refused by the gateway", ("model", "status"),
+         [((model, "429"), c["rejected_429"]) for model, c in models.items()]
+         + [((model, "503"), c["rejected_503"]) for model, c in models.items()]),
+        ("upstream_wait_seconds_total", "counter", "Time spent waiting for rate-limit capacity", ("model",),
+         [((model,), c["wait_seconds"]) for model, c in models.items()]),
+        ("upstream_tokens_total", "counter", "Tokens: reserved (estimated) and reported prompt/completion usage", ("model", "kind"),
+         [((model, kind), c[f"{kind}_tokens"]) for model, c in models.items() for kind in ("reserved", "prompt", "completion")]),
+        ("upstream_waiting", "gauge", "Calls waiting for rate-limit capacity", (), [((), stats["waiting"])]),
+        ("executor_queue_depth", "gauge", "Blocking calls queued for a worker thread", ("pool",),
+         [(("order-worker",), item_executor._work_queue.qsize()), (("transcribe",), transcribe_executor._work_queue.qsize())]),
+    ]
+
+def startup_metrics():
+    status = startup.status()
+    return [
+        ("ready", "gauge", "1 once every startup phase has finished", (), [((), int(status["ready"]))]),
+        ("startup_phase_seconds", "gauge", "Duration of each startup phase", ("phase",),
+         [((phase,), seconds) for phase, seconds in status["phases"].items()]),
+    ]
+
+def store_metrics():
+    stats = stores.stats()
+    return [
+        ("stores_loaded", "gauge", "Store catalogs currently in memory", (), [((), len(stats["loaded"]))]),
+        ("store_memory_bytes", "gauge", "Estimated size of the loaded stores", (), [((), stats["resident_bytes"])]),
+        ("store_loads_total", "counter", "Store catalogs loaded", (), [((), stats["loads"])]),
+        ("store_evictions_total", "counter", "Store catalogs evicted to stay under the memory budget", (),
+         [((), stats["evictions"])]),
+        ("store_load_seconds_total", "counter", "Time spent loading store catalogs", (), [((), stats["load_seconds"])]),
+    ]
+
+registry.add_collector(cache_metrics)
+registry.add_collector(upstream_metrics)
+registry.add_collector(startup_metrics)
+registry.add_collector(store_metrics)
 
 # === Helper functions ===
+# Newlines, commas, semicolons, danda, "+", "&" and "and" in the supported languages
+@timed("split")
 def split_items(text):
-    for sep in [",", " and ", " aur ", "&", "\n"]:
-        text = text.replace(sep, "|")
-    return [item.strip() for item in text.split("|") if item.strip()]
+    return split_order(text)
+
+# === Order resolution stages ===
+# All stages are blocking; run them through the worker pool, never directly on the event loop.
+def parse_llm_json(response_raw):
+    return json.loads(response_raw.replace("```json", "").replace("```", "").strip())
+
+# Vector search for all split items of an order: one batched (memoized) embeddings
+# request, then one multi-query top-k. Returns (doc, similarity) hits per item,
+# limited to documents that map to a catalog row.
+def retrieve_scored(items, store=None):
+    store = store or current_store()
+    catalog = store.catalog
+    with timed("embed"):
+        vectors = query_embedder.embed_many(items)
+    with timed("search"):
+        all_hits = store.vector_index.search_many(vectors, k=RETRIEVAL_K)
+    results = []
+    for hits in all_hits:
+        for doc, _score in hits:
+            # Stores embedded before rows carried ids only know name + pack size
+            if not doc.metadata.get("product_id"):
+                doc.metadata["product_id"] = catalog.id_for(doc.page_content, doc.metadata.get("packSize"))
+        results.append([(doc, score) for doc, score in hits if catalog.get(doc.metadata.get("product_id"))])
+    return results
+
+# Candidate docs (or None) per item for the extraction prompts
+@timed("retrieve")
+def retrieve_many(items):
+    candidates = []
+    for item, hits in zip(items, retrieve_scored(items)):
+        if not hits:
+            logger.info("No similar documents found for %r", item)
+            candidates.append(None)
+            continue
+        logger.debug("Found %d similar documents for %r", len(hits), item)
+        candidates.append([doc for doc, _score in hits])
+    return candidates
+
+def retrieve_candidates(item):
+    return retrieve_many([item])[0]
+
+# Render candidate docs as the compact CONTEXT table of the extraction prompts,
+# with name, pack size and price taken from the catalog row
+def build_context(similar_docs):
+    lines = ["id | name | pack | price"]
+    for product in current_store().catalog.get_many([doc.metadata["product_id"] for doc in similar_docs]):
+        lines.append(f"{product['product_id']} | {product['productname']} | {product['packSize']} | {product['price']}")
+    return "\n".join(lines)
+
+# Cache key prefix for the active store. The caches' version only follows the
+# default store's files, so every other store puts its id and the fingerprint of
+# its own files in the key: rebuilding that store leaves its old entries unused.
+def store_scope():
+    store = current_store()
+    return "" if store.store_id == DEFAULT_STORE else f"{store.store_id}@{store.version()}|"
+
+# Extraction cache key: the normalized item plus the ids of the retrieved candidates,
+# scoped to the store, since the prompt shows the store's prices
+def extraction_key(item, similar_docs):
+    candidate_ids = ",".join(doc.metadata["product_id"] for doc in similar_docs)
+    return f"{store_scope()}{normalize_text(item)}|{candidate_ids}"
+
+# LLM spelling correction / translation, cached by store and normalized query
+@timed("correct")
+def correct_query(query):
+    return correction_cache.get_or_compute(
+        store_scope() + normalize_text(query),
+        lambda: upstream.call(
+            LLM_MODEL, correct_chain.invoke, {"query": query}, tokens=2 * estimate_tokens(query) + 100
+        ).content.strip(),
+    )
+
+# Correct several lines in one LLM call; when the answer doesn't come back one line
+# per input line, each of them on its own. Returns the corrected text per line.
+def correct_each(lines):
+    answer = [line for line in correct_query("\n".join(lines)).splitlines() if line.strip()]
+    if len(answer) != len(lines):
+        logger.debug("Correction returned %d lines for %d, correcting per line", len(answer), len(lines))
+        answer = [correct_query(line) for line in lines]
+    return answer
+
+# Step 1: spelling and aliases from the catalog vocabulary. Orders that are
+# mostly unknown words (another language, heavy slang) still go to the LLM.
+@timed("normalize")
+def normalize_order(lines):
+    # -> (normalized items per line, whether they are good enough to skip the LLM corrector)
+    if not NORMALIZER:
+        return [split_items(line) for line in lines], False
+    normalized = [current_store().normalizer.normalize(line) for line in lines]
+    words = sum(text.words for text in normalized)
+    unknown = sum(text.unknown for text in normalized)
+    if not words or unknown / words <= NORMALIZE_MAX_UNKNOWN:
+        return [text.lines for text in normalized], True
+    logger.debug("%d/%d words unknown, correcting with the LLM", unknown, words)
+    return [text.lines for text in normalized], False
+
+# [[items of line 0], [items of line 1], ...] -> (items, index of the line each came from)
+def flatten_lines(items_per_line):
+    items, owners = [], []
+    for index, line_items in enumerate(items_per_line):
+        items.extend(line_items)
+        owners.extend([index] * len(line_items))
+    return items, owners
+
+# Extraction prompt through the gateway; the token estimate covers prompt + answer
+def invoke_llm(formatted_prompt, output_tokens):
+    tokens = estimate_tokens(formatted_prompt.to_string()) + output_tokens
+    return upstream.call(LLM_MODEL, llm.invoke, formatted_prompt, tokens=tokens).content.strip()
+
+# Per-item extraction: one LLM call, returns the parsed entry list or None
+def extract_item(item, similar_docs):
+    return extraction_cache.get_or_compute(
+        extraction_key(item, similar_docs),
+        lambda: call_extract_item(item, build_context(similar_docs)),
+    )
+
+def call_extract_item(item, context):
+    formatted_prompt = EXTRACT_PROMPT.format_prompt(context=context, query=item)
+    with timed("extract"):
+        response_raw = invoke_llm(formatted_prompt, output_tokens=100)
+    try:
+        response_json = parse_llm_json(response_raw)
+    except json.JSONDecodeError:
+        logger.warning("Failed to parse JSON: %s", response_raw)
+        return None
+    logger.debug("LLM extracted: %s", response_json)
+    return response_json if isinstance(response_json, list) else None
+
+# Batched extraction: one LLM call for several (item, candidate docs) pairs.
+# Returns {index: product list} for the items that were cached or came back
+# well-formed; anything missing is left for the caller to retry through extract_item.
+# Items another request is already extracting are waited for, not asked again.
+def extract_batch(entries):
+    keys = [extraction_key(item, similar_docs) for item, similar_docs in entries]
+    first = {}  # key -> index of the first entry with that key
+    for index, key in enumerate(keys):
+        first.setdefault(key, index)
+
+    def call(missing):
+        blocks = []
+        for number, key in enumerate(missing, start=1):
+            item, similar_docs = entries[first[key]]
+            blocks.append(f"### ITEM {number}\nCUSTOMER QUERY:\n{item}\nCONTEXT:\n{build_context(similar_docs)}")
+        formatted_prompt = BATCH_EXTRACT_PROMPT.format_prompt(items="\n\n".join(blocks))
+        with timed("extract_batch"):
+            response_raw = invoke_llm(formatted_prompt, output_tokens=100 * len(missing))
+        try:
+            response_json = parse_llm_json(response_raw)
+        except json.JSONDecodeError:
+            logger.warning("Failed to parse batch JSON: %s", response_raw)
+            return {}
+        if not isinstance(response_json, dict):
+            logger.warning("Batch response is not a JSON object: %s", response_raw)
+            return {}
+        products = {}
+        for number, key in enumerate(missing, start=1):
+            item_products = response_json.get(str(number))
+            if isinstance(item_products, list) and item_products:
+                products[key] = item_products
+        return products
+
+    found = extraction_cache.get_or_compute_many(keys, call)
+    extracted = {index: found[key] for index, key in enumerate(keys) if key in found}
+    logger.debug("Batch extracted %d/%d items", len(extracted), len(entries))
+    return extracted
+
+# Turn one extracted entry into concrete (product_id, packages) lines. A requested
+# amount ("7 kg") is split into the best combination of the listed packs locally.
+def expand_packs(product_item):
+    ids = product_item.get("ids") or [product_item.get("id")]
+    catalog = current_store().catalog
+    products = [product for product in catalog.get_many([str(i) for i in ids if i is not None]) if product]
+    if not products:
+        logger.warning("Skipping unknown product ids from LLM: %s", product_item)
+        return []
+
+    try:
+        amount = float(product_item.get("amount"))
+    except (TypeError, ValueError):
+        amount = None
+    requested, unit = to_base(amount, product_item.get("unit"))
+    if requested:
+        packs = [
+            (product["product_id"], product["pack_amount"], product["price"])
+            for product in products if product["pack_unit"] == unit
+        ]
+        combination = solve_packs(requested, packs)
+        if combination:
+            return combination
+    return [(products[0]["product_id"], product_item.get("quantity") or 1)]
+
+# Join the extracted entries of a whole order to the catalog by product id
+@timed("enrich")
+def enrich_products(extracted):
+    catalog = current_store().catalog
+    results = []
+    for product_item in extracted:
+        for product_id, quantity in expand_packs(product_item):
+            product = catalog.get(product_id)
+            results.append({
+                "product_id": product["product_id"],
+                "productname": product["productname"],
+                "quantity": quantity,
+                "price": product["price"],
+                "image_url": product["image_url"],
+                "category": product["category"],
+                "subcategory": product["subcategory"],
+                "packSize": product["packSize"]
+            })
+    return results
+
+# Retrieve (if needed) and extract one item; returns the LLM product list or None
+def resolve_item(item, similar_docs=None):
+    if similar_docs is None:
+        similar_docs = retrieve_candidates(item)
+        if similar_docs is None:
+            return None
+    return extract_item(item, similar_docs)
+
+# Run a blocking call on a pool; copying the context keeps the request id on its log lines
+async def run_blocking(func, *args, executor=None):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or item_executor, contextvars.copy_context().run, func, *args)
+
+# Run one blocking stage for one item under the order's concurrency cap and
+# per-item timeout; errors propagate to the caller
+async def attempt_item_stage(semaphore, func, *args):
+    async with semaphore:
+        return await asyncio.wait_for(run_blocking(func, *args), timeout=ITEM_TIMEOUT)
+
+# Same, but failures are logged and yield None so the item is skipped (except
+# for upstream admission rejections, which fail the request)
+async def run_item_stage(semaphore, item, func, *args):
+    try:
+        return await attempt_item_stage(semaphore, func, *args)
+    except UpstreamBusy:
+        # Out of upstream capacity: fail the whole request fast instead of dropping items
+        raise
+    except asyncio.TimeoutError:
+        logger.warning("Timed out resolving %r after %ss", item, ITEM_TIMEOUT)
+    except Exception as e:
+        logger.warning("Error resolving %r: %s", item, e)
+    return None
+
+# Retrieve candidates for every item at once; if that fails, retry each item on its own
+async def retrieve_items(semaphore, items):
+    try:
+        return await asyncio.wait_for(run_blocking(retrieve_many, items), timeout=ITEM_TIMEOUT)
+    except Exception as e:
+        logger.warning("Batched retrieval failed, retrieving per item: %s", e)
+        return await asyncio.gather(
+            *(run_item_stage(semaphore, item, retrieve_candidates, item) for item in items)
+        )
+
+# Retrieve (unless the candidates are given) and extract every item; returns the
+# extracted entries (or None) per item
+async def extract_items(items, candidates=None):
+    # Fan items out concurrently; gather keeps results in input order and
+    # each item gets its own timeout so one slow lookup can't sink the order.
+    semaphore = asyncio.Semaphore(ITEM_CONCURRENCY)
+    if candidates is None:
+        candidates = await retrieve_items(semaphore, items)
+    pending = [(item, docs) for item, docs in zip(items, candidates) if docs is not None]
+
+    if EXTRACT_MODE != "batch" or len(pending) < 2:
+        per_pending = await asyncio.gather(
+            *(run_item_stage(semaphore, item, resolve_item, item, docs) for item, docs in pending)
+        )
+    else:
+        per_pending = await extract_pending_batched(semaphore, pending)
+
+    extracted = iter(per_pending)
+    return [next(extracted) if docs is not None else None for docs in candidates]
+
+# Batch mode: extract every item in as few LLM calls as possible, then retry
+# only the items the batch response did not cover on the per-item path. A batch
+# that overruns its budget keeps going in its worker thread; the per-item retries
+# of its items wait for its answer through the extraction cache instead of asking
+# again, and only the items it leaves unresolved get a call of their own.
+async def extract_pending_batched(semaphore, pending):
+    chunks = [pending[i:i + BATCH_EXTRACT_SIZE] for i in range(0, len(pending), BATCH_EXTRACT_SIZE)]
+
+    async def extract_chunk(chunk):
+        timeout = BATCH_TIMEOUT + BATCH_ITEM_TIMEOUT * len(chunk)
+        try:
+            return await asyncio.wait_for(run_blocking(extract_batch, chunk), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Batch extraction of %d items timed out after %ss, falling back per item",
+                           len(chunk), timeout)
+            return {}
+        except Exception as e:
+            logger.warning("Batch extraction failed, falling back to per-item: %s", e)
+            return {}
+
+    async def done(products):
+        return products
+
+    batches = await asyncio.gather(*(extract_chunk(chunk) for chunk in chunks))
+
+    tasks = []
+    for chunk, extracted in zip(chunks, batches):
+        for index, (item, docs) in enumerate(chunk):
+            if index in extracted:
+                tasks.append(done(extracted[index]))
+            else:
+                tasks.append(run_item_stage(semaphore, item, resolve_item, item, docs))
+    return await asyncio.gather(*tasks)
 
 # === API endpoint ===
+# 429/503 with Retry-After for calls the upstream gateway refused
+def upstream_busy_error(e):
+    logger.warning("Upstream busy (%d): %s", e.status_code, e.detail)
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+# Read an upload into memory, refusing it with a 413 as soon as it exceeds max_bytes
+async def read_upload(upload, max_bytes):
+    size = getattr(upload, "size", None)
+    if size is not None and size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload too large: {size} bytes (limit {max_bytes})")
+    contents = await upload.read(max_bytes + 1)
+    if len(contents) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload too large (limit {max_bytes} bytes)")
+    return contents
+
+# Send an in-memory clip to Whisper
+@timed("transcribe")
+def transcribe_audio(contents, filename):
+    # Using 'en' as default language, but the API will still detect other languages
+    # ISO-639-1 codes for supported languages:
+    # en (English), ta (Tamil), te (Telugu), hi (Hindi), gu (Gujarati)
+    response = upstream.call(
+        WHISPER_MODEL,
+        openai_client.audio.transcriptions.create,
+        model=WHISPER_MODEL,
+        file=(filename, contents),
+        # Removed 'auto' as it's not valid - Whisper will still auto-detect languages
+    )
+    return response.text
+
 @app.post("/upload-audio/")
 async def upload_audio(audio: UploadFile = File(...)):
     try:
-        print(f"Received audio upload: {audio.filename}")
-        
-        # Create a temporary file to store the audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp_audio:
-            # Copy the uploaded file to the temporary file
-            shutil.copyfileobj(audio.file, temp_audio)
-            temp_audio_path = temp_audio.name
-        
-        print(f"Saved audio to temporary file: {temp_audio_path}")
-        
+        # Starlette spools uploads in memory up to 1 MB, so short clips never touch disk
+        contents = await read_upload(audio, AUDIO_MAX_BYTES)
+        logger.info("Audio upload %r, %d bytes", audio.filename, len(contents))
+        with timed("audio_preprocess"):
+            duration = audio_duration(contents)
+            key = hashlib.sha256(contents).hexdigest()
+        if duration is not None and duration > AUDIO_MAX_SECONDS:
+            raise HTTPException(status_code=413, detail=f"Audio too long: {duration:.0f}s (limit {AUDIO_MAX_SECONDS:.0f}s)")
+        if duration is None and len(contents) > compressed_max_bytes(AUDIO_MAX_SECONDS, AUDIO_MAX_BITRATE):
+            raise HTTPException(
+                status_code=413,
+                detail=f"Audio too long: {len(contents)} bytes is over {AUDIO_MAX_SECONDS:.0f}s "
+                       f"at {AUDIO_MAX_BITRATE // 1000} kbit/s (limit {AUDIO_MAX_SECONDS:.0f}s)",
+            )
+
+        # Transcriptions run on their own small pool: a burst of voice notes queues
+        # there instead of tying up the workers /process-order/ needs
+        filename = upload_filename(audio.filename)
         try:
-            # Open the temporary file and transcribe using Whisper API
-            print("Calling OpenAI Whisper API...")
-            with open(temp_audio_path, "rb") as audio_file:
-                # Using 'en' as default language, but the API will still detect other languages
-                # ISO-639-1 codes for supported languages: 
-                # en (English), ta (Tamil), te (Telugu), hi (Hindi), gu (Gujarati)
-                response = openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    # Removed 'auto' as it's not valid - Whisper will still auto-detect languages
-                )
-            
-            print("Whisper API call successful")
-            
-            # Extract the transcribed text
-            transcribed_text = response.text
-            print(f"Transcribed text: {transcribed_text}")
-            
-            return {"transcribedText": transcribed_text}
+            transcribed_text = await run_blocking(
+                audio_cache.get_or_compute, key, lambda: transcribe_audio(contents, filename), executor=transcribe_executor
+            )
+        except UpstreamBusy as e:
+            raise upstream_busy_error(e)
         except Exception as api_error:
-            print(f"OpenAI Whisper API error: {str(api_error)}")
+            logger.error("OpenAI Whisper API error: %s", api_error)
             raise HTTPException(status_code=500, detail=f"OpenAI Whisper API error: {str(api_error)}")
-        finally:
-            # Clean up the temporary file
-            import os
-            os.unlink(temp_audio_path)
+        logger.debug("Transcribed text: %s", transcribed_text)
+
+        return {"transcribedText": transcribed_text}
+    except HTTPException as he:
+        raise he
     except Exception as e:
-        print(f"Audio processing error: {str(e)}")
+        logger.exception("Audio processing error: %s", e)
         raise HTTPException(status_code=500, detail=f"Audio processing error: {str(e)}")
 
+# Downscale/re-encode the photo and ask the vision model for the list on it
+def extract_image_text(contents):
+    with timed("image_preprocess"):
+        prepared, mime_type = preprocess_image(contents, IMAGE_MAX_DIM, IMAGE_JPEG_QUALITY)
+    logger.debug("Preprocessed image: %d -> %d bytes (%s)", len(contents), len(prepared), mime_type)
+    base64_image = base64.b64encode(prepared).decode('utf-8')
+
+    # Call OpenAI Vision API using the client directly
+    with timed("vision"):
+        response = upstream.call(
+            LLM_MODEL,
+            openai_client.chat.completions.create,
+            tokens=1100,  # a downscaled photo is at most a few hundred tokens, plus max_tokens
+            model=LLM_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": "Extract grocery items from this handwritten or printed list. Format as a simple text list."},
+                        {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{base64_image}"}}
+                    ]
+                }
+            ],
+            max_tokens=300
+        )
+    return response.choices[0].message.content
+
 @app.post("/upload-image/")
 async def upload_image(image: UploadFile = File(...)):
     try:
-        print(f"Received image upload: {image.filename}")
-        
         # Read the image file
-        contents = await image.read()
-        print(f"Read image content, size: {len(contents)} bytes")
-        
-        # Convert to base64
-        base64_image = base64.b64encode(contents).decode('utf-8')
-        print(f"Converted image to base64, length: {len(base64_image)}")
-        
+        contents = await read_upload(image, IMAGE_MAX_BYTES)
+        logger.info("Image upload %r, %d bytes", image.filename, len(contents))
+
+        # The same photo uploaded again returns the earlier extraction
+        key = f"{hashlib.sha256(contents).hexdigest()}|{IMAGE_MAX_DIM}|{IMAGE_JPEG_QUALITY}"
         try:
-            # Call OpenAI Vision API using the client directly
-            print("Calling OpenAI Vision API...")
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": "Extract grocery items from this handwritten or printed list. Format as a simple text list."},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                        ]
-                    }
-                ],
-                max_tokens=300
-            )
-            print("OpenAI API call successful")
-            
-            # Extract the text from the response
-            extracted_text = response.choices[0].message.content
-            print(f"Extracted text: {extracted_text}")
-            
-            return {"extractedText": extracted_text}
+            extracted_text = await run_blocking(image_cache.get_or_compute, key, lambda: extract_image_text(contents))
+        except ImageError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except UpstreamBusy as e:
+            raise upstream_busy_error(e)
         except Exception as api_error:
-            print(f"OpenAI API error: {str(api_error)}")
+            logger.error("OpenAI API error: %s", api_error)
             raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(api_error)}")
+        logger.debug("Extracted text: %s", extracted_text)
+
+        return {"extractedText": extracted_text}
+    except HTTPException as he:
+        raise he
     except Exception as e:
-        print(f"Image processing error: {str(e)}")
+        logger.exception("Image processing error: %s", e)
         raise HTTPException(status_code=500, detail=f"Image processing error: {str(e)}")
 
+# Fast-path entry per line, None for lines that need the LLM, or HEADING for
+# lines that are no item at all
+@timed("fast_path")
+def resolve_fast(lines):
+    if FASTPATH:
+        return current_store().fast_path.resolve_many(lines)
+    return [HEADING if is_heading(line) else None for line in lines]
+
+# Split an order into lines and resolve what the fast path can; heading lines
+# ("List 1") are left out. Returns (lines, entries).
+def fast_lines(query):
+    lines = split_items(query)
+    resolved = [(line, entry) for line, entry in zip(lines, resolve_fast(lines)) if entry is not HEADING]
+    return [line for line, _ in resolved], [entry for _, entry in resolved]
+
+# Correct the escalated lines and retrieve candidates for the corrected items.
+# Locally normalized items go straight to retrieval. When the LLM corrector is
+# needed, the normalized items are retrieved speculatively while the call is in
+# flight; corrected items whose normalized text did not change keep those
+# candidates and only the others are retrieved again. Returns (items, index of
+# the line each item came from, candidates per item, speculation stats or None).
+async def correct_and_retrieve(semaphore, lines):
+    local_lines, good_enough = await run_blocking(normalize_order, lines)
+    local_items, local_owners = flatten_lines(local_lines)
+    if good_enough:
+        corrections.inc("local")
+        return local_items, local_owners, await retrieve_items(semaphore, local_items), None
+    corrections.inc("llm")
+    if not SPECULATIVE_RETRIEVAL or not local_items:
+        items, owners = flatten_lines(map(split_items, await run_blocking(correct_each, lines)))
+        return items, owners, await retrieve_items(semaphore, items), None
+
+    async def speculate():
+        # Speculation must never fail the order: on any error, retrieve for real later
+        start = time.perf_counter()
+        try:
+            guessed = await retrieve_items(semaphore, local_items)
+        except Exception as e:
+            logger.warning("Speculative retrieval failed: %s", e)
+            guessed = [None] * len(local_items)
+        return guessed, time.perf_counter() - start
+
+    speculative = asyncio.ensure_future(speculate())
+    start = time.perf_counter()
+    try:
+        corrected = await run_blocking(correct_each, lines)
+    except BaseException:
+        speculative.cancel()
+        raise
+    correct_seconds = time.perf_counter() - start
+    items, owners = flatten_lines(map(split_items, corrected))
+    logger.debug("Corrected lines: %r", corrected)
+
+    # Compare both sides in normalized form, so "atta 10kg" from the LLM matches "atta 10 kg"
+    normalizer = current_store().normalizer if NORMALIZER else None
+
+    def item_key(item):
+        return normalize_text(normalizer.normalize_line(clean_line(item))[0] if normalizer else item)
+
+    keys = [item_key(item) for item in items]
+    guessed_index = {item_key(item): index for index, item in enumerate(local_items)}
+    changed = list(dict.fromkeys(item for item, key in zip(items, keys) if key not in guessed_index))
+    if changed:
+        (guessed, speculate_seconds), fresh = await asyncio.gather(speculative, retrieve_items(semaphore, changed))
+    else:
+        (guessed, speculate_seconds), fresh = await speculative, []
+    candidates = dict(zip(map(item_key, changed), fresh))
+
+    # Unchanged items whose speculative retrieval came back empty get one more try
+    retry = list(dict.fromkeys(
+        item for item, key in zip(items, keys) if key not in candidates and guessed[guessed_index[key]] is None
+    ))
+    for item, docs in zip(retry, await retrieve_items(semaphore, retry) if retry else []):
+        candidates[item_key(item)] = docs
+    reused = sum(1 for key in keys if key not in candidates)
+    per_item = [candidates[key] if key in candidates else guessed[guessed_index[key]] for key in keys]
+
+    # Wall time saved only when no retrieval had to wait for the correction
+    outcome = "hit" if items and reused == len(items) else "partial" if reused else "miss"
+    saved = min(speculate_seconds, correct_seconds) if outcome == "hit" else 0.0
+    speculations.inc(outcome)
+    speculation_saved.inc(amount=saved)
+    speculation = {"outcome": outcome, "reused": reused, "retrieved": len(items) - reused, "saved_ms": round(saved * 1000, 1)}
+    logger.debug("Speculation %s: %d/%d items reused", outcome, reused, len(items))
+    return items, owners, per_item, speculation
+
+# Resolve the lines the fast path is sure about locally and send only the rest
+# through correction + extraction. Returns (products, stats).
+async def resolve_order(query):
+    lines, entries = await run_blocking(fast_lines, query)
+    escalated = [line for line, entry in zip(lines, entries) if entry is None]
+    stats = {"items": len(lines), "fast_path": len(lines) - len(escalated), "llm": len(escalated)}
+    order_items.inc("fast_path", amount=stats["fast_path"])
+    order_items.inc("llm", amount=stats["llm"])
+    logger.info("Fast path resolved %d/%d items", stats["fast_path"], stats["items"])
+
+    # Extraction entries per line, so the results keep the order of the list
+    per_line = [[entry] if entry is not None else [] for entry in entries]
+    if escalated:
+        # Steps 1 + 2: Correct spelling, translate to English (locally when possible),
+        # split into items and retrieve their candidates
+        items, owners, candidates, speculation = await correct_and_retrieve(
+            asyncio.Semaphore(ITEM_CONCURRENCY), escalated
+        )
+        logger.debug("Split items: %s", items)
+        if speculation:
+            stats["speculation"] = speculation
+
+        # Step 3: Extract all items concurrently, each back into its line's slot
+        escalated_index = [index for index, entry in enumerate(entries) if entry is None]
+        for owner, products in zip(owners, await extract_items(items, candidates)):
+            per_line[escalated_index[owner]].extend(products or [])
+
+    # Enrich the whole order from the catalog in one pass
+    results = await run_blocking(enrich_products, [entry for line_entries in per_line for entry in line_entries])
+    return results, stats
+
+# Streaming variant of resolve_order: yields one record per resolved item (or item
+# error) as soon as it is ready, then a summary. Fast-path lines come out first;
+# escalated items are extracted one call per item so each streams on its own.
+async def stream_order(query):
+    lines, entries = await run_blocking(fast_lines, query)
+    escalated = [line for line, entry in zip(lines, entries) if entry is None]
+    summary = {
+        "type": "summary", "items": len(lines), "fast_path": len(lines) - len(escalated), "llm": len(escalated),
+        "resolved": 0, "errors": 0, "products": 0,
+    }
+    order_items.inc("fast_path", amount=summary["fast_path"])
+    order_items.inc("llm", amount=summary["llm"])
+
+    def item_record(item, source, products):
+        summary["resolved"] += 1
+        summary["products"] += len(products)
+        return {"type": "item", "item": item, "source": source, "products": products}
+
+    def error_record(item, detail):
+        summary["errors"] += 1
+        return {"type": "error", "item": item, "detail": detail}
+
+    for line, entry in zip(lines, entries):
+        if entry is not None:
+            yield item_record(line, "fast_path", await run_blocking(enrich_products, [entry]))
+    if not escalated:
+        yield summary
+        return
+
+    semaphore = asyncio.Semaphore(ITEM_CONCURRENCY)
+    try:
+        items, _owners, candidates, speculation = await correct_and_retrieve(semaphore, escalated)
+    except Exception as e:
+        logger.warning("Correction failed: %s", e)
+        for line in escalated:
+            yield error_record(line, f"Correction failed: {e}")
+        yield summary
+        return
+    logger.debug("Split items: %s", items)
+    if speculation:
+        summary["speculation"] = speculation
+
+    async def resolve_one(item, docs):
+        try:
+            extracted = await attempt_item_stage(semaphore, resolve_item, item, docs)
+            if not extracted:
+                return error_record(item, "No matching products found.")
+            return item_record(item, "llm", await run_blocking(enrich_products, extracted))
+        except asyncio.TimeoutError:
+            return error_record(item, f"Timed out after {ITEM_TIMEOUT}s")
+        except Exception as e:
+            return error_record(item, str(e))
+
+    tasks = []
+    for item, docs in zip(items, candidates):
+        if docs is None:
+            yield error_record(item, "No matching products found.")
+        else:
+            tasks.append(asyncio.ensure_future(resolve_one(item, docs)))
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client may disconnect mid-stream; don't leave extractions running for nobody
+        for task in tasks:
+            task.cancel()
+    yield summary
+
+# Normalize each line locally; the lines with too many unknown words are corrected
+# in one LLM call, and when that answer doesn't come back one line per input line,
+# each of them on its own
+def correct_lines(lines):
+    normalizer = current_store().normalizer
+    corrected, unknown = [], []
+    for index, line in enumerate(lines):
+        normalized = normalizer.normalize(line) if NORMALIZER else None
+        if normalized is not None and normalized.unknown_share <= NORMALIZE_MAX_UNKNOWN:
+            corrected.append("\n".join(normalized.lines))
+        else:
+            corrected.append(None)
+            unknown.append(index)
+    corrections.inc("local", amount=len(lines) - len(unknown))
+    if not unknown:
+        return corrected
+    corrections.inc("llm", amount=len(unknown))
+    for index, text in zip(unknown, correct_each([lines[index] for index in unknown])):
+        corrected[index] = text
+    return corrected
+
+# Resolve a chunk of distinct order lines: the fast path first, then normalization
+# (at most one correction call) and one batched retrieval + extraction for the rest.
+# Returns products per line.
+async def resolve_lines(lines):
+    entries = await run_blocking(resolve_fast, lines)
+    escalated = [line for line, entry in zip(lines, entries) if entry is None]
+    order_items.inc("fast_path", amount=len(lines) - len(escalated))
+    order_items.inc("llm", amount=len(escalated))
+
+    extracted_by_line = {line: [entry] for line, entry in zip(lines, entries) if entry not in (None, HEADING)}
+    if escalated:
+        corrected = await run_blocking(correct_lines, escalated)
+        items_by_line = {line: split_items(text) for line, text in zip(escalated, corrected)}
+        items = list(dict.fromkeys(item for line_items in items_by_line.values() for item in line_items))
+        extracted = dict(zip(items, await extract_items(items)))
+        for line, line_items in items_by_line.items():
+            extracted_by_line[line] = [entry for item in line_items for entry in extracted.get(item) or []]
+    return await run_blocking(
+        lambda: [enrich_products(extracted_by_line[line]) if extracted_by_line.get(line) else [] for line in lines]
+    )
+
+# Bulk variant of stream_order: every distinct line across all orders is resolved
+# once, in chunks with bounded parallelism, and each order is yielded as soon as
+# its last line is done, then a summary
+async def stream_bulk(orders):
+    plan = BulkPlan(orders, split_items)
+    keys = list(plan.lines)
+    chunks = [keys[i:i + BULK_CHUNK_SIZE] for i in range(0, len(keys), BULK_CHUNK_SIZE)]
+    summary = {
+        "type": "summary", "orders": len(orders), "lines": sum(len(order_keys) for order_keys in plan.order_keys),
+        "unique_lines": len(keys), "ok": 0, "partial": 0, "not_found": 0, "error": 0,
+    }
+    logger.info("Bulk: %d orders, %d lines, %d distinct", summary["orders"], summary["lines"], summary["unique_lines"])
+
+    def order_record(index):
+        record = plan.order_record(index)
+        summary[record["status"]] += 1
+        return record
+
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def resolve_chunk(chunk):
+        async with semaphore:
+            try:
+                return chunk, await resolve_lines([plan.lines[key] for key in chunk]), None
+            except UpstreamBusy as e:
+                return chunk, None, f"Upstream busy: {e.detail}"
+            except Exception as e:
+                logger.warning("Bulk chunk failed: %s", e)
+                return chunk, None, str(e)
+
+    for index in plan.empty_orders():
+        yield order_record(index)
+    tasks = [asyncio.ensure_future(resolve_chunk(chunk)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            chunk, results, error = await next_done
+            for position, key in enumerate(chunk):
+                completed = plan.resolve(key, error=error) if error else plan.resolve(key, results[position])
+                for index in completed:
+                    yield order_record(index)
+    finally:
+        for task in tasks:
+            task.cancel()
+    yield summary
 
 @app.post("/process-order/")
 async def process_order(req: OrderRequest):
     try:
         query = req.query
-        print(f"\n=== Processing order: '{query}' ===")
-
-        # Step 1: Correct spelling, translate to English
-        corrected_query = correct_chain.invoke({"query": query}).content.strip()
-        print(f"Corrected query: '{corrected_query}'")
-
-        # Step 2: Split query into individual grocery items
-        items = split_items(corrected_query)
-        print(f"Split items: {items}")
-
-        final_results = []
-
-        # Step 3: Search and extract for each item
-        for item in items:
-            print(f"\nProcessing item: '{item}'")
-            similar_docs = vectordb.similarity_search(item, k=5)
-            if similar_docs:
-                # Create context with product names and metadata
-                context_parts = []
-                for doc in similar_docs:
-                    product_name = doc.page_content
-                    metadata = doc.metadata if hasattr(doc, 'metadata') else {}
-                    
-                    # Format metadata for context
-                    metadata_str = ""
-                    if metadata:
-                        metadata_str = "\nMetadata:"
-                        for key, value in metadata.items():
-                            metadata_str += f"\n  {key}: {value}"
-                    
-                    context_parts.append(f"Product Name: {product_name}{metadata_str}")
-                
-                context = "\n---\n".join(context_parts)
-                print(f"Found {len(similar_docs)} similar documents")
-                inputs = {"context": context, "query": item}
-                formatted_prompt = EXTRACT_PROMPT.format_prompt(**inputs)
-                response_raw = llm.invoke(formatted_prompt).content.strip()
-                response_raw = response_raw.replace("```json", "").replace("```", "").strip()
-                try:
-                    response_json = json.loads(response_raw)
-                    print(f"LLM extracted: {json.dumps(response_json, indent=2)}")
-                    if isinstance(response_json, list):
-                        # Process each product item from LLM response
-                        for product_item in response_json:
-                            # Check if the product has metadata from LLM
-                            if "metadata" in product_item:
-                                # Get product name for database lookup to find image URL
-                                product_name = product_item["productname"]
-                                image_url = ""
-                                
-                                try:
-                                    # Connect to database to get image URL
-                                    conn = sqlite3.connect("products.db")
-                                    cursor = conn.cursor()
-                                    
-                                    # Look up the product to get its image URL
-                                    cursor.execute(
-                                        "SELECT image_url FROM products WHERE lower(productname) LIKE ?", 
-                                        (f"%{product_name.lower()}%",)
-                                    )
-                                    image_result = cursor.fetchone()
-                                    
-                                    if image_result:
-                                        image_url = image_result[0]
-                                        print(f"Found image URL for {product_name}")
-                                    
-                                    conn.close()
-                                except Exception as e:
-                                    print(f"Error looking up image URL: {e}")
-                                
-                                # Use the metadata directly from LLM response plus image URL from DB
-                                final_results.append({
-                                    "productname": product_item["productname"],
-                                    "quantity": product_item["quantity"],
-                                    "price": product_item["metadata"].get("price", ""),
-                                    "image_url": image_url,  # Now we include image URL from database
-                                    "category": product_item["metadata"].get("category", ""),
-                                    "subcategory": product_item["metadata"].get("subcategory", ""),
-                                    "packSize": product_item["metadata"].get("packSize", "")
-                                })
-                                print(f"Added product with metadata: {product_item['productname']}")
-                            else:
-                                # Fall back to database lookup if no metadata
-                                try:
-                                    # Connect to the database to get exact product details
-                                    conn = sqlite3.connect("products.db")
-                                    cursor = conn.cursor()
-                                    
-                                    # Extract the base product name without quantity
-                                    # For example, "Onion 2 kg" -> "Onion"
-                                    product_words = product_item['productname'].lower().split()
-                                    base_product_name = product_words[0]  # Usually the first word is the product name
-                                    
-                                    print(f"Looking for product with base name: '{base_product_name}'")
-                                    
-                                    # Use more flexible matching to find the product
-                                    cursor.execute(
-                                        "SELECT productname, price, image_url, quantity AS packSize, category, subcategory FROM products WHERE lower(productname) LIKE ?", 
-                                        (f"%{base_product_name}%",)
-                                    )
-                                    product_rows = cursor.fetchall()
-                                    
-                                    if product_rows:
-                                        print(f"Found {len(product_rows)} potential matches:")
-                                        for i, row in enumerate(product_rows):
-                                            print(f"  {i+1}. {row[0]}")
-                                        
-                                        # Try to find the best match based on the full product name
-                                        best_match_idx = 0
-                                        best_match_score = 0
-                                        
-                                        for i, row in enumerate(product_rows):
-                                            db_product_name = row[0].lower()
-                                            llm_product_name = product_item['productname'].lower()
-                                            
-                                            # Calculate similarity score (simple word overlap)
-                                            db_words = set(db_product_name.split())
-                                            llm_words = set(llm_product_name.split())
-                                            common_words = db_words.intersection(llm_words)
-                                            score = len(common_words) / max(len(db_words), len(llm_words))
-                                            
-                                            print(f"    Score for '{db_product_name}': {score:.2f}")
-                                            
-                                            if score > best_match_score:
-                                                best_match_score = score
-                                                best_match_idx = i
-                                        
-                                        # Use the best matching product
-                                        keys = ["productname", "price", "image_url", "packSize", "category", "subcategory"]
-                                        product_data = dict(zip(keys, product_rows[best_match_idx]))
-                                        
-                                        print(f"Best match: '{product_data['productname']}' with score {best_match_score:.2f}")
-                                        
-                                        # Add the product data to the result
-                                        final_results.append({
-                                            "productname": product_data["productname"],
-                                            "quantity": product_item["quantity"],
-                                            "price": product_data["price"],
-                                            "image_url": product_data["image_url"],
-                                            "category": product_data["category"],
-                                            "subcategory": product_data["subcategory"],
-                                            "packSize": product_data["packSize"]
-                                        })
-                                        print(f"Added product to results: {product_data['productname']}")
-                                    else:
-                                        # If no match, just use the LLM result
-                                        final_results.append(product_item)
-                                        print(f"No match found for: {product_item['productname']}")
-                                    
-                                    conn.close()
-                                except Exception as db_error:
-                                    print(f"Database error: {db_error}")
-                                    # Fall back to just using the LLM result
-                                    final_results.append(product_item)
-                except json.JSONDecodeError:
-                    print(f"Failed to parse JSON: {response_raw}")
-                    continue  # skip invalid parse
-            else:
-                print(f"No similar documents found for '{item}'")
+        logger.info("Processing order (%d chars)", len(query))
+        logger.debug("Order query: %r", query)
+        await use_store(req.store)
+
+        final_results, stats = await resolve_order(query)
 
         if not final_results:
-            print("No matching products found.")
+            logger.info("No matching products found")
             raise HTTPException(status_code=404, detail="No matching products found.")
 
-        print(f"\nFinal results: {json.dumps(final_results, indent=2)}")
-        return {"result": final_results}
+        logger.info("Resolved %d products", len(final_results))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Final results: %s", json.dumps(final_results, indent=2))
+        return {"result": final_results, "stats": stats}
 
     except HTTPException as he:
         raise he
+    except UpstreamBusy as e:
+        raise upstream_busy_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Same pipeline as /process-order/, streamed as NDJSON (or Server-Sent Events when
+# the client sends Accept: text/event-stream)
+@app.post("/process-order/stream")
+async def process_order_stream(req: OrderRequest, request: Request):
+    logger.info("Streaming order (%d chars)", len(req.query))
+    logger.debug("Order query: %r", req.query)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    await use_store(req.store)
+
+    async def body():
+        async for record in stream_order(req.query):
+            data = json.dumps(record)
+            yield f"data: {data}\n\n" if sse else data + "\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream" if sse else "application/x-ndjson")
+
+# Many orders at once, as a JSONL or CSV upload; streams one NDJSON record per
+# order as it completes, then a summary
+@app.post("/process-orders/bulk")
+async def process_orders_bulk(orders: UploadFile = File(...), store: Optional[str] = Form(None)):
+    contents = await read_upload(orders, BULK_MAX_BYTES)
+    try:
+        parsed = parse_orders(contents, orders.filename, orders.content_type)
+    except BulkError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not parsed:
+        raise HTTPException(status_code=400, detail="No orders in upload")
+    if len(parsed) > BULK_MAX_ORDERS:
+        raise HTTPException(status_code=413, detail=f"Too many orders: {len(parsed)} (limit {BULK_MAX_ORDERS})")
+    await use_store(store)
+
+    async def body():
+        async for record in stream_bulk(parsed):
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "correct": correction_cache.stats(),
+        "extract": extraction_cache.stats(),
+        "image": image_cache.stats(),
+        "audio": audio_cache.stats(),
+    }
+
+@app.get("/upstream/stats")
+async def upstream_stats():
+    return upstream.stats()
+
+# Stores on disk, which of them are loaded, and load/eviction counters
+@app.get("/stores")
+async def list_stores():
+    return {"stores": stores.available(), "default": DEFAULT_STORE, **stores.stats()}
+
+# Liveness: the process is up and startup has not failed
+@app.get("/healthz")
+async def healthz():
+    status = startup.status()
+    if status["error"]:
+        return JSONResponse({"status": "failed", "error": status["error"]}, status_code=500)
+    return {"status": "ok"}
+
+# Readiness: every startup phase is done, with how long each took
+@app.get("/readyz")
+async def readyz():
+    status = startup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Prometheus text exposition of everything above plus request and stage histograms
+@app.get("/metrics")
+def metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# GET /products: keyset-paginated, filterable listing of products.db. Without a
+# limit every matching product is returned, as before. Responses are streamed,
+# gzip-compressed when the client accepts it, and tagged with the catalog version
+# so repeat requests revalidate to a 304.
 @app.get("/products")
-async def get_products():
+def get_products(
+    request: Request,
+    store: str = None,
+    category: str = None,
+    subcategory: str = None,
+    prefix: str = None,
+    fields: str = None,
+    limit: int = None,
+    cursor: str = None,
+):
     try:
-        conn = sqlite3.connect("products.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT productname, price, image_url, quantity AS packSize, category, subcategory FROM products")
-        rows = cursor.fetchall()
-        conn.close()
+        selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else list(LISTING_COLUMNS)
+        unknown = [field for field in selected if field not in LISTING_COLUMNS]
+        if unknown or not selected:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}. Allowed: {list(LISTING_COLUMNS)}")
+        if limit is not None and not 1 <= limit <= PRODUCTS_MAX_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {PRODUCTS_MAX_LIMIT}")
+        try:
+            after = int(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Listings read the store's products.db directly; the store need not be loaded
+        try:
+            products_db = os.path.join(stores.root(store), "products.db")
+        except UnknownStore as e:
+            raise HTTPException(status_code=404, detail=str(e))
 
-        keys = ["productname", "price", "image_url", "packSize", "category", "subcategory"]
-        products = [dict(zip(keys, row)) for row in rows]
+        # Validators: products.db's version plus the query and the encoding, since each
+        # query is its own representation and the gzip body is a different one again
+        encoding = "gzip" if "gzip" in request.headers.get("accept-encoding", "") else "identity"
+        modified = os.stat(products_db).st_mtime
+        version = f"{file_fingerprint(products_db)}|{request.url.query}|{encoding}"
+        etag = '"' + hashlib.sha1(version.encode()).hexdigest()[:20] + '"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if not_modified(request, etag, modified):
+            return Response(status_code=304, headers=headers)
 
-        return {"products": products}
+        body = products_json(products_db, selected, category, subcategory, prefix, after, limit)
+        if encoding == "gzip":
+            headers["Content-Encoding"] = "gzip"
+            body = gzip_chunks(body)
+        return StreamingResponse(body, media_type="application/json", headers=headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def not_modified(request, etag, modified):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags or "*" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+# {"products": [...], "next_cursor": ...} written a few hundred rows at a time
+def products_json(products_db, fields, category, subcategory, prefix, after, limit):
+    yield '{"products": ['
+    last_id, count, chunk = None, 0, []
+    for last_id, product in iter_listing(products_db, fields, category, subcategory, prefix, after, limit):
+        chunk.append(json.dumps(product))
+        count += 1
+        if len(chunk) == 500:
+            yield ("," if count > len(chunk) else "") + ",".join(chunk)
+            chunk = []
+    if chunk:
+        yield ("," if count > len(chunk) else "") + ",".join(chunk)
+    # A full page may have more behind it; a short page is the last one
+    next_cursor = str(last_id) if limit is not None and count == limit else None
+    yield '], "next_cursor": ' + json.dumps(next_cursor) + "}"
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,185 @@
+# === normalize.py ===
+# Local spelling correction and transliteration for order text.
+#
+# Replaces the LLM correction hop for most orders. Each line is tokenized
+# (Latin and Indic scripts alike), native digits are mapped to ASCII, every word
+# is checked against the catalog vocabulary plus the alias table, and misspelt
+# words are corrected with a symmetric-delete index (SymSpell-style: the
+# dictionary's deletion variants are precomputed, so a lookup is a few dict
+# probes instead of a scan). Alias phrases are then replaced by catalog names.
+# Words that stay unknown are counted, so the caller can send orders that are
+# mostly unknown words to the LLM instead.
+
+import re
+from collections import Counter
+
+from aliases import ALIASES
+from fastpath import clean_line, is_heading
+from packs import UNITS, PACKAGE_WORDS, DOZEN_WORDS
+
+# Separators between items: newlines, commas, semicolons, the Devanagari danda,
+# "+", "&", and "and" in English, Hinglish, Hindi, Tamil, Telugu and Gujarati
+ITEM_SEPARATORS = re.compile(
+    r"[\n,;।|+&]|\s(?:and|aur|और|மற்றும்|మరియు|અને)\s",
+    re.IGNORECASE,
+)
+
+# A number ("1.5", "1/2") or a run of anything that is not space, digit or punctuation;
+# Indic vowel signs are combining marks that \w would split off, hence the negated class
+TOKEN = re.compile(r"\d+(?:[.,/]\d+)?|[^\s\d.,;:!?()\[\]{}\"'|/\\*+=<>#@%&-]+")
+
+# Devanagari, Tamil, Telugu and Gujarati digits -> ASCII
+NATIVE_DIGITS = str.maketrans({
+    chr(zero + offset): str(offset)
+    for zero in (0x0966, 0x0BE6, 0x0C66, 0x0AE6)
+    for offset in range(10)
+})
+
+# Words that are neither products nor quantities but are fine to see in a list
+FILLER = {
+    "a", "an", "the", "of", "and", "or", "with", "for", "some", "more", "please", "pls", "need", "want",
+    "buy", "get", "also", "ka", "ki", "ke", "aur", "wala", "wali", "chahiye",
+}
+
+
+def split_order(text):
+    # Order text -> item strings
+    return [item.strip() for item in ITEM_SEPARATORS.split(text or "") if item.strip()]
+
+
+def tokenize(text):
+    return TOKEN.findall((text or "").translate(NATIVE_DIGITS).lower())
+
+
+def max_edits(word):
+    # Short words get no slack: "tel" and "gur" are one edit away from too much, and
+    # a brand like "tata" is one transposition from "atta"
+    if len(word) <= 4:
+        return 0
+    return 1 if len(word) <= 6 else 2
+
+
+def deletes(word, distance):
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a, b):
+    # Optimal string alignment distance (Levenshtein plus adjacent transpositions)
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellCorrector:
+    def __init__(self, frequency):
+        self.frequency = frequency  # word -> weight; ties between equally close words go to the heavier one
+        self.index = {}  # deletion variant -> words
+        for word in frequency:
+            for variant in deletes(word, max_edits(word)):
+                self.index.setdefault(variant, []).append(word)
+
+    def correct(self, word):
+        # The closest known word within max_edits(word), or None
+        if word in self.frequency:
+            return word
+        limit = max_edits(word)
+        if not limit:
+            return None
+        candidates = set()
+        for variant in deletes(word, limit):
+            candidates.update(self.index.get(variant, ()))
+        best = None
+        for candidate in candidates:
+            distance = edit_distance(word, candidate)
+            if distance <= limit:
+                rank = (distance, -self.frequency[candidate], candidate)
+                if best is None or rank < best:
+                    best = rank
+        return best[2] if best else None
+
+
+class NormalizedText:
+    def __init__(self, lines, words, unknown):
+        self.lines = lines
+        self.words = words  # product words seen (numbers, units and filler excluded)
+        self.unknown = unknown  # of those, words neither known nor correctable
+
+    @property
+    def unknown_share(self):
+        return self.unknown / self.words if self.words else 0.0
+
+
+class Normalizer:
+    def __init__(self, product_names, aliases=ALIASES):
+        frequency = Counter()
+        for name in product_names:
+            frequency.update(tokenize(name))
+        # Alias words are everyday grocery terms; weight them above one-off brand words
+        for key, target in aliases.items():
+            for word in tokenize(key) + tokenize(target):
+                frequency[word] += 5
+        self.quantity_words = set(UNITS) | PACKAGE_WORDS | DOZEN_WORDS
+        for word in self.quantity_words | FILLER:
+            frequency[word] += 1
+        self.speller = SpellCorrector(frequency)
+        self.aliases = {tuple(tokenize(key)): target for key, target in aliases.items()}
+        self.max_phrase = max((len(key) for key in self.aliases), default=1)
+
+    def normalize_line(self, line):
+        # -> (normalized line, product words, unknown words)
+        words, unknown, corrected = 0, 0, []
+        for token in tokenize(line):
+            if token[0].isdigit() or token in self.quantity_words or token in FILLER:
+                corrected.append(token)
+                continue
+            words += 1
+            fixed = self.speller.correct(token)
+            if fixed is None:
+                unknown += 1
+            corrected.append(fixed or token)
+        # "moong dal" -> "moong dal dal": drop the repeat an alias target can leave behind
+        out = []
+        for word in " ".join(self.apply_aliases(corrected)).split():
+            if not out or word != out[-1]:
+                out.append(word)
+        return " ".join(out), words, unknown
+
+    def apply_aliases(self, tokens):
+        # Longest alias phrase first: "haldi powder" before "haldi"
+        out, i = [], 0
+        while i < len(tokens):
+            for size in range(min(self.max_phrase, len(tokens) - i), 0, -1):
+                target = self.aliases.get(tuple(tokens[i:i + size]))
+                if target is not None:
+                    out.append(target)
+                    i += size
+                    break
+            else:
+                out.append(tokens[i])
+                i += 1
+        return out
+
+    def normalize(self, text):
+        # Headings ("List 1") are no items: never corrected into one, never counted
+        lines, words, unknown = [], 0, 0
+        for item in split_order(text):
+            if is_heading(item):
+                continue
+            line, line_words, line_unknown = self.normalize_line(clean_line(item))
+            if line:
+                lines.append(line)
+            words += line_words
+            unknown += line_unknown
+        return NormalizedText(lines, words, unknown)
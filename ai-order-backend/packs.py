@@ -0,0 +1,203 @@
+# === packs.py ===
+# Pack-size parsing and package-combination solving.
+#
+# Catalog pack sizes ("2 kg", "500 g", "5x100 g", "1 ltr") are parsed once at ingest
+# into a numeric amount in a base unit (g, ml or pcs). Requested amounts from an
+# order are parsed the same way, and solve_packs picks the combination of the
+# available packs that best covers the request, so the LLM never does arithmetic.
+
+import re
+import math
+
+# Unit spellings -> (base unit, factor to base)
+UNITS = {
+    "g": ("g", 1), "gm": ("g", 1), "gms": ("g", 1), "gram": ("g", 1), "grams": ("g", 1), "gr": ("g", 1),
+    "kg": ("g", 1000), "kgs": ("g", 1000), "kilo": ("g", 1000), "kilos": ("g", 1000),
+    "kilogram": ("g", 1000), "kilograms": ("g", 1000),
+    "ml": ("ml", 1), "millilitre": ("ml", 1), "milliliter": ("ml", 1),
+    "l": ("ml", 1000), "lt": ("ml", 1000), "ltr": ("ml", 1000), "ltrs": ("ml", 1000),
+    "litre": ("ml", 1000), "litres": ("ml", 1000), "liter": ("ml", 1000), "liters": ("ml", 1000),
+    "pc": ("pcs", 1), "pcs": ("pcs", 1), "piece": ("pcs", 1), "pieces": ("pcs", 1),
+    "nos": ("pcs", 1), "tablets": ("pcs", 1), "capsules": ("pcs", 1), "softgels": ("pcs", 1),
+    "pulls": ("pcs", 1),
+    # As written in Tamil / Hindi lists
+    "கிலோ": ("g", 1000), "கிராம்": ("g", 1), "லிட்டர்": ("ml", 1000),
+    "किलो": ("g", 1000), "ग्राम": ("g", 1), "लीटर": ("ml", 1000),
+}
+
+# Package words in an order line: "2 packet", "bread (1 packet)"; dozen is 12 pieces
+PACKAGE_WORDS = {
+    "packet", "packets", "pkt", "pkts", "pack", "packs", "bottle", "bottles", "box", "boxes",
+    "pouch", "pouches", "bag", "bags", "jar", "jars", "can", "cans", "tin", "tins", "bar", "bars",
+}
+DOZEN_WORDS = {"dozen", "dozens", "dz"}
+
+NUMBER = r"(\d+(?:\.\d+)?(?:/\d+)?)"
+UNIT = r"([a-zA-Z]+)"
+# "5x100 g", "2 x 200 ml"
+MULTI_PACK = re.compile(NUMBER + r"\s*[xX]\s*" + NUMBER + r"\s*" + UNIT)
+# "500 g", "1.5kg", "1/2 kilo"
+SINGLE_PACK = re.compile(NUMBER + r"\s*" + UNIT)
+# "set of 4", "pack of 6"
+PACK_OF = re.compile(r"(?:set|pack)\s+of\s+(\d+)", re.IGNORECASE)
+# "12's pack" is a count
+COUNT_SUFFIX = re.compile(r"'s\b(?:\s*pack)?", re.IGNORECASE)
+
+# A quantity inside an order line: "5 kilo", "1.5kg", "1/2 kilo", "2 packet", "6"
+LINE_QUANTITY = re.compile(
+    r"(?<![\w.])" + NUMBER + r"\s*("
+    + "|".join(sorted(map(re.escape, set(UNITS) | PACKAGE_WORDS | DOZEN_WORDS), key=len, reverse=True))
+    + r")?\.?(?!\w)",
+    re.IGNORECASE,
+)
+# Numbers that belong to the product name: "3 in 1 coffee", "2-in-1 shampoo"
+NAME_NUMBERS = re.compile(r"\d+\s*-?\s*in\s*-?\s*\d+", re.IGNORECASE)
+
+# Largest DP table solve_packs will build; bigger requests are mostly covered
+# with one pack first
+MAX_SOLVER_STEPS = 200_000
+# Sub-unit pack sizes (0.5 g) are counted in up to thousandths of the base unit
+MAX_SOLVER_SCALE = 1000
+
+
+def parse_number(text):
+    if "/" in text:
+        numerator, denominator = text.split("/", 1)
+        return float(numerator) / float(denominator) if float(denominator) else None
+    return float(text)
+
+
+def normalize_unit(unit):
+    return UNITS.get((unit or "").lower().rstrip("."))
+
+
+def to_base(amount, unit):
+    # (7, "kg") -> (7000.0, "g"); unknown units -> (None, None)
+    normalized = normalize_unit(unit)
+    if amount is None or normalized is None:
+        return None, None
+    base_unit, factor = normalized
+    return amount * factor, base_unit
+
+
+def parse_pack_size(text):
+    # Catalog pack size -> (amount, base unit), or (None, None) for combos and odd formats
+    text = COUNT_SUFFIX.sub(" pcs", (text or "").strip())
+    if not text:
+        return None, None
+
+    match = MULTI_PACK.search(text)
+    if match:
+        count, size = parse_number(match.group(1)), parse_number(match.group(2))
+        if count is not None and size is not None:
+            amount, unit = to_base(count * size, match.group(3))
+            if amount:
+                return amount, unit
+
+    match = SINGLE_PACK.search(text)
+    if match:
+        amount, unit = to_base(parse_number(match.group(1)), match.group(2))
+        if amount:
+            return amount, unit
+
+    match = PACK_OF.search(text)
+    if match:
+        return float(match.group(1)), "pcs"
+    return None, None
+
+
+def split_quantity(line):
+    # Order line -> (name, amount, unit, count). "atta 10kg" -> ("atta", 10000.0, "g", None),
+    # "lemons 4" -> ("lemons", None, None, 4), "besan" -> ("besan", None, None, None).
+    # amount/unit are in base units; count is a number of packages or pieces.
+    amount = unit = count = None
+    name = line or ""
+    in_name = [number.span() for number in NAME_NUMBERS.finditer(name)]
+    match = next(
+        (m for m in LINE_QUANTITY.finditer(name) if not any(start <= m.start() < end for start, end in in_name)),
+        None,
+    )
+    if match:
+        number = parse_number(match.group(1))
+        word = (match.group(2) or "").lower()
+        if number:
+            if word in DOZEN_WORDS:
+                amount, unit = number * 12, "pcs"
+            elif not word or word in PACKAGE_WORDS:
+                count = int(number) if number.is_integer() else number
+            else:
+                amount, unit = to_base(number, word)
+            name = line[:match.start()] + " " + line[match.end():]
+    # Leftover package words and brackets around the quantity carry no product meaning
+    words = [word for word in re.sub(r"[()\[\]]", " ", name).split() if word.lower() not in PACKAGE_WORDS]
+    return " ".join(words), amount, unit, count
+
+
+def solve_packs(requested, packs):
+    # Best combination of packs for a requested amount (unbounded knapsack).
+    #
+    # requested: amount in the packs' base unit. packs: list of (key, amount, price).
+    # Picks the total closest to the request, preferring to cover it over falling
+    # short on ties, then the cheapest, then the fewest packages. Returns a list
+    # of (key, count), or [] when nothing fits.
+    packs = [(key, amount, price or 0.0) for key, amount, price in packs if amount and amount > 0]
+    if not packs or requested is None or requested <= 0:
+        return []
+
+    # Work in integer steps: sizes in the base unit, scaled until sub-unit sizes are
+    # whole numbers, divided by their greatest common divisor
+    scale = 1
+    while scale < MAX_SOLVER_SCALE and any(abs(amount * scale - round(amount * scale)) > 1e-6 for _, amount, _ in packs):
+        scale *= 10
+    sizes = [max(1, int(round(amount * scale))) for _, amount, _ in packs]
+    step = 0
+    for size in sizes:
+        step = math.gcd(step, size)
+    units = [size // step for size in sizes]
+    target = requested * scale / step
+
+    # One pack size: the count just below or just above the request
+    if len(set(units)) == 1:
+        index = min(range(len(packs)), key=lambda i: packs[i][2])
+        below = max(1, math.floor(target / units[index]))
+        count = min({below, below + 1}, key=lambda n: (abs(n * units[index] - target), n * units[index] < target))
+        return [(packs[index][0], count)]
+
+    # A table that would be too big: cover all but the last MAX_SOLVER_STEPS with the
+    # cheapest pack per unit, and solve the remainder exactly
+    bulk = 0
+    cheapest = min(range(len(packs)), key=lambda i: (packs[i][2] / units[i], -units[i]))
+    top = int(math.ceil(target)) + max(units)
+    if top > MAX_SOLVER_STEPS:
+        bulk = (top - MAX_SOLVER_STEPS) // units[cheapest] + 1
+        target -= bulk * units[cheapest]
+        top = int(math.ceil(target)) + max(units)
+        if target <= 0 or top > MAX_SOLVER_STEPS:
+            return []
+
+    # best[t] = (price, count, previous total, pack index) for an exact total of t steps
+    best = [None] * (top + 1)
+    best[0] = (0.0, 0, -1, -1)
+    for total in range(1, top + 1):
+        for index, unit in enumerate(units):
+            previous = total - unit
+            if previous < 0 or best[previous] is None:
+                continue
+            candidate = (best[previous][0] + packs[index][2], best[previous][1] + 1, previous, index)
+            if best[total] is None or candidate[:2] < best[total][:2]:
+                best[total] = candidate
+
+    def rank(total):
+        return (abs(total - target), total < target, best[total][0], best[total][1])
+
+    reachable = [total for total in range(0 if bulk else 1, top + 1) if best[total] is not None]
+    if not reachable:
+        return []
+    total = min(reachable, key=rank)
+
+    counts = {cheapest: bulk} if bulk else {}
+    while total > 0:
+        _, _, previous, index = best[total]
+        counts[index] = counts.get(index, 0) + 1
+        total = previous
+    return [(packs[index][0], counts[index]) for index in sorted(counts, key=lambda i: -packs[i][1])]
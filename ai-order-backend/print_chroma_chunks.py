@@ -1,91 +1,115 @@
-import os
-from langchain_community.vectorstores import Chroma  # Will use this for now but add a note about updating
-from langchain_openai import OpenAIEmbeddings
-from dotenv import load_dotenv
+import sys
+import time
+import argparse
 
-# Load environment variables
-load_dotenv()
-
-# Setup OpenAI API key
-openai_key = os.getenv("OPENAI_API_KEY")
-if not openai_key:
-    raise ValueError("Missing OPENAI_API_KEY in .env file!")
+from chroma_reader import ChromaReader, export, drift
 
 # Path to your Chroma DB
 CHROMA_DIR = "chroma_db"  # Make sure this matches your actual Chroma DB directory
+DB_FILE = "products.db"
 
-# Note: For future reference, the Chroma import should be updated to:
-# from langchain_chroma import Chroma
-
-def print_chroma_chunks(limit=10, offset=0):
+# Reads the store files directly (see chroma_reader.py): no OpenAI key, no network,
+# and a page deep into the store costs the same as the first one
+def print_chroma_chunks(limit=10, offset=0, after=None, chroma_dir=CHROMA_DIR):
     """
     Print chunks of data from Chroma DB
-    
+
     Args:
         limit: Number of items to print (default: 10)
         offset: Starting position (default: 0)
+        after: Start after this document id instead (the "next" id printed by a previous page)
     """
-    # Initialize embeddings
-    embeddings = OpenAIEmbeddings(api_key=openai_key)
-    
-    # Load the existing Chroma DB
-    vectordb = Chroma(persist_directory=CHROMA_DIR, embedding_function=embeddings)
-    
-    # Get collection
-    collection = vectordb._collection
-    
-    # Get total count
-    total_count = collection.count()
-    print(f"Total documents in Chroma DB: {total_count}")
-    
-    # Get chunks of data
-    if total_count > 0:
-        # Get IDs of all documents
-        all_ids = collection.get(include=[])["ids"]
-        
-        # Apply pagination
-        chunk_ids = all_ids[offset:offset+limit]
-        
-        # Get documents by IDs
-        results = collection.get(ids=chunk_ids, include=["documents", "metadatas", "embeddings"])
-        
-        # Print documents
-        print(f"\nShowing documents {offset+1} to {min(offset+limit, total_count)} of {total_count}:")
+    reader = ChromaReader(chroma_dir)
+    try:
+        total_count = reader.count()
+        print(f"Total documents in Chroma DB: {total_count}")
+        if total_count == 0:
+            print("No documents found in the Chroma DB.")
+            return
+
+        page = next(reader.pages(limit, after=after, offset=offset, embeddings=True), None)
+        if page is None:
+            print("No documents past that position.")
+            return
+
+        start = f"after {after}" if after else f"{offset + 1} to {offset + len(page['ids'])}"
+        print(f"\nShowing documents {start} of {total_count}:")
         print("-" * 70)
-        
-        for i, (doc_id, document) in enumerate(zip(results["ids"], results["documents"])):
-            print(f"Document #{offset+i+1} (ID: {doc_id}):")
+        for i, (doc_id, document, metadata) in enumerate(zip(page["ids"], page["documents"], page["metadatas"])):
+            print(f"Document #{offset + i + 1} (ID: {doc_id})" if not after else f"Document ID: {doc_id}")
             print(f"Product Name: {document}")
-            
+
             # Print metadata with better formatting
-            if "metadatas" in results and results["metadatas"] and i < len(results["metadatas"]):
-                metadata = results["metadatas"][i]
-                print("Metadata:")
-                if metadata:
-                    for key, value in metadata.items():
-                        if key == "packSize":
-                            print(f"  Pack Size: {value}")
-                        else:
-                            print(f"  {key.capitalize()}: {value}")
-                else:
-                    print("  None")
-                
-            # Fix the embeddings check to avoid ValueError
-            if "embeddings" in results and len(results["embeddings"]) > i:
-                embedding_sample = results["embeddings"][i][:5].tolist()  # Convert to list for printing
-                print(f"Embedding (first 5 values): {embedding_sample}...")
-                
+            print("Metadata:")
+            if metadata:
+                for key, value in metadata.items():
+                    if key == "packSize":
+                        print(f"  Pack Size: {value}")
+                    else:
+                        print(f"  {key.capitalize()}: {value}")
+            else:
+                print("  None")
+
+            print(f"Embedding (first 5 values): {page['embeddings'][i][:5].tolist()}...")
             print("-" * 70)
-    else:
-        print("No documents found in the Chroma DB.")
+        if len(page["ids"]) == limit:
+            print(f"Next page: --after {page['ids'][-1]}")
+    finally:
+        reader.close()
+
+def export_store(out_dir, fmt="npy", chroma_dir=CHROMA_DIR):
+    reader = ChromaReader(chroma_dir)
+    try:
+        print(f"🔵 Exporting {reader.count()} documents from '{chroma_dir}' to '{out_dir}/'...")
+        start = time.perf_counter()
+
+        def progress(done, total):
+            if done % 10_000 < 1000 or done == total:
+                print(f"   {done}/{total} ({done / (time.perf_counter() - start):.0f} rows/s)")
+
+        written = export(reader, out_dir, fmt=fmt, progress=progress)
+        print(f"✅ Wrote rows.jsonl and embeddings.{fmt} ({written} rows) in {time.perf_counter() - start:.1f}s")
+    finally:
+        reader.close()
+
+def check_store(db_path=DB_FILE, chroma_dir=CHROMA_DIR, show=10):
+    # Exit status 1 when the store has drifted from products.db
+    reader = ChromaReader(chroma_dir)
+    try:
+        print(f"🔵 Comparing '{chroma_dir}' with '{db_path}'...")
+        start = time.perf_counter()
+        counts = {"missing": 0, "orphaned": 0, "stale": 0, "duplicate": 0}
+        for kind, product_id, detail in drift(reader, db_path):
+            counts[kind] += 1
+            if counts[kind] <= show:
+                print(f"   {kind:<9} {product_id}  {detail}")
+    finally:
+        reader.close()
+
+    summary = ", ".join(f"{count} {kind}" for kind, count in counts.items())
+    if any(counts.values()):
+        print(f"❌ Drift found in {time.perf_counter() - start:.1f}s: {summary}")
+        print("👉 Run generate_embeddings.py to embed missing/renamed rows and drop orphaned ones.")
+        return False
+    print(f"✅ Store matches {db_path} ({time.perf_counter() - start:.1f}s)")
+    return True
 
 if __name__ == "__main__":
-    import argparse
-    
-    parser = argparse.ArgumentParser(description="Print chunks of data from Chroma DB")
+    parser = argparse.ArgumentParser(description="Print, export or check the Chroma DB")
     parser.add_argument("--limit", type=int, default=10, help="Number of items to print")
     parser.add_argument("--offset", type=int, default=0, help="Starting position")
-    
+    parser.add_argument("--after", help="Print the page after this document id")
+    parser.add_argument("--chroma-dir", default=CHROMA_DIR, help="Chroma persist directory")
+    parser.add_argument("--export", metavar="DIR", help="Stream every row to DIR/rows.jsonl plus embeddings.npy/.parquet")
+    parser.add_argument("--format", choices=["npy", "parquet"], default="npy", help="Embeddings file format for --export")
+    parser.add_argument("--check", action="store_true", help="Diff the store against products.db")
+    parser.add_argument("--db", default=DB_FILE, help="products.db to check against")
+
     args = parser.parse_args()
-    
-    print_chroma_chunks(limit=args.limit, offset=args.offset)
+
+    if args.export:
+        export_store(args.export, fmt=args.format, chroma_dir=args.chroma_dir)
+    elif args.check:
+        sys.exit(0 if check_store(db_path=args.db, chroma_dir=args.chroma_dir, show=args.limit) else 1)
+    else:
+        print_chroma_chunks(limit=args.limit, offset=args.offset, after=args.after, chroma_dir=args.chroma_dir)
@@ -0,0 +1,193 @@
+# === retrieval.py ===
+# Query embedding and vector search for order items.
+#
+# All items of an order are embedded in one batched embeddings request (with a
+# memo for item strings we have seen before), then searched together as a
+# multi-query top-k against either the Chroma collection (ChromaIndex) or an
+# in-memory NumPy matrix of the catalog (NumpyIndex). Both return the same
+# Document shape.
+
+import os
+import json
+
+import numpy as np
+from langchain_core.documents import Document
+
+from cache import ResultCache, normalize_text
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class QueryEmbedder:
+    def __init__(self, embeddings, max_entries=8192, ttl=7 * 86400):
+        self.embeddings = embeddings
+        # Memory-only: a 1536-d vector is too big to be worth a round trip to SQLite
+        self.cache = ResultCache("embed", max_entries=max_entries, ttl=ttl)
+
+    def embed_many(self, texts):
+        keys = [normalize_text(text) for text in texts]
+        vectors = [self.cache.get(key) for key in keys]
+
+        # One embeddings request for all distinct texts we have not seen yet
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            fresh = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for key, vector in fresh.items():
+                self.cache.set(key, vector)
+            vectors = [vector if vector is not None else fresh[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+
+class ChromaIndex:
+    # Multi-query top-k straight against the Chroma collection behind a langchain store
+    def __init__(self, vectordb):
+        self.collection = vectordb._collection
+
+    def search_many(self, vectors, k=5):
+        # Returns, per query vector, a list of (Document, similarity) best first
+        if not vectors:
+            return []
+        results = self.collection.query(
+            query_embeddings=normalize_rows(np.asarray(vectors, dtype=np.float32)),
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        hits = []
+        for documents, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"]):
+            # Catalog and query vectors are unit length, so squared L2 distance d maps to cosine 1 - d / 2
+            hits.append([
+                (Document(page_content=document, metadata=metadata or {}), 1.0 - distance / 2.0)
+                for document, metadata, distance in zip(documents, metadatas, distances)
+            ])
+        return hits
+
+
+# === In-memory NumPy index ===
+# The whole catalog fits in one normalized float32 matrix, so top-k is a single
+# matrix product plus argpartition. Snapshots are plain .npy files loaded with
+# mmap, which lets every uvicorn worker share the same pages.
+SNAPSHOT_VECTORS = "embeddings.npy"
+SNAPSHOT_ROWS = "rows.jsonl"
+
+
+class NumpyIndex:
+    def __init__(self, matrix, ids, documents, metadatas):
+        self.matrix = matrix  # (N, D) float32, rows already unit length
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+
+    @classmethod
+    def load(cls, snapshot_dir):
+        matrix = np.load(os.path.join(snapshot_dir, SNAPSHOT_VECTORS), mmap_mode="r")
+        ids, documents, metadatas = [], [], []
+        with open(os.path.join(snapshot_dir, SNAPSHOT_ROWS), encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                ids.append(row["id"])
+                documents.append(row["document"])
+                metadatas.append(row["metadata"] or {})
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(f"Snapshot in {snapshot_dir} is inconsistent: {matrix.shape[0]} vectors, {len(ids)} rows")
+        return cls(matrix, ids, documents, metadatas)
+
+    @classmethod
+    def from_collection(cls, collection, page_size=1000):
+        # Read the embeddings persisted in a Chroma collection into memory
+        ids, documents, metadatas, vectors = [], [], [], []
+        for page in iter_collection(collection, page_size):
+            ids.extend(page["ids"])
+            documents.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        matrix = normalize_rows(np.vstack(vectors)) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return cls(matrix, ids, documents, metadatas)
+
+    def save(self, snapshot_dir):
+        # Write to temp names and rename, so running workers never mmap a half-written file
+        os.makedirs(snapshot_dir, exist_ok=True)
+        vectors_path = os.path.join(snapshot_dir, SNAPSHOT_VECTORS)
+        rows_path = os.path.join(snapshot_dir, SNAPSHOT_ROWS)
+        with open(rows_path + ".tmp", "w", encoding="utf-8") as f:
+            for row_id, document, metadata in zip(self.ids, self.documents, self.metadatas):
+                f.write(json.dumps({"id": row_id, "document": document, "metadata": metadata}, ensure_ascii=False) + "\n")
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        os.replace(rows_path + ".tmp", rows_path)
+        os.replace(vectors_path + ".tmp", vectors_path)
+
+    def search_many(self, vectors, k=5):
+        # Returns, per query vector, a list of (Document, similarity) best first
+        if len(vectors) == 0 or len(self.ids) == 0:
+            return [[] for _ in vectors]
+        queries = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        scores = queries @ self.matrix.T  # (B, N) cosine similarities
+        return [self.top_hits(row_scores, np.arange(len(self.ids)), k) for row_scores in scores]
+
+    def top_hits(self, scores, rows, k):
+        # Best k of rows (catalog row numbers) by their scores, as (Document, similarity)
+        k = min(k, len(rows))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        ranked = top[np.argsort(-scores[top])]
+        return [
+            (Document(page_content=self.documents[rows[i]], metadata=dict(self.metadatas[rows[i]])), float(scores[i]))
+            for i in ranked
+        ]
+
+
+class PartitionedIndex:
+    # Category-partitioned search over a NumpyIndex. Rows are grouped by a metadata
+    # field (the subcategory); a query first scores the group centroids, then only
+    # the rows of its best `probes` groups, so top-k comes from relevant groups and
+    # costs a fraction of the full matrix product.
+    def __init__(self, index, field="subcategory", probes=3):
+        self.index = index
+        self.probes = probes
+        labels = np.asarray([metadata.get(field) or "" for metadata in index.metadatas])
+        self.names, codes = np.unique(labels, return_inverse=True)
+        self.rows = [np.flatnonzero(codes == code) for code in range(len(self.names))]
+        self.centroids = normalize_rows(np.vstack([
+            np.asarray(index.matrix[rows], dtype=np.float32).mean(axis=0) for rows in self.rows
+        ])) if self.rows else np.zeros((0, 0), dtype=np.float32)
+
+    @property
+    def ids(self):
+        return self.index.ids
+
+    @property
+    def matrix(self):
+        return self.index.matrix
+
+    def search_many(self, vectors, k=5):
+        if len(vectors) == 0 or len(self.index.ids) == 0:
+            return [[] for _ in vectors]
+        queries = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        hits = []
+        for query, group_scores in zip(queries, queries @ self.centroids.T):
+            # Best groups first, and more of them if those hold fewer than k rows
+            chosen, count = [], 0
+            for group in np.argsort(-group_scores):
+                if len(chosen) >= self.probes and count >= k:
+                    break
+                chosen.append(self.rows[group])
+                count += len(self.rows[group])
+            rows = np.concatenate(chosen)
+            hits.append(self.index.top_hits(self.index.matrix[rows] @ query, rows, k))
+        return hits
+
+
+def iter_collection(collection, page_size=1000, include=("documents", "metadatas", "embeddings")):
+    # Page through a Chroma collection without materializing it all at once
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=list(include))
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
@@ -0,0 +1,222 @@
+# === stores.py ===
+# Per-store catalogs, loaded on first use and evicted under a memory budget.
+#
+# Each store has its own products.db and vector store (chroma_db/ or a
+# vector_index/ snapshot) in STORES_DIR/<store id>/; the default store is the
+# one in the backend directory itself. StoreRegistry builds a store's lookup
+# tables and vector index the first time an order names it, keeps the loaded
+# stores in least-recently-used order, and drops the coldest ones whenever the
+# estimated size of everything loaded goes over the budget. The default store
+# is pinned. A loaded store whose files were rebuilt since it loaded (see
+# Store.version) is loaded again on its next use. Requests that still hold an
+# evicted or replaced store finish with it; its memory is freed when the last of
+# them is done.
+
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Store ids become directory names, so nothing that could walk out of STORES_DIR
+STORE_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+# Catalog maps and normalizer vocabulary per product, measured on the bundled
+# catalog (~1.2 KB + ~2.4 KB with tracemalloc)
+ROW_BYTES = 3584
+
+# Seconds a store's file fingerprint is trusted before its files are stat'ed again
+VERSION_CHECK_SECONDS = 2.0
+
+
+class UnknownStore(LookupError):
+    pass
+
+
+class StoreUnavailable(RuntimeError):
+    # The store exists but its files are incomplete (e.g. no vector store yet)
+    pass
+
+
+def directory_bytes(path):
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class Store:
+    def __init__(self, store_id, root):
+        self.store_id = store_id
+        self.products_db = os.path.join(root, "products.db")
+        self.chroma_dir = os.path.join(root, "chroma_db")
+        self.snapshot_dir = os.path.join(root, "vector_index")
+        # Filled in by the registry's loader
+        self.vectordb = self.vector_index = self.catalog = self.fast_path = self.normalizer = None
+        self.version_fn = None  # -> fingerprint of the store's files
+        self.nbytes = 0
+        self.fingerprint = ""
+        self.version_checked_at = None
+        self.loaded_version = None  # version() when the load finished
+
+    def version(self):
+        # version_fn's answer, re-checked at most every VERSION_CHECK_SECONDS, so a
+        # rebuilt store is noticed without stat'ing its files on every lookup
+        now = time.monotonic()
+        if self.version_checked_at is None or now - self.version_checked_at >= VERSION_CHECK_SECONDS:
+            self.fingerprint = self.version_fn() if self.version_fn else ""
+            self.version_checked_at = now
+        return self.fingerprint
+
+    def estimate_bytes(self):
+        # Vectors: the NumPy matrix, or Chroma's HNSW segment files, which it loads whole
+        matrix = getattr(self.vector_index, "matrix", None)
+        if matrix is not None:
+            vectors = matrix.nbytes
+        else:
+            vectors = directory_bytes(self.chroma_dir) - directory_bytes(os.path.join(self.chroma_dir, "chroma.sqlite3"))
+        return vectors + len(self.catalog or ()) * ROW_BYTES
+
+
+class StoreRegistry:
+    def __init__(self, load, default_id, default_root, stores_dir, budget_bytes, unload=None):
+        self.load = load  # Store -> None; builds its resources
+        self.unload = unload  # Store -> None; lets go of what the registry alone cannot drop
+        self.default_id = default_id
+        self.default_root = default_root
+        self.stores_dir = stores_dir
+        self.budget_bytes = budget_bytes
+        self.lock = threading.Lock()
+        self.loaded = OrderedDict()  # store id -> Store, least recently used first
+        self.loading = {}  # store id -> lock held while that store loads
+        self.default = None
+        self.hits = self.loads = self.evictions = self.reloads = 0
+        self.load_seconds = 0.0
+
+    def root(self, store_id):
+        # Directory of a store's files; UnknownStore for bad ids and missing stores
+        if store_id is None or store_id == self.default_id:
+            return self.default_root
+        if not STORE_ID.match(store_id):
+            raise UnknownStore(f"Invalid store id: {store_id!r}")
+        root = os.path.join(self.stores_dir, store_id)
+        if not os.path.exists(os.path.join(root, "products.db")):
+            raise UnknownStore(f"Unknown store: {store_id}")
+        return root
+
+    def available(self):
+        ids = [self.default_id]
+        if os.path.isdir(self.stores_dir):
+            ids.extend(
+                name for name in sorted(os.listdir(self.stores_dir))
+                if name != self.default_id and STORE_ID.match(name)
+                and os.path.exists(os.path.join(self.stores_dir, name, "products.db"))
+            )
+        return ids
+
+    def load_default(self):
+        self.default = self.get(self.default_id)
+
+    def get(self, store_id=None):
+        store_id = store_id or self.default_id
+        with self.lock:
+            store = self.loaded.get(store_id)
+            if store is not None and not self.stale(store):
+                self.loaded.move_to_end(store_id)
+                self.hits += 1
+                return store
+            root = self.root(store_id)
+            # One load per store: concurrent first requests wait for the same one,
+            # while other stores load in parallel
+            gate = self.loading.setdefault(store_id, threading.Lock())
+        with gate:
+            with self.lock:
+                previous = self.loaded.get(store_id)
+                if previous is not None and not self.stale(previous):
+                    self.loaded.move_to_end(store_id)
+                    self.hits += 1
+                    return previous
+            store = Store(store_id, root)
+            if previous is not None:
+                # Before the load, so the new copy gets clients of its own (Chroma shares
+                # one per directory); requests holding the old copy keep theirs
+                self.release(previous)
+            start = time.perf_counter()
+            try:
+                self.load(store)
+                store.nbytes = store.estimate_bytes()
+                store.loaded_version = store.version()
+            except Exception:
+                with self.lock:
+                    self.loading.pop(store_id, None)
+                self.release(store)
+                if previous is None:
+                    raise
+                # Keep serving the copy we have until the files change again
+                logger.exception("Reloading store %s failed, keeping the loaded copy", store_id)
+                previous.loaded_version = previous.version()
+                return previous
+            seconds = time.perf_counter() - start
+            logger.info(
+                "%s store %s: %d products, ~%d MB, %.2fs",
+                "Reloaded" if previous is not None else "Loaded", store_id, len(store.catalog),
+                store.nbytes // 2**20, seconds,
+            )
+            with self.lock:
+                self.loaded[store_id] = store
+                self.loaded.move_to_end(store_id)
+                if store_id == self.default_id:
+                    self.default = store
+                self.loading.pop(store_id, None)
+                self.loads += 1
+                self.reloads += previous is not None
+                self.load_seconds += seconds
+                self.evict(keep=store_id)
+        return store
+
+    @staticmethod
+    def stale(store):
+        # Its files were rebuilt (an atomic products.db swap, a new vector store) since it loaded
+        return store.loaded_version is not None and store.version() != store.loaded_version
+
+    def release(self, store):
+        if self.unload is not None:
+            try:
+                self.unload(store)
+            except Exception:
+                logger.exception("Unloading store %s failed", store.store_id)
+
+    def evict(self, keep):
+        # Caller holds the lock. Drop least recently used stores until the rest fit.
+        for store_id in list(self.loaded):
+            if self.resident_bytes() <= self.budget_bytes:
+                return
+            if store_id in (keep, self.default_id):
+                continue
+            store = self.loaded.pop(store_id)
+            self.evictions += 1
+            self.release(store)
+            logger.info("Evicted store %s (~%d MB)", store_id, store.nbytes // 2**20)
+
+    def resident_bytes(self):
+        return sum(store.nbytes for store in self.loaded.values())
+
+    def stats(self):
+        with self.lock:
+            return {
+                "loaded": list(self.loaded),
+                "resident_bytes": self.resident_bytes(),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+                "load_seconds": round(self.load_seconds, 3),
+            }
@@ -0,0 +1,77 @@
+# Shared fixtures for the backend unit tests. Everything here runs offline: the
+# catalog is a handful of rows loaded through load_csv_to_db.py, and vector search
+# is replaced by a fixed ranking of product names per query.
+
+import os
+import csv
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import ProductCatalog  # noqa: E402
+from load_csv_to_db import load_csv_to_db  # noqa: E402
+
+# (ProductName, Price, Quantity, Category, SubCategory), with the same naming as products.csv
+PRODUCTS = [
+    ("Onion (Loose)", 69.75, "2 kg", "Fruits & Vegetables", "Potato, Onion & Tomato"),
+    ("Onion", 174.35, "5 kg", "Fruits & Vegetables", "Potato, Onion & Tomato"),
+    ("Onion (Loose)", 36.0, "1 kg", "Fruits & Vegetables", "Potato, Onion & Tomato"),
+    ("Besan/Kadale Hittu", 65.0, "500 g", "Foodgrains, Oil & Masala", "Dals & Pulses"),
+    ("Besan/Kadale Hittu", 125.0, "1 kg", "Foodgrains, Oil & Masala", "Dals & Pulses"),
+    ("Organic - Besan/Kadale Hittu", 160.0, "1 kg", "Foodgrains, Oil & Masala", "Organic Dals & Pulses"),
+    ("Milk - Coconut", 99.0, "400 ml", "Foodgrains, Oil & Masala", "Cooking Coconut Milk"),
+    ("Toned Milk", 27.0, "500 ml", "Bakery, Cakes & Dairy", "Dairy"),
+    ("Toned Milk", 54.0, "1 ltr", "Bakery, Cakes & Dairy", "Dairy"),
+    ("Biscuit/Dryfruit/Khakra Plastic Store Fresh Container/Bowl Set - 5454-4, BPA-Free, Orange", 349.0,
+     "4 pcs", "Kitchen, Garden & Pets", "Storage & Accessories"),
+    ("Marie Biscuit", 30.0, "250 g", "Snacks & Branded Foods", "Biscuits & Cookies"),
+    ("Salt/Uppu - Crystal", 25.0, "1 kg", "Foodgrains, Oil & Masala", "Salt, Sugar & Jaggery"),
+]
+
+
+class Doc:
+    # The slice of a langchain Document the resolvers read
+    def __init__(self, product):
+        self.page_content = product["productname"]
+        self.metadata = {"product_id": product["product_id"], "packSize": product["packSize"]}
+
+
+@pytest.fixture
+def products_db(tmp_path):
+    csv_path = tmp_path / "products.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ProductName", "Price", "Image_Url", "Quantity", "Category", "SubCategory"])
+        for sku, (name, price, quantity, category, subcategory) in enumerate(PRODUCTS, start=1000):
+            image_url = f"https://www.bigbasket.com/media/uploads/p/l/{sku}_1-product.jpg"
+            writer.writerow([name, price, image_url, quantity, category, subcategory])
+    db_path = tmp_path / "products.db"
+    load_csv_to_db(str(csv_path), str(db_path))
+    return str(db_path)
+
+
+@pytest.fixture
+def catalog(products_db):
+    return ProductCatalog(products_db)
+
+
+@pytest.fixture
+def ranked_search(catalog):
+    # ranked_search({"milk": [("Toned Milk", 0.95), ...]}) -> a search function for
+    # FastPathResolver: every pack of each named product, in the given order, with that score
+    def make(rankings):
+        def search(terms):
+            hits = []
+            for term in terms:
+                term_hits = []
+                for name, score in rankings.get(term, []):
+                    term_hits.extend(
+                        (Doc(product), score) for product in catalog.by_product_id.values()
+                        if product["productname"] == name
+                    )
+                hits.append(term_hits)
+            return hits
+        return search
+    return make
@@ -0,0 +1,34 @@
+import io
+import wave
+
+from audio import DEFAULT_FILENAME, audio_duration, compressed_max_bytes, upload_filename
+
+
+def wav_clip(seconds, rate=8000):
+    out = io.BytesIO()
+    with wave.open(out, "wb") as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(rate)
+        clip.writeframes(b"\x00\x00" * int(seconds * rate))
+    return out.getvalue()
+
+
+def test_wav_duration_comes_from_the_header():
+    assert audio_duration(wav_clip(1.5)) == 1.5
+
+
+def test_compressed_and_broken_clips_have_no_stated_duration():
+    assert audio_duration(b"\x1aE\xdf\xa3" + b"\x00" * 100) is None  # webm
+    assert audio_duration(b"RIFF\x00\x00\x00\x00WAVEjunk") is None
+
+
+def test_compressed_size_limit_follows_the_duration_limit():
+    assert compressed_max_bytes(300) == 4_800_000
+    assert compressed_max_bytes(60, bits_per_second=32_000) == 240_000
+
+
+def test_upload_filename_keeps_the_extension_whisper_needs():
+    assert upload_filename("note.ogg") == "note.ogg"
+    assert upload_filename("blob") == DEFAULT_FILENAME
+    assert upload_filename(None) == DEFAULT_FILENAME
@@ -0,0 +1,62 @@
+import importlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+from fakes import FakeChatModel, FakeOpenAIClient, hash_embedding
+
+
+@pytest.fixture
+def benchmark(monkeypatch):
+    # The script changes directory and fills in settings at import; undo both afterwards
+    monkeypatch.chdir(os.getcwd())
+    for name in ("OPENAI_API_KEY", "CACHE_DB", "UPSTREAM_LIMITS", "LOG_LEVEL"):
+        monkeypatch.setenv(name, os.environ.get(name, "sk-test" if name == "OPENAI_API_KEY" else ""))
+    return importlib.import_module("benchmark")
+
+
+def test_hash_embeddings_are_unit_length_and_favour_similar_names():
+    onion, onions, salt = (np.asarray(hash_embedding(text)) for text in ("Onion", "onion (loose)", "Salt"))
+    assert np.linalg.norm(onion) == pytest.approx(1.0)
+    assert onion @ onions > onion @ salt
+    assert hash_embedding("Onion") == hash_embedding("onion")
+    assert not any(hash_embedding(""))
+
+
+def test_fake_extraction_picks_the_first_candidate_per_item():
+    prompt = (
+        "### ITEM\nCUSTOMER QUERY:\nonion 2 kg\nCONTEXT:\nid | name | pack | price\n1002 | Onion (Loose) | 1 kg | 36.0 | \n\n"
+        "### ITEM\nCUSTOMER QUERY:\nmarie biscuit 3\nCONTEXT:\nid | name | pack | price\n1010 | Marie Biscuit | 250 g | 30.0 | \n"
+    )
+    answer = json.loads(FakeChatModel(latency=0, item_latency=0).invoke(prompt).content.strip("`json\n"))
+    assert answer == {
+        "1": [{"ids": ["1002"], "amount": 2000.0, "unit": "g"}],
+        "2": [{"ids": ["1010"], "quantity": 3}],
+    }
+
+
+def test_fake_openai_answers_depend_only_on_the_upload():
+    client = FakeOpenAIClient(["onion", "besan", "salt"], vision_latency=0, whisper_latency=0)
+    answers = [client.audio.transcriptions.create(model="whisper-1", file=("a.mp3", b"clip")).text for _ in range(2)]
+    assert answers[0] == answers[1] == client.pick(b"clip")
+
+
+def test_synthetic_orders_are_reproducible(benchmark, catalog):
+    orders = benchmark.synthetic_orders(catalog, 5, seed=7)
+    assert orders == benchmark.synthetic_orders(catalog, 5, seed=7)
+    assert orders != benchmark.synthetic_orders(catalog, 5, seed=8)
+    assert all(3 <= len(order.splitlines()) <= 15 for order in orders)
+
+
+def test_compare_reports_p95_regressions_beyond_the_tolerance(benchmark):
+    def results(**p95):
+        return {"levels": {"8": {"endpoints": {endpoint: {"p95_ms": ms} for endpoint, ms in p95.items()}}}}
+
+    baseline = results(**{"process-order": 100.0, "products": 10.0})
+    current = results(**{"process-order": 130.0, "products": 10.5, "upload-image": 900.0})
+    assert benchmark.compare(current, baseline, tolerance=0.15) == [
+        "concurrency 8 process-order: p95 100.0 ms -> 130.0 ms"
+    ]
+    assert benchmark.compare(current, baseline, tolerance=0.5) == []
@@ -0,0 +1,51 @@
+import pytest
+
+from bulk import BulkError, BulkPlan, parse_orders
+from normalize import split_order
+
+
+def test_parse_jsonl_objects_and_bare_strings():
+    contents = b'{"order_id": "a1", "query": "besan\\nnamak"}\n\n"pyaaj 1 kg"\n{"query": "atta"}\n'
+    assert parse_orders(contents) == [("a1", "besan\nnamak"), ("2", "pyaaj 1 kg"), ("3", "atta")]
+
+
+@pytest.mark.parametrize("line", [b'{"order_id": 1}', b'{"query": 5}', b'{"query": "   "}', b'{"query": "\\n\\t"}', b"not json"])
+def test_parse_jsonl_rejects_records_without_a_query(line):
+    with pytest.raises(BulkError, match="Line 2"):
+        parse_orders(b'{"query": "besan"}\n' + line + b"\n")
+
+
+def test_parse_csv_rows():
+    contents = "order_id,query\nx,besan\nz,\"onion 1 kg, namak\"\n,atta\n".encode("utf-8")
+    assert parse_orders(contents, filename="orders.csv") == [("x", "besan"), ("z", "onion 1 kg, namak"), ("3", "atta")]
+    with pytest.raises(BulkError):
+        parse_orders(b"id,text\n1,besan\n", filename="orders.csv")
+
+
+@pytest.mark.parametrize("row", [b"y,", b"y,  ", b"y"])
+def test_parse_csv_rejects_rows_without_a_query(row):
+    with pytest.raises(BulkError, match="Line 3"):
+        parse_orders(b"order_id,query\nx,besan\n" + row + b"\nz,atta\n", filename="orders.csv")
+
+
+def test_plan_resolves_each_distinct_line_once():
+    orders = [("1", "Besan\nnamak"), ("2", "besan, atta"), ("3", "List 1\n- atta")]
+    plan = BulkPlan(orders, split_order)
+    assert set(plan.lines) == {"besan", "namak", "atta"}
+    assert plan.order_keys[2] == ["atta"]  # the heading is no line of the order
+
+    assert plan.resolve("besan", [{"product_id": "b"}]) == []
+    assert plan.resolve("atta", [{"product_id": "a"}]) == [1, 2]
+    assert plan.resolve("namak", None) == [0]
+    assert plan.order_record(1)["status"] == "ok"
+    record = plan.order_record(0)
+    assert record["status"] == "partial"
+    assert record["errors"] == [{"item": "namak", "detail": "No matching products found."}]
+
+
+def test_plan_reports_errors_and_empty_orders():
+    plan = BulkPlan([("1", "besan"), ("2", "List 1")], split_order)
+    assert plan.empty_orders() == [1]
+    assert plan.resolve("besan", error="Upstream busy") == [0]
+    assert plan.order_record(0)["status"] == "error"
+    assert plan.order_record(1)["status"] == "not_found"
@@ -0,0 +1,174 @@
+import time
+import threading
+
+import pytest
+
+from cache import PersistentStore, ResultCache, file_fingerprint
+
+
+@pytest.fixture
+def version():
+    # Mutable catalog version the caches below follow
+    return ["v1"]
+
+
+def make_cache(version, **kwargs):
+    return ResultCache("test", version_fn=lambda: version[0], version_check_interval=0, **kwargs)
+
+
+def test_lru_eviction(version):
+    cache = make_cache(version, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # b is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_dropped(version):
+    cache = make_cache(version, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_catalog_version_change_invalidates(version):
+    cache = make_cache(version)
+    cache.set("a", 1)
+    version[0] = "v2"
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["version"] == "v2"
+
+
+def test_persistent_tier_survives_restart_but_not_a_new_version(tmp_path, version):
+    store = PersistentStore(str(tmp_path / "cache.db"))
+    make_cache(version, store=store).set("a", {"ids": ["1"]})
+
+    restarted = make_cache(version, store=store)
+    assert restarted.get("a") == {"ids": ["1"]}
+    assert restarted.stats()["persistent_hits"] == 1
+
+    version[0] = "v2"
+    assert make_cache(version, store=store).get("a") is None
+
+
+def test_concurrent_callers_share_one_computation(version):
+    cache = make_cache(version)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "corrected"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute("q", compute)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute("q", compute)))
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == ["corrected", "corrected"]
+    assert len(calls) == 1
+    assert cache.get("q") == "corrected"
+
+
+def test_failed_computation_is_not_cached(version):
+    cache = make_cache(version)
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("q", fail)
+    assert cache.get_or_compute("q", lambda: "ok") == "ok"
+
+
+def wait_for_coalesced(cache, count):
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_batches_share_keys_with_each_other_and_single_callers(version):
+    cache = make_cache(version)
+    cache.set("cached", "hit")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute(keys):
+        calls.append(list(keys))
+        started.set()
+        release.wait(5)
+        return {key: key.upper() for key in keys}
+
+    results = {}
+    owner = threading.Thread(target=lambda: results.update(first=cache.get_or_compute_many(["a", "b"], compute)))
+    owner.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.update(
+        second=cache.get_or_compute_many(["b", "c", "cached", "c"], compute)))
+    single = threading.Thread(target=lambda: results.update(single=cache.get_or_compute("a", lambda: "other")))
+    second.start()
+    single.start()
+    wait_for_coalesced(cache, 2)
+    release.set()
+    for thread in (owner, second, single):
+        thread.join(5)
+    # b and a were computed once, by the first batch; the second only asked for c
+    assert calls == [["a", "b"], ["c"]]
+    assert results["first"] == {"a": "A", "b": "B"}
+    assert results["second"] == {"b": "B", "c": "C", "cached": "hit"}
+    assert results["single"] == "A"
+
+
+def test_keys_a_batch_leaves_out_are_computed_by_their_waiters(version):
+    cache = make_cache(version)
+    started, release = threading.Event(), threading.Event()
+
+    def compute(keys):
+        started.set()
+        release.wait(5)
+        return {"a": "A"}
+
+    results = {}
+    owner = threading.Thread(target=lambda: results.update(batch=cache.get_or_compute_many(["a", "b"], compute)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.update(single=cache.get_or_compute("b", lambda: "retried")))
+    waiter.start()
+    wait_for_coalesced(cache, 1)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == {"batch": {"a": "A"}, "single": "retried"}
+
+
+def test_failed_batch_is_not_cached(version):
+    cache = make_cache(version)
+
+    def fail(keys):
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute_many(["a"], fail)
+    assert cache.get_or_compute_many(["a"], lambda keys: {"a": "ok"}) == {"a": "ok"}
+
+
+def test_file_fingerprint_changes_with_the_file(tmp_path):
+    path = tmp_path / "products.db"
+    missing = file_fingerprint(str(path))
+    path.write_bytes(b"one")
+    first = file_fingerprint(str(path))
+    path.write_bytes(b"three")
+    assert len({missing, first, file_fingerprint(str(path))}) == 3
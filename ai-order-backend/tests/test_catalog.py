@@ -0,0 +1,48 @@
+from catalog import ProductCatalog, make_product_id, name_keys, whole_name_keys
+
+from conftest import PRODUCTS
+
+
+def test_catalog_indexes_every_row(catalog):
+    assert len(catalog) == len(PRODUCTS)
+    product = catalog.get("1003")
+    assert product["productname"] == "Besan/Kadale Hittu"
+    assert (product["packSize"], product["pack_amount"], product["pack_unit"]) == ("500 g", 500.0, "g")
+    assert catalog.get("missing") is None
+    assert [p and p["product_id"] for p in catalog.get_many(["1000", "missing"])] == ["1000", None]
+
+
+def test_id_for_matches_name_and_pack_case_insensitively(catalog):
+    assert catalog.id_for("onion (loose)", "1 KG") == "1002"
+    assert catalog.id_for("Onion (Loose)", "3 kg") is None
+
+
+def test_named_groups_packs_of_whole_names(catalog):
+    assert sorted(p["packSize"] for p in catalog.named("onion")) == ["1 kg", "2 kg", "5 kg"]
+    # Organic packs answer to the plain name too
+    assert {p["productname"] for p in catalog.named("besan")} == {"Besan/Kadale Hittu", "Organic - Besan/Kadale Hittu"}
+    # "Milk - Coconut" is coconut milk, not milk
+    assert catalog.named("milk") == []
+
+
+def test_name_keys():
+    assert name_keys("Organic - Turmeric Powder/Arisina Pudi") == {"turmeric powder", "arisina pudi"}
+    assert name_keys("Onion (Loose)") == {"onion"}
+    assert whole_name_keys("Milk - Coconut") == set()
+    assert whole_name_keys("Organic - Besan/Kadale Hittu") == {"besan", "kadale hittu"}
+
+
+def test_catalog_holds_no_connection_after_loading(products_db, tmp_path):
+    catalog = ProductCatalog(products_db)
+    (tmp_path / "products.db").unlink()
+    assert catalog.get("1011")["productname"] == "Salt/Uppu - Crystal"
+
+
+def test_product_ids_are_stable():
+    url = "https://www.bigbasket.com/media/uploads/p/l/40023472_2-fresho-onion.jpg"
+    assert make_product_id("Onion", "1 kg", "Fruits & Vegetables", "Potato, Onion & Tomato", url) == "40023472"
+    # Without a product image: a content hash, the same every time and distinct per pack
+    first = make_product_id("Onion", "1 kg", "Fruits & Vegetables", "Potato, Onion & Tomato", "")
+    assert first == make_product_id("Onion", "1 kg", "Fruits & Vegetables", "Potato, Onion & Tomato", None)
+    assert first.startswith("h") and len(first) == 11
+    assert first != make_product_id("Onion", "2 kg", "Fruits & Vegetables", "Potato, Onion & Tomato", "")
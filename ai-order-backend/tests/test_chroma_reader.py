@@ -0,0 +1,87 @@
+import sqlite3
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.api.shared_system_client import SharedSystemClient
+from chromadb.config import Settings
+
+from chroma_reader import COLLECTION, ChromaReader, drift, export
+from retrieval import NumpyIndex
+
+
+def product_rows(products_db):
+    conn = sqlite3.connect(products_db)
+    try:
+        return conn.execute(
+            "SELECT product_id, productname, price, quantity, category, subcategory, image_url FROM products ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def chroma_dir(tmp_path, products_db):
+    # A store for the test catalog, as generate_embeddings.py writes it, with a few rows drifted
+    path = str(tmp_path / "chroma_db")
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection(COLLECTION)
+    rows = product_rows(products_db)
+    ids, documents, metadatas = [], [], []
+    for product_id, name, price, quantity, category, subcategory, image_url in rows[1:]:  # the first is missing
+        ids.append(product_id)
+        documents.append(name)
+        metadatas.append({"product_id": product_id, "packSize": quantity, "price": str(price),
+                          "category": category, "subcategory": subcategory, "image_url": image_url})
+    metadatas[0]["price"] = "1.0"  # stale price
+    ids.append("gone")
+    documents.append("Discontinued Soap")
+    metadatas.append({"product_id": rows[2][0]})  # orphaned, and a second row for that product id
+    embeddings = [[float(i), 1.0, 0.0] for i in range(len(ids))]
+    collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+    yield path
+    SharedSystemClient.clear_system_cache()
+
+
+@pytest.fixture
+def reader(chroma_dir):
+    reader = ChromaReader(chroma_dir)
+    yield reader
+    reader.close()
+
+
+def test_missing_store_is_refused(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ChromaReader(str(tmp_path / "nowhere"))
+
+
+def test_pages_cover_the_store_in_id_order(reader):
+    pages = list(reader.pages(page_size=5))
+    ids = [row_id for page in pages for row_id in page["ids"]]
+    assert reader.count() == len(ids) == len(set(ids))
+    assert ids == sorted(ids)
+    assert [len(page["ids"]) for page in pages][:-1] == [5] * (len(pages) - 1)
+    # Resuming after a page's last id, or skipping rows up front, picks up where that left off
+    assert [i for page in reader.pages(page_size=5, after=ids[4]) for i in page["ids"]] == ids[5:]
+    assert [i for page in reader.pages(page_size=5, offset=3) for i in page["ids"]] == ids[3:]
+    first = next(reader.pages(page_size=1))
+    assert first["documents"][0] and first["metadatas"][0]["product_id"]
+
+
+def test_export_writes_a_loadable_snapshot(reader, tmp_path):
+    out = tmp_path / "snapshot"
+    assert export(reader, str(out), normalize=True) == reader.count()
+    index = NumpyIndex.load(str(out))
+    assert len(index.ids) == reader.count()
+    np.testing.assert_allclose(np.linalg.norm(np.asarray(index.matrix), axis=1), 1.0, rtol=1e-6)
+    assert not list(out.glob("*.tmp"))
+
+
+def test_drift_against_products_db(reader, products_db):
+    rows = product_rows(products_db)
+    found = {(kind, product_id): detail for kind, product_id, detail in drift(reader, products_db)}
+    assert found[("missing", rows[0][0])] == rows[0][1]
+    assert found[("orphaned", "gone")] == "Discontinued Soap"
+    assert found[("stale", rows[1][0])] == "price"
+    assert found[("duplicate", rows[2][0])] == "2 rows"
+    assert len(found) == 4
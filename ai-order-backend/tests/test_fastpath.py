@@ -0,0 +1,58 @@
+from fastpath import HEADING, FastPathResolver, is_heading
+
+
+def test_parse_splits_quantity_and_aliases():
+    assert FastPathResolver.parse("- pyaaj 1 kg") == ("onion", 1000.0, "g", None)
+    assert FastPathResolver.parse("3. besan") == ("besan", None, None, None)
+    assert FastPathResolver.parse("namak 2 packet") == ("salt", None, None, 2)
+
+
+def test_headings_are_not_items():
+    for line in ["List 1", "list 3", "Items:", "Shopping list", "3.", "---"]:
+        assert is_heading(line), line
+    for line in ["besan", "onion 1 kg", "xyzzy"]:
+        assert not is_heading(line), line
+
+
+def test_multi_list_order_has_no_item_for_its_headings(catalog, ranked_search):
+    search = ranked_search({
+        "besan": [("Besan/Kadale Hittu", 0.97)],
+        "onion": [("Onion", 0.96), ("Onion (Loose)", 0.95)],
+    })
+    resolver = FastPathResolver(catalog, search)
+    entries = resolver.resolve_many(["List 1", "besan", "xyzzy", "List 2", "onion 1 kg"])
+    assert entries[0] is HEADING and entries[3] is HEADING
+    assert entries[2] is None  # unknown: escalated, not dropped
+    assert entries[1]["quantity"] == 1
+    assert entries[4] == {"ids": entries[4]["ids"], "amount": 1000.0, "unit": "g"}
+
+
+def test_headings_are_dropped_even_when_search_fails(catalog):
+    def broken(terms):
+        raise RuntimeError("embeddings down")
+
+    entries = FastPathResolver(catalog, broken).resolve_many(["List 1", "besan"])
+    assert entries == [HEADING, None]
+
+
+def test_name_index_only_knows_whole_names(catalog):
+    # "Milk - Coconut" is not plain milk, and the container is no biscuit
+    assert catalog.named("milk") == []
+    assert catalog.named("biscuit") == []
+    assert {p["productname"] for p in catalog.named("onion")} == {"Onion", "Onion (Loose)"}
+
+
+def test_milk_is_never_coconut_milk(catalog, ranked_search):
+    search = ranked_search({"milk": [("Milk - Coconut", 0.86), ("Toned Milk", 0.85)]})
+    assert FastPathResolver(catalog, search).resolve_many(["doodh 2 litre"]) == [None]
+
+
+def test_name_match_needs_the_top_hit_to_agree(catalog, ranked_search):
+    onion_first = ranked_search({"onion": [("Onion", 0.96), ("Onion (Loose)", 0.95)]})
+    entry = FastPathResolver(catalog, onion_first).resolve_many(["onion 2 kg"])[0]
+    assert entry["unit"] == "g" and entry["amount"] == 2000.0
+    assert {catalog.get(i)["productname"] for i in entry["ids"]} == {"Onion", "Onion (Loose)"}
+
+    # Same name in the index, but the best hit is another product: the LLM decides
+    other_first = ranked_search({"besan": [("Milk - Coconut", 0.91), ("Besan/Kadale Hittu", 0.90)]})
+    assert FastPathResolver(catalog, other_first).resolve_many(["besan"]) == [None]
@@ -0,0 +1,95 @@
+import threading
+
+import httpx
+import openai
+import pytest
+
+from gateway import TokenBucket, UpstreamBusy, UpstreamGateway, parse_limits
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+def test_parse_limits():
+    assert parse_limits("gpt-4o=500:30000, whisper-1=50:0,junk") == {
+        "gpt-4o": (500.0, 30000.0), "whisper-1": (50.0, 0.0),
+    }
+    assert parse_limits("") == {}
+
+
+def test_token_bucket_wait():
+    bucket = TokenBucket(60)  # one per second
+    assert bucket.wait_for(60, now=bucket.updated) == 0.0
+    bucket.take(60)
+    assert bucket.wait_for(1, now=bucket.updated) == pytest.approx(1.0)
+    # A request larger than the bucket waits for a full bucket, not forever
+    assert bucket.wait_for(600, now=bucket.updated) == pytest.approx(60.0)
+
+
+def test_rejects_with_429_when_the_wait_is_too_long():
+    gateway = UpstreamGateway({"gpt-4o": (2, 0)}, max_wait=0.5)
+    gateway.acquire("gpt-4o")
+    gateway.acquire("gpt-4o")
+    with pytest.raises(UpstreamBusy) as e:
+        gateway.acquire("gpt-4o")
+    assert e.value.status_code == 429 and e.value.retry_after >= 1
+    assert gateway.stats()["models"]["gpt-4o"]["rejected_429"] == 1
+
+
+def test_rejects_with_503_when_the_queue_is_full():
+    gateway = UpstreamGateway({"gpt-4o": (60, 0)}, max_wait=5, max_queue=1)
+    for _ in range(60):
+        gateway.acquire("gpt-4o")  # empty the bucket
+    sleeper = threading.Thread(target=gateway.acquire, args=("gpt-4o",))
+    sleeper.start()  # waits ~1 s for its reservation
+    while gateway.stats()["waiting"] == 0 and sleeper.is_alive():
+        sleeper.join(0.001)
+    with pytest.raises(UpstreamBusy) as e:
+        gateway.acquire("gpt-4o")
+    assert e.value.status_code == 503
+    sleeper.join(5)
+
+
+def test_retries_transient_errors_then_gives_up():
+    gateway = UpstreamGateway({}, max_retries=2, backoff_base=0)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise connection_error()
+        return "ok"
+
+    assert gateway.call("gpt-4o", flaky) == "ok"
+    assert gateway.stats()["models"]["gpt-4o"]["retries"] == 2
+
+    def down():
+        raise connection_error()
+
+    with pytest.raises(openai.APIConnectionError):
+        gateway.call("gpt-4o", down)
+    assert gateway.stats()["models"]["gpt-4o"]["errors"] == 1
+
+
+def test_other_errors_are_not_retried():
+    gateway = UpstreamGateway({}, backoff_base=0)
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        gateway.call("gpt-4o", broken)
+    assert len(attempts) == 1
+
+
+def test_counts_reported_usage():
+    class Message:
+        usage_metadata = {"input_tokens": 120, "output_tokens": 30}
+
+    gateway = UpstreamGateway({})
+    gateway.call("gpt-4o", Message)
+    counters = gateway.stats()["models"]["gpt-4o"]
+    assert (counters["prompt_tokens"], counters["completion_tokens"]) == (120, 30)
@@ -0,0 +1,69 @@
+import csv
+import importlib
+
+import pytest
+
+from conftest import PRODUCTS
+
+
+@pytest.fixture
+def generate_embeddings(monkeypatch):
+    # The script checks for an OpenAI key at import; nothing here calls OpenAI
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    return importlib.import_module("generate_embeddings")
+
+
+@pytest.fixture
+def products_csv(tmp_path):
+    path = tmp_path / "products.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ProductName", "Price", "Image_Url", "Quantity", "Category", "SubCategory"])
+        for sku, (name, price, quantity, category, subcategory) in enumerate(PRODUCTS, start=1000):
+            writer.writerow([name, price, f"https://www.bigbasket.com/media/uploads/p/l/{sku}_1-p.jpg", quantity,
+                             category, subcategory])
+        writer.writerow(["", 1.0, "", "1 kg", "", ""])  # no name: skipped
+    return str(path)
+
+
+class StoredCollection:
+    # The slice of a Chroma collection plan_changes reads, paged like the real one
+    def __init__(self, rows):
+        self.rows = rows  # [(id, document, metadata)]
+
+    def get(self, limit, offset, include):
+        page = self.rows[offset:offset + limit]
+        return {
+            "ids": [row[0] for row in page],
+            "documents": [row[1] for row in page],
+            "metadatas": [row[2] for row in page],
+        }
+
+
+def test_csv_rows_are_keyed_by_product_id(generate_embeddings, products_csv):
+    rows = generate_embeddings.load_products_from_csv(products_csv)
+    assert list(rows) == [str(sku) for sku in range(1000, 1000 + len(PRODUCTS))]
+    name, metadata = rows["1003"]
+    assert name == "Besan/Kadale Hittu"
+    assert metadata["packSize"] == "500 g"
+    assert metadata["content_hash"] == generate_embeddings.content_hash(name, metadata)
+
+
+def test_plan_embeds_only_new_and_renamed_rows(generate_embeddings, products_csv):
+    rows = generate_embeddings.load_products_from_csv(products_csv)
+    stored = [(product_id, name, dict(metadata)) for product_id, (name, metadata) in rows.items()]
+    del stored[0]  # new in the CSV
+    stored[0] = (stored[0][0], "Old Name", stored[0][2])  # renamed
+    stored[1][2]["content_hash"] = "old price"  # same name, new metadata
+    stored.append(("gone", "Discontinued Soap", {}))
+    to_embed, to_update, to_delete = generate_embeddings.plan_changes(rows, StoredCollection(stored))
+    assert to_embed == ["1000", "1001"]
+    assert to_update == ["1002"]
+    assert to_delete == ["gone"]
+
+    full = generate_embeddings.plan_changes(rows, StoredCollection(stored), full=True)
+    assert full[0] == list(rows) and full[1] == []
+
+
+def test_batched(generate_embeddings):
+    assert generate_embeddings.batched(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,61 @@
+import zlib
+import struct
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from images import ImageError, preprocess_image
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_HEADER = png_chunk(b"IHDR", struct.pack(">IIBBBBB", 4, 4, 8, 2, 0, 0, 0))
+
+
+def encode(image, format, **params):
+    out = BytesIO()
+    image.save(out, format=format, **params)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("contents", [
+    b"not an image",
+    # IHDR too short: PIL raises ValueError
+    PNG_SIGNATURE + png_chunk(b"IHDR", b"\x00" * 5),
+    # Garbage chunk after the first image data: PIL raises SyntaxError while decoding
+    PNG_SIGNATURE + PNG_HEADER + png_chunk(b"IDAT", zlib.compress(b"\x00" + b"\x10" * 12)[:10])
+    + struct.pack(">I", 4) + b"jj\n\x83abcd\x00\x00\x00\x00",
+], ids=["garbage", "short-header", "broken-chunk"])
+def test_malformed_uploads_are_rejected(contents):
+    with pytest.raises(ImageError):
+        preprocess_image(contents)
+
+
+def test_decompression_bombs_are_rejected(monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    with pytest.raises(ImageError):
+        preprocess_image(encode(Image.new("RGB", (40, 40)), "PNG"))
+
+
+def test_small_upright_images_pass_through():
+    contents = encode(Image.new("RGB", (200, 100), "white"), "PNG")
+    assert preprocess_image(contents) == (contents, "image/png")
+
+
+def test_large_images_are_downscaled_to_jpeg():
+    contents = encode(Image.new("RGBA", (3200, 1600), (255, 0, 0, 128)), "PNG")
+    prepared, mime_type = preprocess_image(contents, max_dim=800)
+    assert mime_type == "image/jpeg"
+    assert Image.open(BytesIO(prepared)).size == (800, 400)
+
+
+def test_exif_rotation_is_applied():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90° clockwise to display
+    contents = encode(Image.new("RGB", (200, 100)), "JPEG", exif=exif)
+    prepared, _ = preprocess_image(contents)
+    assert Image.open(BytesIO(prepared)).size == (100, 200)
@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from lifecycle import ReadinessGate, Startup
+
+
+def test_phases_run_in_order_and_are_timed():
+    ran = []
+    startup = Startup()
+    assert startup.run([("clients", lambda: ran.append("clients")), ("store", lambda: ran.append("store"))])
+    status = startup.status()
+    assert ran == ["clients", "store"]
+    assert status["ready"] and status["error"] is None
+    assert list(status["phases"]) == ["clients", "store"]
+
+
+def test_failed_phase_stops_startup_and_is_reported():
+    ran = []
+
+    def fail():
+        raise RuntimeError("no products.db")
+
+    startup = Startup()
+    assert not startup.run([("store", fail), ("caches", lambda: ran.append("caches"))])
+    status = startup.status()
+    assert ran == []
+    assert not status["ready"]
+    assert status["error"] == "store: no products.db"
+
+
+def call(gate, path):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(gate({"type": "http", "path": path}, None, send))
+    return sent
+
+
+def test_gate_answers_503_until_ready_except_for_probes():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    startup = Startup()
+    gate = ReadinessGate(app, startup)
+    blocked = call(gate, "/process-order/")
+    assert blocked[0]["status"] == 503
+    assert (b"retry-after", b"1") in blocked[0]["headers"]
+    assert json.loads(blocked[1]["body"]) == {"detail": "Service is starting up"}
+    assert call(gate, "/healthz")[0]["status"] == 200
+
+    startup.run([])
+    assert call(gate, "/process-order/")[0]["status"] == 200
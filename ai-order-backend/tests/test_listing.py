@@ -0,0 +1,53 @@
+import threading
+
+from catalog import LISTING_COLUMNS, iter_listing
+
+from conftest import PRODUCTS
+
+
+def page(products_db, **filters):
+    return list(iter_listing(products_db, list(LISTING_COLUMNS), **filters))
+
+
+def test_pages_cover_every_product_once_in_id_order(products_db):
+    seen, after = [], None
+    while True:
+        rows = page(products_db, after=after, limit=5)
+        seen.extend(row_id for row_id, _ in rows)
+        if len(rows) < 5:
+            break
+        after = rows[-1][0]
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) == len(PRODUCTS)
+
+
+def test_category_and_subcategory_filters(products_db):
+    dairy = page(products_db, category="Bakery, Cakes & Dairy")
+    assert {product["productname"] for _, product in dairy} == {"Toned Milk"}
+    organic = page(products_db, category="Foodgrains, Oil & Masala", subcategory="Organic Dals & Pulses")
+    assert [product["productname"] for _, product in organic] == ["Organic - Besan/Kadale Hittu"]
+
+
+def test_prefix_is_a_literal_case_insensitive_prefix(products_db):
+    onions = page(products_db, prefix="onion")
+    assert len(onions) == 3
+    assert all(product["productname"].startswith("Onion") for _, product in onions)
+    # LIKE wildcards in the prefix match themselves, not any character
+    assert page(products_db, prefix="%nion") == []
+    assert page(products_db, prefix="_nion") == []
+
+
+def test_fields_project_the_listing(products_db):
+    rows = list(iter_listing(products_db, ["productname", "packSize"], prefix="Marie"))
+    assert [product for _, product in rows] == [{"productname": "Marie Biscuit", "packSize": "250 g"}]
+
+
+def test_can_be_advanced_from_another_thread(products_db):
+    # StreamingResponse moves sync iterators between threadpool workers
+    rows = iter_listing(products_db, ["productname"])
+    first = next(rows)
+    rest = []
+    worker = threading.Thread(target=lambda: rest.extend(rows))
+    worker.start()
+    worker.join()
+    assert len([first] + rest) == len(PRODUCTS)
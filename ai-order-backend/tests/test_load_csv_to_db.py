@@ -0,0 +1,54 @@
+import os
+import sqlite3
+
+import pytest
+
+from load_csv_to_db import load_csv_to_db
+
+HEADER = "ProductName,Price,Image_Url,Quantity,Category,SubCategory\n"
+URL = "https://www.bigbasket.com/media/uploads/p/l/{}_1-item.jpg"
+
+
+def write_csv(path, rows):
+    path.write_text(HEADER + "".join(",".join(row) + "\n" for row in rows), encoding="utf-8")
+
+
+def products(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT product_id, productname, price, quantity, pack_amount, pack_unit FROM products ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def test_builds_products_with_ids_and_parsed_packs(tmp_path):
+    csv_path = tmp_path / "products.csv"
+    write_csv(csv_path, [
+        ["Onion", "174.35", URL.format(1201414), "5 kg", "Fruits & Vegetables", "Onion"],
+        ["Onion again", "1.0", URL.format(1201414), "5 kg", "Fruits & Vegetables", "Onion"],
+        ["Gift Hamper", "999", "", "Combo", "Gourmet", "Hampers"],
+    ])
+    db_path = str(tmp_path / "products.db")
+    load_csv_to_db(str(csv_path), db_path, chunk_size=1)
+    rows = products(db_path)
+    # A repeated product id keeps its first row; rows without a SKU get a content hash id
+    assert rows[0] == ("1201414", "Onion", 174.35, "5 kg", 5000.0, "g")
+    assert len(rows) == 2
+    assert rows[1][0].startswith("h") and rows[1][4:] == (None, None)
+    assert not os.path.exists(db_path + ".tmp")
+
+
+def test_failed_load_leaves_the_live_database_alone(tmp_path):
+    good = tmp_path / "good.csv"
+    write_csv(good, [["Onion", "174.35", URL.format(1), "5 kg", "Fruits & Vegetables", "Onion"]])
+    db_path = str(tmp_path / "products.db")
+    load_csv_to_db(str(good), db_path)
+
+    bad = tmp_path / "bad.csv"
+    write_csv(bad, [["Besan", "not a price", URL.format(2), "1 kg", "Foodgrains", "Dals"]])
+    with pytest.raises(ValueError):
+        load_csv_to_db(str(bad), db_path)
+    assert [row[1] for row in products(db_path)] == ["Onion"]
+    assert not os.path.exists(db_path + ".tmp")
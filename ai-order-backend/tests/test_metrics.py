@@ -0,0 +1,92 @@
+import asyncio
+import json
+import logging
+
+from logs import JsonFormatter, RequestIdFilter, request_id
+from metrics import Registry, RequestMetrics, http_requests
+from timing import StageTimings, percentile
+
+
+def test_counters_gauges_and_labels_render_as_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    in_flight = registry.gauge("in_flight", "In flight")
+    requests.inc('/say "hi"')
+    requests.inc("/products", amount=2)
+    in_flight.inc()
+    in_flight.dec()
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP requests_total Requests", "# TYPE requests_total counter"]
+    assert 'requests_total{route="/products"} 2' in lines
+    assert 'requests_total{route="/say \\"hi\\""} 1' in lines
+    assert "in_flight 0" in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    stage = registry.histogram("stage_seconds", "Stages", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        stage.observe("embed", value=value)
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="embed",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="embed",le="1.0"} 3' in lines
+    assert 'stage_seconds_bucket{stage="embed",le="+Inf"} 4' in lines
+    assert 'stage_seconds_count{stage="embed"} 4' in lines
+    assert 'stage_seconds_sum{stage="embed"} 4.25' in lines
+
+
+def test_collectors_are_read_at_scrape_time():
+    registry = Registry()
+    hits = {"correct": 1}
+    registry.add_collector(lambda: [
+        ("cache_hits_total", "counter", "Cache hits", ("cache",), [((name,), count) for name, count in hits.items()]),
+    ])
+    hits["correct"] = 5
+    assert 'cache_hits_total{cache="correct"} 5' in registry.render().splitlines()
+
+
+def test_request_metrics_tags_responses_and_counts_by_route():
+    class Route:
+        path = "/items/{item_id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        seen.append(request_id.get())
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    seen, sent = [], []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"x-request-id", b"abc123")]}
+    before = http_requests.values.get(("GET", "/items/{item_id}", "204"), 0)
+    asyncio.run(RequestMetrics(app)(scope, None, send))
+    assert seen == ["abc123"]
+    assert (b"x-request-id", b"abc123") in sent[0]["headers"]
+    assert http_requests.values[("GET", "/items/{item_id}", "204")] == before + 1
+    assert request_id.get() == "-"
+
+
+def test_json_log_lines_carry_the_request_id():
+    record = logging.LogRecord("main", logging.INFO, __file__, 1, "resolved %d items", (3,), None)
+    token = request_id.set("req-1")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        request_id.reset(token)
+    entry = json.loads(JsonFormatter().format(record))
+    assert (entry["request_id"], entry["level"], entry["message"]) == ("req-1", "INFO", "resolved 3 items")
+
+
+def test_stage_timings_feed_hooks_and_percentiles():
+    timings = StageTimings(max_samples=3)
+    seen = []
+    timings.add_hook(lambda stage, seconds: seen.append(stage))
+    for seconds in (0.4, 0.1, 0.3, 0.2):
+        timings.record("extract", seconds)
+    assert timings.snapshot() == {"extract": [0.1, 0.3, 0.2]}  # bounded buffer keeps the latest
+    assert seen == ["extract"] * 4
+    assert percentile([0.1, 0.3, 0.2], 50) == 0.2
+    assert percentile([], 95) is None
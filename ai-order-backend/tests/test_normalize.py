@@ -0,0 +1,53 @@
+import pytest
+
+from normalize import Normalizer, SpellCorrector, edit_distance, split_order, tokenize
+
+
+@pytest.fixture
+def normalizer(catalog):
+    return Normalizer([product["productname"] for product in catalog.by_product_id.values()])
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance("onoin", "onion") == 1
+    assert edit_distance("besan", "besan") == 0
+    assert edit_distance("tel", "gur") == 3
+
+
+def test_spell_corrector_prefers_closest_then_most_frequent():
+    speller = SpellCorrector({"onion": 5, "union": 1, "salt": 3, "tel": 1})
+    assert speller.correct("onoin") == "onion"
+    assert speller.correct("unoin") == "union"
+    assert speller.correct("onnion") == "onion"
+    # Words of four letters or fewer are never corrected
+    assert speller.correct("tal") is None
+    assert speller.correct("slat") is None
+    assert speller.correct("xyzzy") is None
+
+
+def test_split_and_tokenize_handle_indic_text():
+    assert split_order("besan, namak aur cheeni\nघी और चीनी") == ["besan", "namak", "cheeni", "घी", "चीनी"]
+    assert tokenize("அரிசி ௫ கிலோ") == ["அரிசி", "5", "கிலோ"]
+
+
+def test_normalize_corrects_spelling_and_aliases(normalizer):
+    text = normalizer.normalize("pyaj 1 kilo\ntamatr 2 kg, namak aur cheeni")
+    assert text.lines == ["onion 1 kilo", "tomato 2 kg", "salt", "sugar"]
+    assert text.unknown == 0
+
+
+def test_unknown_brand_words_are_left_alone(normalizer):
+    # "tata" is one transposition from "atta"; rewriting it would turn salt into flour
+    assert normalizer.normalize_line("tata salt") == ("tata salt", 2, 1)
+
+
+def test_unknown_words_are_counted(normalizer):
+    text = normalizer.normalize("besan\nxyzzy qwerty")
+    assert text.words == 3 and text.unknown == 2
+    assert text.unknown_share == pytest.approx(2 / 3)
+
+
+def test_headings_are_skipped_and_not_counted(normalizer):
+    text = normalizer.normalize("List 1\nbesan\nlist 3\npyaj 1 kilo")
+    assert text.lines == ["besan", "onion 1 kilo"]
+    assert text.words == 2 and text.unknown == 0
@@ -0,0 +1,131 @@
+import asyncio
+import importlib
+import json
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from fakes import FakeChatModel, FakeEmbeddings, FakeMessage, hash_embedding
+from retrieval import NumpyIndex, QueryEmbedder, normalize_rows
+from stores import StoreRegistry
+
+
+class CountingChatModel(FakeChatModel):
+    # The benchmark's extraction model, without latency, counting the calls it answers
+    def __init__(self):
+        super().__init__(latency=0, item_latency=0)
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt.to_string())
+        return super().invoke(prompt)
+
+
+class Corrector:
+    # correct_chain stand-in: rewrites the lines it knows, echoes the rest
+    def __init__(self, rewrites):
+        self.rewrites = rewrites
+
+    def invoke(self, inputs):
+        return FakeMessage("\n".join(self.rewrites.get(line, line) for line in inputs["query"].splitlines()))
+
+
+def load_fake_vector_index(store):
+    # Hashed-feature vectors for the store's own products.db; no chroma_db/ involved
+    conn = sqlite3.connect(store.products_db)
+    try:
+        rows = conn.execute("SELECT product_id, productname, quantity FROM products ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    matrix = normalize_rows(np.asarray([hash_embedding(name) for _, name, _ in rows], dtype=np.float32))
+    store.vector_index = NumpyIndex(
+        matrix, [row[0] for row in rows], [row[1] for row in rows],
+        [{"product_id": product_id, "packSize": quantity} for product_id, _, quantity in rows],
+    )
+
+
+@pytest.fixture
+def main(monkeypatch, products_db, tmp_path):
+    # main reads its settings at import: no key checks, no persistent cache, no rate limits
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("CACHE_DB", "")
+    monkeypatch.setenv("UPSTREAM_LIMITS", "")
+    main = importlib.import_module("main")
+
+    monkeypatch.setattr(main, "load_vector_index", load_fake_vector_index)
+    monkeypatch.setattr(main, "stores", StoreRegistry(
+        main.load_store, main.DEFAULT_STORE, str(tmp_path), str(tmp_path / "stores"), 2**30
+    ))
+    monkeypatch.setattr(main, "llm", CountingChatModel(), raising=False)
+    monkeypatch.setattr(main, "correct_chain", Corrector({}), raising=False)
+    monkeypatch.setattr(main, "query_embedder", QueryEmbedder(FakeEmbeddings(latency=0)), raising=False)
+    # Every line goes through correction + extraction, not the fast path
+    monkeypatch.setattr(main, "FASTPATH", False)
+    main.stores.load_default()
+    main.open_caches()
+    main.startup.run([])
+    return main
+
+
+def test_order_items_are_extracted_in_one_batch_and_keep_their_order(main):
+    client = TestClient(main.app)
+    response = client.post("/process-order/", json={"query": "marie biscuit 2\nonion 1 kg\nbesan 500 g"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [product["productname"].split()[0] for product in body["result"]] == ["Marie", "Onion", "Besan/Kadale"]
+    assert body["result"][0]["quantity"] == 2
+    assert body["stats"] == {"items": 3, "fast_path": 0, "llm": 3}
+    assert len(main.llm.prompts) == 1 and main.llm.prompts[0].count("### ITEM") == 3
+
+    # The same order again is answered from the extraction cache
+    assert client.post("/process-order/", json={"query": "besan 500 g\nonion 1 kg"}).status_code == 200
+    assert len(main.llm.prompts) == 1
+
+
+def test_overrunning_batch_falls_back_per_item_without_asking_again(main, monkeypatch):
+    class SlowBatches(CountingChatModel):
+        def invoke(self, prompt):
+            if "### ITEM" in prompt.to_string():
+                time.sleep(0.3)
+            return super().invoke(prompt)
+
+    monkeypatch.setattr(main, "llm", SlowBatches())
+    monkeypatch.setattr(main, "BATCH_TIMEOUT", 0.05)
+    monkeypatch.setattr(main, "BATCH_ITEM_TIMEOUT", 0)
+    results, _stats = asyncio.run(main.resolve_order("onion 1 kg\nmarie biscuit"))
+    assert [product["productname"].split()[0] for product in results] == ["Onion", "Marie"]
+    # The per-item retries waited for the batch through the cache
+    assert len(main.llm.prompts) == 1
+
+
+def test_stream_yields_a_record_per_item_then_a_summary(main):
+    client = TestClient(main.app)
+    response = client.post("/process-order/stream", json={"query": "onion 1 kg\nmarie biscuit"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(record["item"] for record in records[:-1]) == ["marie biscuit", "onion 1 kg"]
+    assert all(record["type"] == "item" and record["source"] == "llm" for record in records[:-1])
+    assert records[-1]["type"] == "summary"
+    assert (records[-1]["resolved"], records[-1]["errors"], records[-1]["products"]) == (2, 0, 2)
+
+    events = client.post(
+        "/process-order/stream", json={"query": "onion 1 kg"}, headers={"Accept": "text/event-stream"}
+    ).text.split("\n\n")
+    assert events[0].startswith("data: ") and json.loads(events[0][6:])["type"] == "item"
+
+
+def test_speculative_candidates_are_kept_for_unchanged_items(main, monkeypatch):
+    # Send every order to the LLM corrector; it rewrites one of the two lines
+    monkeypatch.setattr(main, "NORMALIZE_MAX_UNKNOWN", -1)
+    monkeypatch.setattr(main, "correct_chain", Corrector({"xyzzy": "marie biscuit"}))
+    results, stats = asyncio.run(main.resolve_order("onion 1 kg\nxyzzy"))
+    assert [product["productname"].split()[0] for product in results] == ["Onion", "Marie"]
+    assert stats["speculation"]["outcome"] == "partial"
+    assert (stats["speculation"]["reused"], stats["speculation"]["retrieved"]) == (1, 1)
+
+    _results, stats = asyncio.run(main.resolve_order("onion 1 kg\nbesan"))
+    assert stats["speculation"]["outcome"] == "hit"
+    assert stats["speculation"]["reused"] == 2
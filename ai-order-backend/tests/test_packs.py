@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from packs import MAX_SOLVER_STEPS, parse_pack_size, solve_packs, split_quantity
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2 kg", (2000.0, "g")),
+    ("500 g", (500.0, "g")),
+    ("5x100 g", (500.0, "g")),
+    ("1 ltr", (1000.0, "ml")),
+    ("12's pack", (12.0, "pcs")),
+    ("Set of 4", (4.0, "pcs")),
+    ("Combo", (None, None)),
+])
+def test_parse_pack_size(text, expected):
+    assert parse_pack_size(text) == expected
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("atta 10kg", ("atta", 10000.0, "g", None)),
+    ("lemons 4", ("lemons", None, None, 4)),
+    ("besan", ("besan", None, None, None)),
+    ("pyaaj 1/2 kilo", ("pyaaj", 500.0, "g", None)),
+    ("eggs 2 dozen", ("eggs", 24.0, "pcs", None)),
+    ("bread (1 packet)", ("bread", None, None, 1)),
+    ("3 in 1 coffee", ("3 in 1 coffee", None, None, None)),
+    ("2-in-1 shampoo 2 bottles", ("2-in-1 shampoo", None, None, 2)),
+])
+def test_split_quantity(line, expected):
+    assert split_quantity(line) == expected
+
+
+def test_solve_packs_covers_the_request_cheaply():
+    packs = [("1kg", 1000, 50), ("2kg", 2000, 90), ("5kg", 5000, 200)]
+    assert solve_packs(7000, packs) == [("5kg", 1), ("2kg", 1)]
+    # Between two totals equally close, covering the request wins
+    assert solve_packs(2500, [("1kg", 1000, 50)]) == [("1kg", 3)]
+    assert solve_packs(2400, [("1kg", 1000, 50)]) == [("1kg", 2)]
+    # Never less than one pack
+    assert solve_packs(100, [("1kg", 1000, 50)]) == [("1kg", 1)]
+
+
+def test_solve_packs_rejects_nothing_to_solve():
+    assert solve_packs(0, [("1kg", 1000, 50)]) == []
+    assert solve_packs(1000, [("combo", None, 50)]) == []
+    assert solve_packs(None, [("1kg", 1000, 50)]) == []
+
+
+def test_solve_packs_counts_sub_unit_packs_exactly():
+    assert solve_packs(1.5, [("half", 0.5, 10), ("one", 1, 15)]) == [("one", 1), ("half", 1)]
+    assert solve_packs(2, [("quarter", 0.25, 5)]) == [("quarter", 8)]
+
+
+def test_solve_packs_large_request_single_size():
+    start = time.perf_counter()
+    assert solve_packs(10**7, [("p", 0.5, 10)]) == [("p", 2 * 10**7)]
+    assert time.perf_counter() - start < 0.1
+
+
+def test_solve_packs_large_request_several_sizes():
+    # Coprime sizes: no common step to coarsen by, more steps than the table holds
+    packs = [("a", 3, 2.0), ("b", 7, 4.0)]
+    assert 10**7 > MAX_SOLVER_STEPS
+    counts = dict(solve_packs(10**7, packs))
+    assert counts["a"] * 3 + counts["b"] * 7 == 10**7
+    # Mostly the cheaper pack per gram
+    assert counts["b"] * 7 > 0.9 * 10**7
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from retrieval import NumpyIndex, PartitionedIndex, QueryEmbedder, normalize_rows
+
+# Four catalog rows in two subcategories, with one-hot-ish vectors so similarities are easy to read
+ROWS = [
+    ("1", "Onion", {"product_id": "1", "packSize": "1 kg", "subcategory": "Vegetables"}, [1.0, 0.0, 0.0]),
+    ("2", "Potato", {"product_id": "2", "packSize": "1 kg", "subcategory": "Vegetables"}, [0.8, 0.6, 0.0]),
+    ("3", "Besan", {"product_id": "3", "packSize": "500 g", "subcategory": "Dals"}, [0.0, 0.0, 1.0]),
+    ("4", "Toor Dal", {"product_id": "4", "packSize": "1 kg", "subcategory": "Dals"}, [0.0, 0.6, 0.8]),
+]
+
+
+@pytest.fixture
+def index():
+    ids, documents, metadatas, vectors = zip(*ROWS)
+    return NumpyIndex(normalize_rows(np.asarray(vectors, dtype=np.float32)), list(ids), list(documents),
+                      list(metadatas))
+
+
+def names(hits):
+    return [document.page_content for document, _score in hits]
+
+
+def test_search_ranks_by_cosine_similarity(index):
+    onion_like, dal_like = index.search_many([[2.0, 0.0, 0.0], [0.0, 0.1, 1.0]], k=2)
+    assert names(onion_like) == ["Onion", "Potato"]
+    assert onion_like[0][1] == pytest.approx(1.0)
+    assert onion_like[1][1] == pytest.approx(0.8)
+    assert names(dal_like) == ["Besan", "Toor Dal"]
+    assert onion_like[0][0].metadata == {"product_id": "1", "packSize": "1 kg", "subcategory": "Vegetables"}
+
+
+def test_search_handles_no_queries_and_small_catalogs(index):
+    assert index.search_many([]) == []
+    assert len(index.search_many([[1.0, 0.0, 0.0]], k=10)[0]) == len(ROWS)
+    empty = NumpyIndex(np.zeros((0, 3), dtype=np.float32), [], [], [])
+    assert empty.search_many([[1.0, 0.0, 0.0]]) == [[]]
+
+
+def test_snapshot_round_trip(index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = NumpyIndex.load(str(tmp_path))
+    assert loaded.ids == index.ids
+    assert loaded.documents == index.documents
+    assert loaded.metadatas == index.metadatas
+    assert isinstance(loaded.matrix, np.memmap)
+    np.testing.assert_array_equal(np.asarray(loaded.matrix), index.matrix)
+    query = [[0.3, 0.3, 0.9]]
+    assert names(loaded.search_many(query, k=3)[0]) == names(index.search_many(query, k=3)[0])
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_inconsistent_snapshot_is_refused(index, tmp_path):
+    index.save(str(tmp_path))
+    rows = (tmp_path / "rows.jsonl").read_text(encoding="utf-8").splitlines()
+    (tmp_path / "rows.jsonl").write_text("\n".join(rows[:-1]) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="inconsistent"):
+        NumpyIndex.load(str(tmp_path))
+
+
+def test_partitioned_search_probes_the_closest_groups(index):
+    partitioned = PartitionedIndex(index, probes=1)
+    assert list(partitioned.names) == ["Dals", "Vegetables"]
+    # One group holds only two rows, so a k of 3 pulls in the next group as well
+    assert names(partitioned.search_many([[1.0, 0.0, 0.0]], k=2)[0]) == ["Onion", "Potato"]
+    assert len(partitioned.search_many([[1.0, 0.0, 0.0]], k=3)[0]) == 3
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_query_embedder_batches_and_memoizes():
+    embeddings = CountingEmbeddings()
+    embedder = QueryEmbedder(embeddings)
+    first = embedder.embed_many(["Onion", "besan", "onion "])
+    assert embeddings.calls == [["onion", "besan"]]  # one request, duplicates folded
+    assert first[0] == first[2]
+    embedder.embed_many(["besan", "atta"])
+    assert embeddings.calls[1] == ["atta"]
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+import stores
+from stores import ROW_BYTES, StoreRegistry, UnknownStore
+
+
+@pytest.fixture
+def loads():
+    return []
+
+
+@pytest.fixture
+def registry(tmp_path, loads):
+    # Stores a, b and c of 100 products each; the budget holds the default plus two
+    for store_id in ["default", "a", "b", "c"]:
+        root = tmp_path / "stores" / store_id
+        root.mkdir(parents=True)
+        (root / "products.db").write_bytes(b"")
+
+    def load(store):
+        loads.append(store.store_id)
+        store.catalog = list(range(100))
+
+    registry = StoreRegistry(load, "default", str(tmp_path / "stores" / "default"), str(tmp_path / "stores"),
+                             budget_bytes=300 * ROW_BYTES)
+    registry.load_default()
+    return registry
+
+
+def test_loads_once_and_evicts_least_recently_used(registry, loads):
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")  # b is now the coldest
+    registry.get("c")
+    assert list(registry.loaded) == ["default", "a", "c"]
+    assert loads == ["default", "a", "b", "c"]
+    assert registry.stats()["evictions"] == 1
+    assert registry.resident_bytes() <= registry.budget_bytes
+
+
+def test_evicted_stores_are_unloaded(registry):
+    unloaded = []
+    registry.unload = lambda store: unloaded.append(store.store_id)
+    registry.get("a")
+    registry.get("b")
+    registry.get("c")
+    assert unloaded == ["a"]
+
+
+def test_default_store_is_pinned(registry):
+    registry.budget_bytes = 0
+    store = registry.get("a")
+    assert store.store_id == "a"  # the store just loaded stays for its request
+    registry.get("b")
+    assert list(registry.loaded) == ["default", "b"]
+
+
+def test_unknown_and_invalid_store_ids(registry):
+    with pytest.raises(UnknownStore):
+        registry.get("missing")
+    with pytest.raises(UnknownStore):
+        registry.get("../default")
+    assert registry.available() == ["default", "a", "b", "c"]
+
+
+def test_failed_load_can_be_retried(registry):
+    def flaky(store):
+        raise OSError("disk")
+
+    load, registry.load = registry.load, flaky
+    with pytest.raises(OSError):
+        registry.get("a")
+    registry.load = load
+    assert registry.get("a").store_id == "a"
+
+
+def test_store_version_follows_its_files(registry, monkeypatch):
+    monkeypatch.setattr(stores, "VERSION_CHECK_SECONDS", 0)
+    store = registry.get("a")
+    store.version_fn = lambda: str(os.path.getsize(store.products_db))
+    before = store.version()
+    with open(store.products_db, "wb") as f:
+        f.write(b"rebuilt")
+    assert store.version() != before
+
+
+def test_rebuilt_store_is_reloaded_on_next_use(registry, loads, monkeypatch):
+    monkeypatch.setattr(stores, "VERSION_CHECK_SECONDS", 0)
+    files = {"a": "v1"}
+
+    def load(store):
+        loads.append(store.store_id)
+        store.version_fn = lambda: files[store.store_id]
+        store.catalog = list(range(100))
+
+    registry.load = load
+    unloaded = []
+    registry.unload = unloaded.append
+    first = registry.get("a")
+    assert registry.get("a") is first
+    files["a"] = "v2"  # products.db swapped in
+    second = registry.get("a")
+    assert second is not first and unloaded == [first]
+    assert registry.get("a") is second
+    assert loads == ["default", "a", "a"]
+    assert registry.stats()["reloads"] == 1
+
+
+def test_failed_reload_keeps_the_loaded_copy(registry, monkeypatch):
+    monkeypatch.setattr(stores, "VERSION_CHECK_SECONDS", 0)
+    files = {"default": "v1"}
+
+    def load(store):
+        store.version_fn = lambda: files[store.store_id]
+        store.catalog = []
+
+    def broken(store):
+        raise OSError("half-built")
+
+    registry.load = load
+    registry.loaded.clear()
+    registry.load_default()
+    default = registry.default
+    registry.load = broken
+    files["default"] = "v2"
+    assert registry.get() is default
+    registry.load = load
+    assert registry.get() is default  # not retried until the files change again
+    files["default"] = "v3"
+    assert registry.get() is not default
+    assert registry.default is registry.get()
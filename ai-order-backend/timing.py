@@ -0,0 +1,60 @@
+# === timing.py ===
+# Per-stage wall-clock timings for the order pipeline.
+#
+# Stages wrap their work in `with timed("embed"):`; durations are kept in a
+# bounded buffer per stage, which the benchmark reads for percentiles, and are
+# passed to any registered hooks (the /metrics histogram and span logging).
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class StageTimings:
+    def __init__(self, max_samples=100_000):
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.samples = {}  # stage -> deque of seconds
+        self.hooks = []  # callables (stage, seconds)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def record(self, stage, seconds):
+        with self.lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+        for hook in self.hooks:
+            hook(stage, seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {stage: list(samples) for stage, samples in self.samples.items()}
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+
+
+stage_timings = StageTimings()
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_timings.record(stage, time.perf_counter() - start)
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of an unsorted list (q in 0..100)
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(q / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]